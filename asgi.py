@@ -0,0 +1,18 @@
+"""
+ASGI entry point for the async deployment mode:
+
+    uvicorn asgi:app --workers 4
+
+Turns on ASYNC_MODE (coroutine login/register/dashboard) unless the
+environment says otherwise. See src/aio.py.
+"""
+import os
+
+# the config classes read the environment at import time
+os.environ.setdefault('ASYNC_MODE', 'true')
+
+from src import create_app
+from src.aio import AsgiAdapter
+
+flask_app = create_app()
+app = AsgiAdapter(flask_app, threads=flask_app.config['ASGI_THREADS'])
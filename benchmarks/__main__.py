@@ -0,0 +1,69 @@
+"""
+Usage:
+    python -m benchmarks --mode client --users 200 --audit-rows 20000 --requests 200
+    python -m benchmarks --mode client --allocations --scenario dashboard_deep_history
+    python -m benchmarks --mode gunicorn --workers 4 --concurrency 16 --compare bench_results.json
+"""
+import argparse
+import json
+import sys
+
+from benchmarks import harness
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark the auth hot paths.')
+    parser.add_argument('--mode', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--users', type=int, default=200, help='accounts to seed')
+    parser.add_argument('--audit-rows', type=int, default=20000, help='audit events for the deep-history user')
+    parser.add_argument('--requests', type=int, default=200, help='operations per scenario')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--scenario', action='append', choices=sorted(harness.SCENARIOS),
+                        help='run only these scenarios (repeatable)')
+    parser.add_argument('--allocations', action='store_true',
+                        help='measure peak Python allocations per operation (client mode; slower)')
+    parser.add_argument('--db', default=None, help='SQLite file to seed (default: a temp file)')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', default=None, help='earlier results file to diff against')
+    args = parser.parse_args(argv)
+
+    harness.prepare_environment(args.db or harness.default_db_path())
+    from src import create_app
+    app = create_app()
+    ctx = harness.seed(app, args.users, args.audit_rows)
+
+    server = None
+    if args.mode == 'gunicorn':
+        server, base_url = harness.start_gunicorn(args.workers, args.threads)
+        driver = harness.HTTPDriver(base_url)
+    else:
+        driver = harness.ClientDriver(app)
+
+    results = {'meta': harness.metadata(vars(args)), 'scenarios': {}}
+    try:
+        for name in args.scenario or list(harness.SCENARIOS):
+            result = harness.run_scenario(driver, name, ctx, args.requests, args.concurrency, args.allocations)
+            results['scenarios'][name] = result
+            print(f"{name:<24} {result['req_per_s']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f} ms  "
+                  f"p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  queries/op {result['queries_per_op']}  "
+                  f"alloc KiB/op {result['alloc_kb_per_op']}  "
+                  f"statuses {result['statuses']}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    harness.write_results(args.output, results)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            for line in harness.compare(results, json.load(f)):
+                print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,350 @@
+"""
+Load and benchmark harness for the auth hot paths.
+
+Two drivers share the same scenarios:
+
+* ``client``   - requests go through the Flask test client, in process.
+* ``gunicorn`` - a local gunicorn serves `run:app` and requests go over HTTP
+                 (CSRF tokens are fetched from the form page, untimed).
+
+Each scenario runs `requests` operations (optionally from several threads) and
+reports throughput and p50/p95/p99 latency. Only the operation itself is timed;
+per-operation setup such as fetching a fresh login form is not. The ``client``
+driver also reports SQL statements per operation (`queries_per_op`) and, with
+``--allocations``, the Python memory each operation allocates at its peak
+(`alloc_kb_per_op`, measured with tracemalloc; use ``--concurrency 1``).
+"""
+import http.cookiejar
+import json
+import math
+import os
+import platform
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PASSWORD = 'benchmark-password'
+_CSRF_RE = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def prepare_environment(db_path: str, secret_key: str = 'benchmark-secret-key'):
+    """Must run before `src`/`config` are imported: the config classes read the environment once."""
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SECRET_KEY'] = secret_key
+    # one client address sends every request, so the per-IP spray limit would dominate the numbers
+    os.environ.setdefault('MAX_LOGIN_ATTEMPTS_PER_IP', str(10 ** 9))
+    os.environ.setdefault('RATE_LIMIT_ENABLED', 'false')
+
+
+def seed(app, users: int, audit_rows: int) -> dict:
+    """
+    Creates `users` accounts sharing one password hash, and `audit_rows` events for
+    the first account (the "deep history" user). Returns context for the scenarios.
+    """
+    from datetime import datetime, timezone, timedelta
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from src.extensions import db
+    from src.auth.models import User, AuditLog
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        password_hash = generate_password_hash(PASSWORD)
+        db.session.execute(insert(User), [
+            {'email': f'bench{i}@example.com', 'password_hash': password_hash, 'failed_login_attempts': 0,
+             'is_locked': False}
+            for i in range(users)
+        ])
+        db.session.commit()
+        deep_user = User.query.filter_by(email='bench0@example.com').one()
+
+        now = datetime.now(timezone.utc)
+        for start in range(0, audit_rows, 5000):
+            db.session.execute(insert(AuditLog), [
+                {'user_id': deep_user.id, 'was_successful': n % 3 != 0, 'ip_address': '10.0.0.1',
+                 'created_at': now - timedelta(minutes=n)}
+                for n in range(start, min(start + 5000, audit_rows))
+            ])
+        db.session.commit()
+        return {'users': users, 'reset_token': deep_user.get_reset_token()}
+
+
+class ClientDriver:
+    """Drives the app in process through the Flask test client."""
+
+    name = 'client'
+
+    def __init__(self, app):
+        from sqlalchemy import event
+        from src.extensions import db
+
+        self.app = app
+        app.config['WTF_CSRF_ENABLED'] = False
+        self.queries = 0
+        self._lock = threading.Lock()
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', self._count_query)
+
+    def _count_query(self, *args):
+        with self._lock:
+            self.queries += 1
+
+    def open_form(self, path: str):
+        return self.app.test_client(), None
+
+    def submit(self, session, path: str, data: dict) -> int:
+        client, _ = session
+        return client.post(path, data=data).status_code
+
+    def get(self, session, path: str) -> int:
+        client, _ = session
+        return client.get(path).status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPDriver:
+    """Drives a running server over HTTP, one cookie jar per session."""
+
+    name = 'gunicorn'
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def _request(self, opener, path: str, data: dict | None = None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        try:
+            with opener.open(self.base_url + path, data=body, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace')
+        except urllib.error.HTTPError as e:
+            return e.code, ''
+
+    def open_form(self, path: str):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+                                             _NoRedirect)
+        _, page = self._request(opener, path)
+        match = _CSRF_RE.search(page)
+        return opener, match.group(1) if match else None
+
+    def submit(self, session, path: str, data: dict) -> int:
+        opener, token = session
+        if token:
+            data = {**data, 'csrf_token': token}
+        return self._request(opener, path, data)[0]
+
+    def get(self, session, path: str) -> int:
+        opener, _ = session
+        return self._request(opener, path)[0]
+
+
+def _login(driver, email: str):
+    session = driver.open_form('/auth/login')
+    driver.submit(session, '/auth/login', {'email': email, 'password': PASSWORD})
+    return session
+
+
+# Each scenario returns (prepare, run): prepare(i) is untimed, run(prepared, i) is timed.
+
+def scenario_good_login(driver, ctx):
+    prepare = lambda i: driver.open_form('/auth/login')
+    run = lambda session, i: driver.submit(session, '/auth/login',
+                                           {'email': f'bench{i % ctx["users"]}@example.com', 'password': PASSWORD})
+    return prepare, run
+
+def scenario_bad_login(driver, ctx):
+    # spread over every account except the two reserved ones so few of them lock
+    spread = max(ctx['users'] - 2, 1)
+    prepare = lambda i: driver.open_form('/auth/login')
+    run = lambda session, i: driver.submit(session, '/auth/login',
+                                           {'email': f'bench{2 + i % spread}@example.com', 'password': 'wrong-password'})
+    return prepare, run
+
+def scenario_lockout_storm(driver, ctx):
+    prepare = lambda i: driver.open_form('/auth/login')
+    run = lambda session, i: driver.submit(session, '/auth/login', {'email': 'bench1@example.com', 'password': 'wrong'})
+    return prepare, run
+
+def scenario_register(driver, ctx):
+    stamp = int(time.time() * 1000)
+    prepare = lambda i: driver.open_form('/auth/register')
+    run = lambda session, i: driver.submit(session, '/auth/register', {
+        'email': f'new-{stamp}-{i}@example.com', 'password': PASSWORD, 'confirm_password': PASSWORD})
+    return prepare, run
+
+def scenario_dashboard_deep_history(driver, ctx):
+    session = _login(driver, 'bench0@example.com')
+    prepare = lambda i: session
+    run = lambda session, i: driver.get(session, '/dashboard')
+    return prepare, run
+
+def scenario_reset_token_verify(driver, ctx):
+    prepare = lambda i: driver.open_form('/auth/login')
+    run = lambda session, i: driver.get(session, f'/auth/reset_password/{ctx["reset_token"]}')
+    return prepare, run
+
+def scenario_status(driver, ctx):
+    prepare = lambda i: driver.open_form('/auth/login')
+    run = lambda session, i: driver.get(session, '/status')
+    return prepare, run
+
+
+SCENARIOS = {
+    'good_login': scenario_good_login,
+    'bad_login': scenario_bad_login,
+    'lockout_storm': scenario_lockout_storm,
+    'register': scenario_register,
+    'dashboard_deep_history': scenario_dashboard_deep_history,
+    'reset_token_verify': scenario_reset_token_verify,
+    'status': scenario_status,
+}
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def run_scenario(driver, name: str, ctx: dict, requests: int, concurrency: int = 1,
+                 allocations: bool = False) -> dict:
+    prepare, run = SCENARIOS[name](driver, ctx)
+    queries_before = getattr(driver, 'queries', None)
+    # the server's allocations are only visible when it runs in this process
+    allocations = allocations and driver.name == 'client'
+    allocated: list[int] = []
+
+    def one(i):
+        prepared = prepare(i)
+        if allocations:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        status = run(prepared, i)
+        elapsed = time.perf_counter() - start
+        if allocations:
+            allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+        return elapsed, status
+
+    if allocations:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(one, range(requests)))
+    else:
+        samples = [one(i) for i in range(requests)]
+    wall = time.perf_counter() - wall_start
+    if allocations:
+        tracemalloc.stop()
+    queries = driver.queries - queries_before if queries_before is not None else None
+
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    statuses: dict[str, int] = {}
+    for _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    busy = sum(latencies) / 1000
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        # throughput of the timed operations only, so untimed setup doesn't skew it
+        'req_per_s': round(requests / (busy / concurrency), 2) if busy else 0.0,
+        'wall_seconds': round(wall, 3),
+        'mean_ms': round(statistics.fmean(latencies), 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'statuses': statuses,
+        'errors': sum(count for status, count in statuses.items() if status.startswith('5')),
+        'queries_per_op': round(queries / requests, 2) if queries is not None and requests else None,
+        'alloc_kb_per_op': round(statistics.fmean(allocated) / 1024, 1) if allocated else None,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers: int, threads: int, port: int | None = None):
+    """Starts `gunicorn run:app` against the prepared environment and waits for it to accept requests."""
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--threads', str(threads),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app'],
+        env={**os.environ, 'FLASK_ENV': 'production'},
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('gunicorn exited during startup')
+        try:
+            urllib.request.urlopen(base_url + '/status', timeout=1).close()
+            return process, base_url
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+        except urllib.error.HTTPError:
+            return process, base_url
+    process.terminate()
+    raise RuntimeError('gunicorn did not become ready in time')
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args: dict) -> dict:
+    return {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'parameters': args,
+    }
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Human-readable per-scenario deltas against an earlier results file."""
+    lines = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        deltas = []
+        for key in ('req_per_s', 'p50_ms', 'p99_ms', 'queries_per_op', 'alloc_kb_per_op'):
+            if before.get(key) and result.get(key) is not None:
+                deltas.append(f"{key} {(result[key] - before[key]) / before[key] * 100:+.1f}%")
+        lines.append(f"{name:<24} " + '  '.join(deltas))
+    return lines
+
+
+def default_db_path() -> str:
+    return os.path.join(tempfile.mkdtemp(prefix='auth-bench-'), 'bench.db')
+
+
+def write_results(path: str, results: dict):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
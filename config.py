@@ -8,18 +8,138 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY','dev-key-change-in-prod')
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL','sqlite:///'+os.path.join(BASE_DIR, 'instance', 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # optional read replica, used by views marked with @use_replica
+    SQLALCHEMY_BINDS = {'replica': os.getenv('DATABASE_REPLICA_URL')} if os.getenv('DATABASE_REPLICA_URL') else {}
+
+    # engine & connection pool tuning (turned into SQLALCHEMY_ENGINE_OPTIONS by src/database.py)
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30 # seconds to wait for a free connection
+    DB_POOL_RECYCLE = 3600 # seconds; ignored for SQLite
+    DB_POOL_PRE_PING = True
+    DB_STATEMENT_TIMEOUT_MS = 0 # PostgreSQL only, 0 = no limit
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'busy_timeout': 5000}
+    # startup cost (see src/startup.py)
+    EAGER_MIGRATE = False # Flask-Migrate is only loaded for the `flask` CLI unless this is set
+    TEMPLATE_PRECOMPILE = os.getenv('TEMPLATE_PRECOMPILE', 'false').lower() == 'true'
+    TEMPLATE_CACHE_DIR = os.getenv('TEMPLATE_CACHE_DIR') # on-disk Jinja bytecode cache, off by default
+    PREWARM_DB_CONNECTIONS = int(os.getenv('PREWARM_DB_CONNECTIONS', 2)) # opened per worker after fork (gunicorn.conf.py)
     HOST = '127.0.0.1'
     PORT = 8000
     MAX_LOGIN_ATTEMPTS = 5
     LOCKOUT_DURATION_MINUTES = 15
+    METRICS_ENABLED = True
+    LOGIN_ATTEMPT_WINDOW_MINUTES = LOCKOUT_DURATION_MINUTES # sliding window for counting failures
+    MAX_LOGIN_ATTEMPTS_PER_IP = int(os.getenv('MAX_LOGIN_ATTEMPTS_PER_IP', 50))
+
+    # per-IP token buckets on auth POSTs, checked before forms and the DB (see src/ratelimit.py)
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+    RATE_LIMITS = { # burst per client IP and endpoint, refilled evenly over the period; per worker
+        'auth.login': '20/minute',
+        'auth.register': '5/minute',
+        'auth.request_reset': '5/minute',
+        'auth.reset_token': '10/minute',
+    }
+    RATE_LIMIT_METHODS = ('POST',)
+    RATE_LIMIT_MAX_KEYS = 100000 # buckets per worker; beyond this new clients are not limited
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0)) # reverse proxies setting X-Forwarded-For
+
+    # shared state for lockout counters, cache invalidation and revocations (see src/shared_state.py):
+    # 'memory' (per worker), 'sqlite' (a file shared by all workers on the host) or 'redis' (all nodes)
+    SHARED_STATE_BACKEND = os.getenv('SHARED_STATE_BACKEND', os.getenv('LOGIN_ATTEMPT_BACKEND', 'memory'))
+    SHARED_STATE_PATH = os.path.join(BASE_DIR, 'instance', 'shared_state.db')
+    SHARED_STATE_URL = os.getenv('SHARED_STATE_URL', 'redis://localhost:6379/0')
+    SHARED_STATE_PREFIX = 'auth:' # namespace for keys on a shared Redis server
+    SHARED_STATE_TIMEOUT = 2.0 # seconds per Redis round trip
+    SHARED_STATE_RETRY_AFTER = 5.0 # seconds on per-worker state after the shared backend fails
+
+    # password-reset tokens (see src/auth/reset_tokens.py)
+    RESET_TOKEN_MAX_AGE = 1800 # seconds a reset link stays valid
+    RESET_TOKEN_CACHE_SIZE = 1024 # verified tokens cached per worker
+    RESET_TOKEN_CACHE_TTL = 60
+
+    # outbound mail (see src/mail.py); without MAIL_SERVER messages are only logged
+    MAIL_SERVER = os.getenv('MAIL_SERVER')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', 25))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'false').lower() == 'true'
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME')
+    MAIL_PASSWORD = os.getenv('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.getenv('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+    MAIL_WORKER = os.getenv('MAIL_WORKER', 'thread') # 'thread' or 'off' (run `flask mail send` instead)
+    MAIL_BATCH_SIZE = 50 # messages per SMTP connection
+    MAIL_POLL_INTERVAL = 5.0 # seconds between outbox scans when idle
+    MAIL_MAX_ATTEMPTS = 5
+    MAIL_RETRY_BASE = 30.0 # seconds before the first retry, doubled per attempt
+    MAIL_RETRY_MAX = 3600.0
+
+    # async deployment mode (see asgi.py and src/aio.py)
+    ASYNC_MODE = os.getenv('ASYNC_MODE', 'false').lower() == 'true'
+    ASYNC_DATABASE_URI = os.getenv('ASYNC_DATABASE_URL') # default: DATABASE_URL with aiosqlite/asyncpg
+    ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32)) # request threads per ASGI process
+
+    # health probes behind /status, /livez and /readyz (see src/health.py)
+    HEALTH_PROBE_MODE = 'thread' # 'thread' (background probes) or 'inline' (refreshed by a request)
+    HEALTH_PROBE_INTERVAL = 5.0 # seconds between probe rounds
+    HEALTH_PROBE_TIMEOUT = 2.0 # seconds before the database is reported down
+    HEALTH_MAX_AGE = 15.0 # /readyz fails once the snapshot is older than this
+    HEALTH_DB_LATENCY_WARN_MS = 250.0
+    HEALTH_POOL_SATURATION_WARN = 0.9 # fraction of pool_size + max_overflow checked out
+    HEALTH_HASH_QUEUE_WARN = 0.8 # fraction of HASH_POOL_MAX_PENDING in use
+    HEALTH_AUDIT_BACKLOG_WARN = 0.8 # fraction of AUDIT_BUFFER_MAX waiting
+
+    # per-request SQL profiler and N+1 warnings (see src/profiling.py)
+    SQL_PROFILER = os.getenv('SQL_PROFILER', 'false').lower() == 'true'
+    SQL_PROFILER_N_PLUS_ONE = 3 # identical statements per request before warning
+    SQL_PROFILER_LOG_QUERIES = False # also log every statement with timing and origin
+
+    # stateless signed-session fast path for read-only requests (see src/auth/claims.py)
+    SESSION_CLAIMS_ENABLED = os.getenv('SESSION_CLAIMS_ENABLED', 'false').lower() == 'true'
+    SESSION_CLAIMS_TTL = 300 # seconds a revoked session can keep reading
+
+    # identity cache for load_user (0 disables it)
+    IDENTITY_CACHE_SIZE = 1024
+    IDENTITY_CACHE_TTL = 60 # seconds before another worker's change is guaranteed to be seen
+    # current_user as a read-only __slots__ Principal instead of a session-tracked User instance
+    IDENTITY_PRINCIPAL = os.getenv('IDENTITY_PRINCIPAL', 'false').lower() == 'true'
+
+    # per-user ring buffers of recent events for the dashboard (see src/auth/activity.py)
+    RECENT_ACTIVITY_USERS = 10000 # users kept per worker, least recently viewed evicted first (0 disables)
+    RECENT_ACTIVITY_SIZE = 10 # events per user
+    RECENT_ACTIVITY_TTL = 60 # seconds before another worker's events are guaranteed to be seen
+    RECENT_ACTIVITY_FORCE_DB = os.getenv('RECENT_ACTIVITY_FORCE_DB', 'false').lower() == 'true' # bypass the rings
+
+    # password hashing pool (0 workers = hash inline on the request thread)
+    HASH_POOL_WORKERS = int(os.getenv('HASH_POOL_WORKERS', os.cpu_count() or 1))
+    HASH_POOL_MAX_PENDING = int(os.getenv('HASH_POOL_MAX_PENDING', HASH_POOL_WORKERS * 4))
+    HASH_POOL_TIMEOUT = 10.0 # seconds a request waits for its hash before giving up
+
+    # hash parameters for new passwords, e.g. scrypt:65536:8:1 (run `flask hash calibrate`)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_REHASH_ON_LOGIN = True # upgrade outdated hashes in the background after a successful login
+    PASSWORD_REHASH_MAX_PENDING = 16 # queued upgrades per worker (each holds a plaintext password); more are skipped
+
+    # audit log durability: 'sync' (same commit as the login), 'batched' or 'async' (write-behind)
+    AUDIT_LOG_MODE = os.getenv('AUDIT_LOG_MODE', 'batched')
+    AUDIT_BATCH_SIZE = 100
+    AUDIT_FLUSH_INTERVAL = 1.0 # seconds
+    AUDIT_BUFFER_MAX = 10000
+    AUDIT_HOT_MONTHS = 1 # the dashboard reads this month and the previous one only
+    AUDIT_RETENTION_DAYS = 90 # older raw events are rolled up by `flask audit compact`
 
 class DevConfig(Config):
     DEBUG = True
     HOST = '0.0.0.0'
     PORT = 5000
+    DB_POOL_SIZE = 2
+    DB_MAX_OVERFLOW = 2
+    SQL_PROFILER = True
 
 class ProdConfig(Config):
     DEBUG = False
     SECRET_KEY = os.environ.get('SECRET_KEY')
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    DB_POOL_RECYCLE = 1800
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 5000))
 
 
@@ -0,0 +1,53 @@
+"""
+Production gunicorn profile. gunicorn reads ./gunicorn.conf.py on its own, so
+
+    gunicorn
+
+serves `run:app` with these settings. Command-line flags and $GUNICORN_CMD_ARGS
+override any of them, e.g. ``gunicorn --workers 8``.
+
+* ``gthread`` workers, one per core (``WEB_CONCURRENCY``), with
+  ``GUNICORN_THREADS`` threads each. Password hashing runs on each worker's
+  process pool, so `HASH_POOL_WORKERS` defaults to an even share of the cores.
+* The app is built once in the master (``preload_app``), with templates
+  precompiled there. Each forked worker then drops the inherited connection
+  pools and prewarms its own connections, hashing processes and health probes
+  before taking traffic (see `src.startup`).
+* Workers are recycled after ``max_requests`` requests, with jitter so they
+  don't all restart at once. On exit a worker drains its audit buffer, mail
+  worker and background rehashes.
+"""
+import os
+
+cores = os.cpu_count() or 1
+
+wsgi_app = 'run:app'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+workers = int(os.getenv('WEB_CONCURRENCY', cores))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# the config classes read the environment when the master imports run:app
+os.environ.setdefault('TEMPLATE_PRECOMPILE', 'true')
+os.environ.setdefault('HASH_POOL_WORKERS', str(max(cores // workers, 1)))
+
+preload_app = True
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30 # time an exiting worker gets to finish requests and drain its buffers
+keepalive = 5
+
+
+def post_fork(server, worker):
+    from src.startup import after_fork, prewarm
+    app = server.app.wsgi()
+    after_fork(app)
+    warmed = prewarm(app)
+    server.log.info(f"Worker {worker.pid} prewarmed in {warmed['seconds']}s: {warmed['db_connections']} DB "
+                    f"connections, {warmed['templates']} templates, {warmed['hash_workers']} hash workers")
+
+
+def worker_exit(server, worker):
+    from src.startup import drain
+    drain(server.app.wsgi())
@@ -0,0 +1,29 @@
+"""Add composite index for per-user audit history
+
+Revision ID: 3c1f9b7d2e4a
+Revises: abf8777571ee
+Create Date: 2026-10-18 10:12:41.518204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9b7d2e4a'
+down_revision = 'abf8777571ee'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves "newest events for user X" and keyset pagination without a sort
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.create_index('ix_audit_logs_user_history',
+                              ['user_id', sa.text('created_at DESC'), 'id'],
+                              unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('audit_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_audit_logs_user_history')
@@ -0,0 +1,100 @@
+"""Partition audit_logs by month on PostgreSQL and add daily rollups
+
+Revision ID: 7d2e4a9c1b3f
+Revises: 3c1f9b7d2e4a
+Create Date: 2026-10-18 11:03:27.904113
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2e4a9c1b3f'
+down_revision = '3c1f9b7d2e4a'
+branch_labels = None
+depends_on = None
+
+
+def _month_start(moment, offset=0):
+    month_index = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def upgrade():
+    op.create_table('audit_daily_rollups',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('success_count', sa.Integer(), nullable=False),
+    sa.Column('failure_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'day')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        # SQLite has no native partitioning; `flask audit rotate` archives cold months instead
+        return
+
+    # Rebuild audit_logs as a range-partitioned table. The partition key must be part of the PK.
+    op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_unpartitioned')
+    op.execute('ALTER INDEX ix_audit_logs_user_history RENAME TO ix_audit_logs_unpartitioned_history')
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE')
+    op.execute("""
+        CREATE TABLE audit_logs (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            ip_address VARCHAR(45),
+            was_successful BOOLEAN NOT NULL,
+            id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq'),
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP WITH TIME ZONE,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+    op.execute('CREATE INDEX ix_audit_logs_user_history ON audit_logs (user_id, created_at DESC, id)')
+    op.execute('CREATE TABLE audit_logs_default PARTITION OF audit_logs DEFAULT')
+
+    # one partition per month from the oldest existing event up to next month
+    now = datetime.now(timezone.utc)
+    oldest = bind.execute(sa.text('SELECT MIN(created_at) FROM audit_logs_unpartitioned')).scalar() or now
+    month = _month_start(oldest)
+    while month <= _month_start(now, 1):
+        op.execute(
+            f"CREATE TABLE audit_logs_{month.year:04d}_{month.month:02d} PARTITION OF audit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+        )
+        month = _month_start(month, 1)
+
+    op.execute("""
+        INSERT INTO audit_logs (user_id, ip_address, was_successful, id, created_at, updated_at)
+        SELECT user_id, ip_address, was_successful, id, COALESCE(created_at, now()), updated_at
+        FROM audit_logs_unpartitioned
+    """)
+    op.execute('DROP TABLE audit_logs_unpartitioned')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute('ALTER TABLE audit_logs RENAME TO audit_logs_partitioned')
+        op.execute('ALTER INDEX ix_audit_logs_user_history RENAME TO ix_audit_logs_partitioned_history')
+        op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY NONE')
+        op.execute("""
+            CREATE TABLE audit_logs (
+                user_id INTEGER NOT NULL REFERENCES users (id),
+                ip_address VARCHAR(45),
+                was_successful BOOLEAN NOT NULL,
+                id INTEGER NOT NULL DEFAULT nextval('audit_logs_id_seq') PRIMARY KEY,
+                created_at TIMESTAMP WITH TIME ZONE,
+                updated_at TIMESTAMP WITH TIME ZONE
+            )
+        """)
+        op.execute('ALTER SEQUENCE audit_logs_id_seq OWNED BY audit_logs.id')
+        op.execute('INSERT INTO audit_logs SELECT user_id, ip_address, was_successful, id, created_at, updated_at FROM audit_logs_partitioned')
+        op.execute('DROP TABLE audit_logs_partitioned')
+        op.execute('CREATE INDEX ix_audit_logs_user_history ON audit_logs (user_id, created_at DESC, id)')
+
+    op.drop_table('audit_daily_rollups')
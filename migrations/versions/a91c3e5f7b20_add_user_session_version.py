@@ -0,0 +1,26 @@
+"""Add users.session_version for signed session revocation
+
+Revision ID: a91c3e5f7b20
+Revises: 7d2e4a9c1b3f
+Create Date: 2026-10-18 13:26:09.340187
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c3e5f7b20'
+down_revision = '7d2e4a9c1b3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('session_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_column('session_version')
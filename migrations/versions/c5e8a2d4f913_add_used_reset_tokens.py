@@ -0,0 +1,33 @@
+"""Add used_reset_tokens single-use ledger
+
+Revision ID: c5e8a2d4f913
+Revises: a91c3e5f7b20
+Create Date: 2026-10-18 15:02:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e8a2d4f913'
+down_revision = 'a91c3e5f7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('used_reset_tokens',
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('digest')
+    )
+    with op.batch_alter_table('used_reset_tokens', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_used_reset_tokens_expires_at'), ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('used_reset_tokens', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_used_reset_tokens_expires_at'))
+
+    op.drop_table('used_reset_tokens')
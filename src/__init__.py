@@ -2,6 +2,7 @@ import os
 from flask import Flask
 from config import DevConfig, ProdConfig
 from src.extensions import db, login_manager
+from src.database import configure_engines, install_sqlite_pragmas
 
 def create_app():
     app = Flask(__name__)
@@ -13,15 +14,90 @@ def create_app():
     else:
         app.config.from_object(ProdConfig)
 
+    # behind reverse proxies the client address comes from X-Forwarded-For
+    hops = app.config.get('TRUSTED_PROXY_COUNT', 0)
+    if hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
+
     # initialization
+    configure_engines(app)
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     login_manager.login_message_category = 'info'
 
-    # initialize flask migrate
-    from src.extensions import migrate
-    migrate.init_app(app,db)
+    # initialize flask migrate, only for `flask db ...`: Alembic is the slowest import we have
+    from src.startup import running_cli, startup_cli
+    if running_cli() or app.config['EAGER_MIGRATE']:
+        from src.extensions import init_migrate
+        init_migrate(app)
+    app.cli.add_command(startup_cli)
+
+    # hash parameters come from PASSWORD_HASH_METHOD; outdated hashes are upgraded after login
+    from src.auth.hash_policy import hash_policy, hash_cli
+    hash_policy.init_app(app)
+    app.cli.add_command(hash_cli)
+
+    # password hashing runs on a bounded process pool, off the request thread
+    from src.auth.hashing import hashing_pool
+    hashing_pool.init_app(app)
+
+    # audit events are buffered and bulk-inserted (see AUDIT_LOG_MODE)
+    from src.auth.audit import audit_sink
+    audit_sink.init_app(app)
+    from src.auth.retention import audit_cli
+    app.cli.add_command(audit_cli)
+
+    # lockout counters, cache invalidation and revocations shared by every worker (SHARED_STATE_BACKEND)
+    from src.shared_state import shared_state, state_cli
+    shared_state.init_app(app)
+    app.cli.add_command(state_cli)
+
+    # the dashboard's recent events come from per-user ring buffers fed by the audit sink
+    from src.auth.activity import recent_activity
+    recent_activity.init_app(app)
+
+    # failed-login counters live outside the users table, in the shared state
+    from src.auth.lockout import lockout_tracker
+    lockout_tracker.init_app(app)
+
+    # load_user serves current_user from a per-worker LRU instead of a SELECT per request
+    from src.auth.identity import identity_cache
+    identity_cache.init_app(app)
+
+    # request latency, SQL and login metrics served at /metrics
+    from src.metrics import metrics
+    metrics.init_app(app)
+
+    # per-IP token buckets turn away abusive auth POSTs before forms and the DB
+    from src.ratelimit import rate_limiter
+    rate_limiter.init_app(app)
+
+    # per-request SQL capture with N+1 warnings (SQL_PROFILER, on in DevConfig)
+    from src.profiling import sql_profiler
+    sql_profiler.init_app(app)
+
+    # /status, /livez and /readyz read a snapshot refreshed by background probes
+    from src.health import health
+    health.init_app(app)
+
+    # password-reset tokens: cached serializer/verifications and a single-use ledger
+    from src.auth.reset_tokens import reset_tokens, tokens_cli
+    reset_tokens.init_app(app)
+    app.cli.add_command(tokens_cli)
+
+    # outbound mail goes through a durable outbox and a batching worker
+    from src.mail import mailer, mail_cli
+    mailer.init_app(app)
+    app.cli.add_command(mail_cli)
+
+    # bulk user import/export commands
+    from src.auth.bulk import users_cli
+    app.cli.add_command(users_cli)
 
     # blueprints
     from src.auth.routes import auth_bp
@@ -29,4 +105,13 @@ def create_app():
     from src.main.routes import main_bp
     app.register_blueprint(main_bp)
 
+    # async engine, and coroutine views when ASYNC_MODE is on (see asgi.py)
+    from src.aio import async_db
+    async_db.init_app(app)
+
+    # compile every template now (once per gunicorn --preload master) instead of per worker
+    if app.config['TEMPLATE_PRECOMPILE']:
+        from src.startup import precompile_templates
+        precompile_templates(app)
+
     return app
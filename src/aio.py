@@ -0,0 +1,186 @@
+"""
+Async deployment mode (`ASYNC_MODE`, served through `asgi.py`).
+
+`asgi.py` runs the app under an ASGI server such as uvicorn. The server's event
+loop holds every open connection (keep-alive, slow clients), and WSGI requests
+are handed to a bounded thread pool (`ASGI_THREADS`). A slow client therefore
+costs a socket, not a whole sync worker.
+
+With `ASYNC_MODE` on, `login`, `register` and `dashboard` are replaced by the
+coroutine views defined next to them (`*_async`):
+
+* password hashes are awaited on the hashing process pool
+  (`HashingPool.check_async`/`generate_async`), so no thread is parked on a hash;
+* `dashboard` reads through an async SQLAlchemy engine (aiosqlite or asyncpg,
+  see `ASYNC_DATABASE_URI`), while the rest of the ORM work runs via
+  `asyncio.to_thread`.
+
+`status` stays synchronous: it only reads the cached health snapshot (see
+`src.health`).
+
+Behind `AsgiAdapter` the coroutines run on the server's own loop, so the async
+engine keeps a normal connection pool. Anywhere else (a sync server, the test
+client) Flask gives each request a fresh loop, and the engine falls back to
+unpooled connections because pooled ones cannot outlive their loop.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import current_app, g
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.pool import NullPool
+
+from src.database import REPLICA_BIND
+
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+# endpoint -> (module, coroutine view) installed when ASYNC_MODE is on
+ASYNC_VIEWS = {
+    'auth.login': ('src.auth.routes', 'login_async'),
+    'auth.register': ('src.auth.routes', 'register_async'),
+    'main.dashboard': ('src.main.routes', 'dashboard_async'),
+}
+
+
+def async_database_url(uri: str | None) -> str | None:
+    """The async-driver form of a sync database URL, or None if it has no async counterpart."""
+    if not uri:
+        return None
+    url = make_url(uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return None
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        # a second engine would open a different, empty in-memory database
+        return None
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+class _AsyncEngines:
+    """Per-app async engines: pooled on the ASGI server's loop, unpooled everywhere else."""
+
+    def __init__(self, urls: dict):
+        self.urls = urls
+        self.loop = None
+        self.pooled: dict = {}
+        self.unpooled: dict = {}
+
+    def get(self, bind: str | None):
+        url = self.urls.get(bind)
+        if url is None:
+            return None
+        if self.loop is not None and asyncio.get_running_loop() is self.loop:
+            engines, options = self.pooled, {'pool_pre_ping': True}
+        else:
+            engines, options = self.unpooled, {'poolclass': NullPool}
+        engine = engines.get(bind)
+        if engine is None:
+            engine = engines[bind] = create_async_engine(url, **options)
+        return engine
+
+    async def dispose(self):
+        for engine in [*self.pooled.values(), *self.unpooled.values()]:
+            await engine.dispose()
+        self.pooled.clear()
+        self.unpooled.clear()
+
+
+class AsyncDatabase:
+    """Async engine access for coroutine views, with a thread fallback when no async driver applies."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_MODE', False)
+        app.config.setdefault('ASGI_THREADS', 32)
+        if not app.config.get('ASYNC_DATABASE_URI'):
+            app.config['ASYNC_DATABASE_URI'] = async_database_url(app.config.get('SQLALCHEMY_DATABASE_URI'))
+        urls = {None: app.config['ASYNC_DATABASE_URI']}
+        replica = (app.config.get('SQLALCHEMY_BINDS') or {}).get(REPLICA_BIND)
+        if replica:
+            urls[REPLICA_BIND] = async_database_url(replica['url'] if isinstance(replica, dict) else replica)
+        app.extensions['async_db'] = _AsyncEngines(urls)
+        if app.config['ASYNC_MODE']:
+            self.install_views(app)
+
+    def install_views(self, app):
+        """Swaps the coroutine views in. Call after the blueprints are registered."""
+        from importlib import import_module
+        for endpoint, (module, name) in ASYNC_VIEWS.items():
+            if endpoint in app.view_functions:
+                app.view_functions[endpoint] = getattr(import_module(module), name)
+
+    @property
+    def engines(self) -> _AsyncEngines:
+        return current_app.extensions['async_db']
+
+    def _engine(self):
+        engines = self.engines
+        if g.get('db_use_replica'):
+            engine = engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return engines.get(None)
+
+    async def scalars(self, statement) -> list:
+        """Runs an ORM SELECT and returns the objects, detached from any session."""
+        engine = self._engine()
+        if engine is None:
+            from src.extensions import db
+            return await asyncio.to_thread(lambda: db.session.scalars(statement).all())
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            return (await session.scalars(statement)).all()
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    """
+    Runs the stock `run_wsgi_app` on the adapter's pool. It is thread_sensitive,
+    which on its own runs every request on one shared thread; called through
+    `async_to_sync` from a pool thread, it runs on that thread instead.
+    """
+
+    def __init__(self, wsgi_application, duplicate_header_limit: int, executor: ThreadPoolExecutor):
+        super().__init__(wsgi_application, duplicate_header_limit)
+        self.executor = executor
+
+    async def run_wsgi_app(self, body):
+        # the body has been read by now, so a slow client never holds a pool thread
+        run = async_to_sync(super().run_wsgi_app)
+        await sync_to_async(run, thread_sensitive=False, executor=self.executor)(body)
+
+
+class AsgiAdapter(WsgiToAsgi):
+    """Serves a Flask app over ASGI with requests on a thread pool and lifespan handling."""
+
+    def __init__(self, app, threads: int, duplicate_header_limit: int = 100):
+        super().__init__(app, duplicate_header_limit)
+        self.flask_app = app
+        self.header_limit = duplicate_header_limit
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        await _PooledWsgiInstance(self.flask_app, self.header_limit, self.executor)(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        engines = self.flask_app.extensions['async_db']
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # coroutine views scheduled from the request threads land on this loop
+                engines.loop = asyncio.get_running_loop()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await engines.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async_db = AsyncDatabase()
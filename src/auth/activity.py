@@ -0,0 +1,243 @@
+"""
+Per-user ring buffers of recent authentication events for the dashboard.
+
+Instead of querying `audit_logs` on every page load, each worker keeps every
+active user's last `RECENT_ACTIVITY_SIZE` events in a bounded deque. The rings
+live in an LRU capped at `RECENT_ACTIVITY_USERS` users, with a TTL.
+
+* Every recorded event is pushed onto the user's ring. `audit_sink.record`
+  pushes in the buffered modes; in ``sync`` mode the push happens once the
+  row is committed.
+* A miss is hydrated from the primary's table plus the events still waiting
+  in the audit buffer or in a flush that has not committed. The buffer is
+  copied before the SELECT, so an event being flushed is never missed, and
+  one found in both is counted once. An event hydrated from the buffer before
+  its own push is not pushed a second time.
+* Each push also bumps a per-user generation in the shared-state backend (see
+  `src.shared_state`). A ring stored under an older generation is hydrated
+  again, so events recorded by another worker show up on the next page load.
+  With the ``memory`` backend they show up after the TTL instead.
+
+`RECENT_ACTIVITY_FORCE_DB` bypasses the rings and reads the table on every
+request, e.g. to check what the rings serve against the database.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import NamedTuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session as SQLAlchemySession, object_session
+
+from src.extensions import db
+from src.auth.models import AuditLog
+from src.shared_state import shared_state
+
+
+class ActivityEntry(NamedTuple):
+    """The `AuditLog` fields the dashboard shows."""
+    created_at: datetime
+    ip_address: str | None
+    was_successful: bool
+
+
+def _entry(created_at: datetime, ip_address: str | None, was_successful: bool) -> ActivityEntry:
+    # SQLite hands timestamps back without their timezone
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return ActivityEntry(created_at, ip_address, bool(was_successful))
+
+
+def _window(entries: list[ActivityEntry], limit: int, since: datetime | None) -> list[ActivityEntry]:
+    if since is not None:
+        entries = [entry for entry in entries if entry.created_at >= since]
+    return entries[:limit]
+
+
+class ActivityRings:
+    """A thread-safe LRU of per-user event deques (newest first) with a TTL and hit/miss counters."""
+
+    def __init__(self, max_users: int = 10000, size: int = 10, ttl: float = 60.0):
+        self.max_users = max_users
+        self.size = size
+        self.ttl = ttl
+        # user id -> [expires, generation, deque]
+        self._users: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._users)
+
+    def get(self, user_id: int, generation: int) -> list[ActivityEntry] | None:
+        now = time.monotonic()
+        with self._lock:
+            ring = self._users.get(user_id)
+            if ring is None or ring[0] <= now or ring[1] != generation:
+                if ring is not None:
+                    del self._users[user_id]
+                self.misses += 1
+                return None
+            self._users.move_to_end(user_id)
+            self.hits += 1
+            return list(ring[2])
+
+    def store(self, user_id: int, generation: int, entries: list[ActivityEntry]):
+        if self.max_users <= 0:
+            return
+        with self._lock:
+            self._users[user_id] = [time.monotonic() + self.ttl, generation, deque(entries[:self.size], self.size)]
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+                self.evictions += 1
+
+    def push(self, user_id: int, generation: int, entry: ActivityEntry):
+        """Adds a new event to a cached ring. `generation` is the one bumped for this event."""
+        with self._lock:
+            ring = self._users.get(user_id)
+            if ring is None:
+                return
+            if ring[1] != generation - 1:
+                # other events were recorded since the ring was stored; hydrate it again on the next read
+                del self._users[user_id]
+                return
+            ring[1] = generation
+            # a hydrate between the buffer append and this push already picked the event up
+            if entry not in ring[2]:
+                ring[2].appendleft(entry)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'users': len(self._users),
+                'max_users': self.max_users,
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class RecentActivity:
+    """Serves the dashboard's recent events from one `ActivityRings` per application."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RECENT_ACTIVITY_USERS', 10000)
+        app.config.setdefault('RECENT_ACTIVITY_SIZE', 10)
+        app.config.setdefault('RECENT_ACTIVITY_TTL', 60)
+        app.config.setdefault('RECENT_ACTIVITY_FORCE_DB', False)
+        app.extensions['recent_activity'] = ActivityRings(app.config['RECENT_ACTIVITY_USERS'],
+                                                          app.config['RECENT_ACTIVITY_SIZE'],
+                                                          app.config['RECENT_ACTIVITY_TTL'])
+
+    @property
+    def rings(self) -> ActivityRings | None:
+        if not current_app:
+            return None
+        return current_app.extensions.get('recent_activity')
+
+    def _generation(self, user_id: int) -> int:
+        value = shared_state.backend.get(f'activity:{user_id}')
+        return int(value) if value else 0
+
+    def _serves(self, limit: int) -> bool:
+        config = current_app.config
+        return (self.rings is not None and not config['RECENT_ACTIVITY_FORCE_DB']
+                and config['RECENT_ACTIVITY_USERS'] > 0 and limit <= config['RECENT_ACTIVITY_SIZE'])
+
+    def record(self, user_id: int, created_at: datetime, ip_address: str | None, was_successful: bool):
+        """Pushes an event the audit sink has accepted (or, in sync mode, committed)."""
+        rings = self.rings
+        if rings is None:
+            return
+        # outlives every ring stored under the old generation
+        generation = shared_state.backend.incr(f'activity:{user_id}', current_app.config['RECENT_ACTIVITY_TTL'] + 1)
+        rings.push(user_id, generation, _entry(created_at, ip_address, was_successful))
+
+    def cached(self, user_id: int, limit: int = 10, since: datetime | None = None) -> list[ActivityEntry] | None:
+        """The user's newest `limit` events from the ring, or None on a miss. Never runs SQL."""
+        if not self._serves(limit):
+            return None
+        entries = self.rings.get(user_id, self._generation(user_id))
+        if entries is None:
+            return None
+        return _window(entries, limit, since)
+
+    def recent(self, user_id: int, limit: int = 10, since: datetime | None = None) -> list:
+        """The user's newest `limit` events, from the ring or, on a miss, from the database."""
+        if not self._serves(limit):
+            logs, _ = AuditLog.history_page(user_id, limit=limit, since=since)
+            return logs
+        entries = self.cached(user_id, limit, since)
+        if entries is None:
+            entries = _window(self._hydrate(user_id), limit, since)
+        return entries
+
+    def _hydrate(self, user_id: int) -> list[ActivityEntry]:
+        # read before the events: a push racing the load then makes this ring stale
+        generation = self._generation(user_id)
+        size = current_app.config['RECENT_ACTIVITY_SIZE']
+        buffer = current_app.extensions['audit_sink']
+        # copied before the SELECT: a row a flush takes meanwhile is in one or the other, maybe both
+        with buffer.lock:
+            pending = [row for row in (*buffer.in_flight, *buffer.rows) if row['user_id'] == user_id]
+        # always the primary: replica lag would otherwise be cached for RECENT_ACTIVITY_TTL
+        rows = db.session.execute(
+            select(AuditLog.created_at, AuditLog.ip_address, AuditLog.was_successful)
+            .where(AuditLog.user_id == user_id)
+            .order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+            .limit(size),
+            bind_arguments={'bind': db.engine},
+        ).all()
+        entries = [_entry(*row) for row in rows]
+        committed = set(entries)
+        for row in pending:
+            entry = _entry(row['created_at'], row['ip_address'], row['was_successful'])
+            if entry not in committed:
+                entries.append(entry)
+        entries.sort(key=lambda entry: entry.created_at, reverse=True)
+        self.rings.store(user_id, generation, entries)
+        return entries[:size]
+
+    def stats(self) -> dict:
+        return self.rings.stats()
+
+
+recent_activity = RecentActivity()
+
+
+# In sync mode audit rows go through the ORM; they are pushed once the commit succeeds
+@event.listens_for(AuditLog, 'after_insert')
+def _collect_recorded_activity(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('recorded_activity', []).append(
+            (target.user_id, target.created_at, target.ip_address, target.was_successful))
+
+@event.listens_for(SQLAlchemySession, 'after_commit')
+def _push_recorded_activity(session):
+    recorded = session.info.pop('recorded_activity', ())
+    if has_app_context():
+        for user_id, created_at, ip_address, was_successful in recorded:
+            recent_activity.record(user_id, created_at, ip_address, was_successful)
+
+@event.listens_for(SQLAlchemySession, 'after_rollback')
+def _forget_recorded_activity(session):
+    session.info.pop('recorded_activity', None)
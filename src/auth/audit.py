@@ -0,0 +1,198 @@
+"""
+Write-behind sink for `AuditLog` events.
+
+Durability modes (`AUDIT_LOG_MODE`):
+
+* ``sync``    - the row is added to the current `db.session` and is committed
+                together with the caller's own changes. Nothing is ever lost,
+                but every login pays for the audit insert.
+* ``batched`` - events are buffered in memory and written with one bulk
+                `executemany` insert once `AUDIT_BATCH_SIZE` events are waiting
+                or `AUDIT_FLUSH_INTERVAL` seconds have passed. The flush runs on
+                whichever request crosses the threshold; a background timer
+                flushes events that no later request comes along to push out.
+* ``async``   - like ``batched`` but a background thread does the flushing, so
+                no request ever waits on an audit write.
+
+In the buffered modes events that have not been flushed yet are lost if the
+process is killed. The buffer is flushed on interpreter shutdown, and it is
+bounded by `AUDIT_BUFFER_MAX`: when full, the recording thread flushes
+synchronously instead of dropping events. The one exception is a failed flush
+(the database is down): its rows go back to the front of the buffer, and those
+that no longer fit under `AUDIT_BUFFER_MAX` are dropped. Drops are logged,
+counted in `stats()['dropped']` and turn the health `audit_buffer` check
+``degraded``.
+"""
+import atexit
+import threading
+import time
+import weakref
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy import insert
+
+from src.extensions import db
+from src.auth.models import AuditLog
+from src.auth.activity import recent_activity
+
+AUDIT_MODES = ('sync', 'batched', 'async')
+
+
+class _AuditBuffer:
+    """Per-application buffer of pending audit rows."""
+
+    def __init__(self, app):
+        self.app = app
+        self.rows = []
+        self.in_flight = [] # rows taken by a flush that has not committed yet
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.flushed = 0
+        self.flushes = 0
+        self.dropped = 0
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.worker = None
+
+    def start_worker(self):
+        if self.worker is not None:
+            return
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name='audit-sink', daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while not self.stopping:
+            self.wakeup.wait(self.app.config['AUDIT_FLUSH_INTERVAL'])
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Writes every pending row with a single bulk insert. Returns the number written."""
+        with self.flush_lock:
+            with self.lock:
+                rows, self.rows = self.rows, []
+                self.in_flight = rows
+                self.last_flush = time.monotonic()
+            if not rows:
+                return 0
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(insert(AuditLog.__table__), rows)
+            except Exception:
+                self.app.logger.exception(f"Audit flush of {len(rows)} events failed")
+                self._requeue(rows)
+                return 0
+            with self.lock:
+                self.in_flight = []
+                self.flushed += len(rows)
+                self.flushes += 1
+            return len(rows)
+
+    def _requeue(self, rows):
+        limit = self.app.config['AUDIT_BUFFER_MAX']
+        with self.lock:
+            room = max(limit - len(self.rows), 0)
+            kept = rows[-room:] if room else []
+            dropped = len(rows) - len(kept)
+            self.dropped += dropped
+            self.rows[:0] = kept
+            self.in_flight = []
+        if dropped:
+            self.app.logger.warning(f"Audit buffer full after a failed flush: dropped {dropped} events")
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+        self.flush()
+
+
+class AuditSink:
+    """Records authentication events according to the configured durability mode."""
+
+    def __init__(self, app=None):
+        self._buffers = weakref.WeakSet()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('AUDIT_LOG_MODE', 'batched')
+        app.config.setdefault('AUDIT_BATCH_SIZE', 100)
+        app.config.setdefault('AUDIT_FLUSH_INTERVAL', 1.0)
+        app.config.setdefault('AUDIT_BUFFER_MAX', 10000)
+        app.config.setdefault('AUDIT_HOT_MONTHS', 1)
+        app.config.setdefault('AUDIT_RETENTION_DAYS', 90)
+        if app.config['AUDIT_LOG_MODE'] not in AUDIT_MODES:
+            raise ValueError(f"AUDIT_LOG_MODE must be one of {AUDIT_MODES}")
+
+        buffer = _AuditBuffer(app)
+        app.extensions['audit_sink'] = buffer
+        self._buffers.add(buffer)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def record(self, user_id: int, ip_address: str | None, was_successful: bool):
+        """Queues (or, in sync mode, stages) one audit event for the current app."""
+        config = current_app.config
+        mode = config['AUDIT_LOG_MODE']
+        if mode == 'sync':
+            db.session.add(AuditLog(user_id=user_id, ip_address=ip_address, was_successful=was_successful))
+            return
+
+        now = datetime.now(timezone.utc)
+        row = {
+            'user_id': user_id,
+            'ip_address': ip_address,
+            'was_successful': was_successful,
+            'created_at': now,
+            'updated_at': now,
+        }
+        buffer: _AuditBuffer = current_app.extensions['audit_sink']
+        with buffer.lock:
+            buffer.rows.append(row)
+            pending = len(buffer.rows)
+            overdue = time.monotonic() - buffer.last_flush >= config['AUDIT_FLUSH_INTERVAL']
+        # the dashboard shows the event before it is flushed (sync mode pushes on commit instead)
+        recent_activity.record(user_id, now, ip_address, was_successful)
+
+        if pending >= config['AUDIT_BUFFER_MAX']:
+            # back-pressure: never drop events just because the buffer is full
+            buffer.flush()
+        elif mode == 'async':
+            buffer.start_worker()
+            if pending >= config['AUDIT_BATCH_SIZE']:
+                buffer.wakeup.set()
+        else:
+            # the timer flushes a lone event within AUDIT_FLUSH_INTERVAL even if no request follows
+            buffer.start_worker()
+            if pending >= config['AUDIT_BATCH_SIZE'] or overdue:
+                buffer.flush()
+
+    def flush(self) -> int:
+        """Flushes the current app's buffer immediately."""
+        return current_app.extensions['audit_sink'].flush()
+
+    def stats(self) -> dict:
+        buffer: _AuditBuffer = current_app.extensions['audit_sink']
+        with buffer.lock:
+            return {
+                'mode': current_app.config['AUDIT_LOG_MODE'],
+                'pending': len(buffer.rows),
+                'flushed': buffer.flushed,
+                'flushes': buffer.flushes,
+                'dropped': buffer.dropped,
+            }
+
+    def shutdown(self):
+        """Drains every live buffer. Registered with `atexit`."""
+        for buffer in list(self._buffers):
+            buffer.stop()
+
+
+audit_sink = AuditSink()
@@ -0,0 +1,200 @@
+"""
+Bulk user import/export (`flask users import` / `flask users export`).
+
+Import streams CSV or JSONL in batches. Each row has an `email` and either a
+plaintext `password` or a Werkzeug `password_hash`, plus optional `username`
+and `bio`. For each batch:
+
+1. rows without an email, or with neither a plaintext password nor a real
+   hash, are counted as invalid;
+2. emails and usernames are de-duplicated within the batch and checked against
+   their unique indexes with one `IN (...)` query each, so existing accounts
+   never cost a hash;
+3. plaintext passwords are hashed in parallel on a process pool;
+4. rows are written with a single executemany insert that ignores unique
+   conflicts, so a concurrent sign-up cannot abort the batch.
+
+Export streams rows with a server-side cursor, so memory stays flat for any
+table size.
+"""
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select
+from werkzeug.security import generate_password_hash
+
+from src.extensions import db
+from src.database import insert_ignoring_conflicts
+from src.auth.models import User
+
+EXPORT_COLUMNS = ('email', 'password_hash', 'username', 'bio', 'is_locked', 'created_at')
+
+
+def read_rows(stream, fmt: str):
+    """Yields one dict per input record without loading the whole file."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _looks_hashed(value: str) -> bool:
+    # Werkzeug hashes look like "method$salt$hash"
+    return value.count('$') >= 2
+
+
+class UserImporter:
+    """Runs the batch pipeline; `workers=0` hashes inline."""
+
+    def __init__(self, batch_size: int = 1000, workers: int | None = None):
+        self.batch_size = batch_size
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.stats = {'imported': 0, 'existing': 0, 'duplicate': 0, 'invalid': 0, 'username_taken': 0}
+
+    def run(self, records) -> dict:
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 0 else None
+        try:
+            for batch in batched(records, self.batch_size):
+                self._import_batch(batch, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return self.stats
+
+    def _import_batch(self, batch: list[dict], executor):
+        candidates: dict[str, dict] = {}
+        for record in batch:
+            email = (record.get('email') or '').strip()
+            # a password_hash that isn't one would otherwise fall through to hashing an empty password
+            hashed = bool(record.get('password_hash')) and _looks_hashed(record['password_hash'])
+            if '@' not in email or not (hashed or record.get('password')):
+                self.stats['invalid'] += 1
+            elif email in candidates:
+                self.stats['duplicate'] += 1
+            else:
+                candidates[email] = dict(record, hashed=hashed)
+
+        if candidates:
+            existing = set(db.session.scalars(select(User.email).where(User.email.in_(list(candidates)))))
+            self.stats['existing'] += len(existing)
+            for email in existing:
+                del candidates[email]
+
+        usernames = {record.get('username') for record in candidates.values()} - {None, ''}
+        taken = set(db.session.scalars(select(User.username).where(User.username.in_(usernames)))) if usernames else set()
+        for email, record in list(candidates.items()):
+            username = record.get('username')
+            if not username:
+                continue
+            if username in taken:
+                self.stats['username_taken'] += 1
+                del candidates[email]
+            else:
+                # later rows in the batch can't claim it either
+                taken.add(username)
+
+        plaintext = [(email, record['password']) for email, record in candidates.items() if not record['hashed']]
+        if plaintext:
+            passwords = [password for _, password in plaintext]
+            chunksize = max(len(passwords) // (self.workers * 4), 1) if executor else 1
+            # imported passwords get the same parameters as sign-ups (PASSWORD_HASH_METHOD)
+            hash_password = partial(generate_password_hash, method=current_app.config['PASSWORD_HASH_METHOD'])
+            hashes = executor.map(hash_password, passwords, chunksize=chunksize) if executor \
+                else map(hash_password, passwords)
+            for (email, _), password_hash in zip(plaintext, hashes):
+                candidates[email]['password_hash'] = password_hash
+
+        now = datetime.now(timezone.utc)
+        rows = [{
+            'email': email,
+            'password_hash': record['password_hash'],
+            'username': record.get('username') or None,
+            'bio': record.get('bio') or None,
+            'failed_login_attempts': 0,
+            'is_locked': False,
+            'session_version': 0,
+            'created_at': now,
+            'updated_at': now,
+        } for email, record in candidates.items()]
+
+        # no conflict target: a unique username taken meanwhile is skipped too, not an IntegrityError
+        inserted = len(insert_ignoring_conflicts(db.session, User, rows, None))
+        db.session.commit()
+        # anything not inserted lost a race with a concurrent sign-up
+        self.stats['existing'] += len(rows) - inserted
+        self.stats['imported'] += inserted
+
+
+def export_rows(batch_size: int = 1000):
+    """Yields user dicts from a server-side cursor, `batch_size` rows per fetch."""
+    columns = [User.__table__.c[name] for name in EXPORT_COLUMNS]
+    result = db.session.execute(
+        select(*columns).order_by(User.id).execution_options(stream_results=True, yield_per=batch_size)
+    )
+    for row in result:
+        record = dict(row._mapping)
+        if record['created_at'] is not None:
+            record['created_at'] = record['created_at'].isoformat()
+        yield record
+
+
+def _detect_format(path: str, fmt: str | None) -> str:
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+users_cli = AppGroup('users', help='Bulk user import and export.')
+
+
+@users_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@click.option('--workers', type=int, default=None, help='Hashing processes (default: CPU count, 0 = inline).')
+def import_command(path, fmt, batch_size, workers):
+    """Imports users from CSV or JSONL."""
+    with open(path, newline='', encoding='utf-8') as stream:
+        stats = UserImporter(batch_size, workers).run(read_rows(stream, _detect_format(path, fmt)))
+    click.echo(f"Imported {stats['imported']} users ({stats['existing']} already existed, "
+               f"{stats['duplicate']} duplicates in file, {stats['invalid']} invalid rows, "
+               f"{stats['username_taken']} usernames already taken)")
+
+
+@users_cli.command('export')
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None, help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+def export_command(path, fmt, batch_size):
+    """Exports users (with password hashes) to CSV or JSONL. Use '-' for stdout."""
+    fmt = _detect_format(path, fmt)
+    count = 0
+    with click.open_file(path, 'w', encoding='utf-8') as stream:
+        writer = csv.DictWriter(stream, fieldnames=EXPORT_COLUMNS) if fmt == 'csv' else None
+        if writer:
+            writer.writeheader()
+        for record in export_rows(batch_size):
+            if writer:
+                writer.writerow(record)
+            else:
+                stream.write(json.dumps(record) + '\n')
+            count += 1
+    if path != '-':
+        click.echo(f"Exported {count} users to {path}")
@@ -0,0 +1,115 @@
+"""
+Stateless signed-session fast path (`SESSION_CLAIMS_ENABLED`).
+
+At login a short-lived claims blob (user id, email, lock state and session
+version) is signed with the same itsdangerous serializer used for reset tokens
+and stored in the session cookie. While the claims are younger than
+`SESSION_CLAIMS_TTL`, safe requests (GET/HEAD/OPTIONS) get a `ClaimsPrincipal`
+as `current_user` without touching the `users` table.
+
+Writes, and reads after the claims expire, go through the database: the stored
+`User.session_version` must still match the claims, otherwise the session is
+treated as revoked. Bumping the version (`User.revoke_sessions`) revokes every
+session immediately for writes. Once the bump is committed a revocation time is
+also published to the shared-state backend (see `src.shared_state`); claims
+issued before it no longer take the fast path, so with a shared backend reads
+are cut off on every node at once instead of within the TTL.
+"""
+import time
+
+from flask import current_app, session, request
+from itsdangerous import URLSafeTimedSerializer as Serializer, BadSignature
+
+from src.auth.identity import Principal
+from src.shared_state import shared_state
+
+CLAIMS_KEY = '_claims'
+SAFE_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+
+class ClaimsPrincipal(Principal):
+    """A read-only stand-in for `User` built purely from verified session claims."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_claims(cls, claims: dict) -> 'ClaimsPrincipal':
+        return cls(claims['uid'], claims['em'], claims['lk'], claims['sv'])
+
+
+def _serializer() -> Serializer:
+    return Serializer(current_app.config['SECRET_KEY'], salt='session-claims')
+
+
+def enabled() -> bool:
+    return current_app.config.get('SESSION_CLAIMS_ENABLED', False)
+
+
+def issue(user):
+    """Signs fresh claims for `user` into the session."""
+    session[CLAIMS_KEY] = _serializer().dumps({
+        'uid': user.id,
+        'em': user.email,
+        'lk': bool(user.is_locked),
+        'sv': user.session_version or 0,
+    })
+
+
+def read() -> tuple[dict | None, float | None]:
+    """Returns (claims, issued_at). Expired claims are still returned so their version can be checked."""
+    token = session.get(CLAIMS_KEY)
+    if not token:
+        return None, None
+    try:
+        claims, issued_at = _serializer().loads(token, return_timestamp=True)
+    except BadSignature:
+        return None, None
+    return claims, issued_at.timestamp()
+
+
+def _fresh(issued_at: float | None) -> bool:
+    return issued_at is not None and time.time() - issued_at < current_app.config['SESSION_CLAIMS_TTL']
+
+
+def publish_revocation(user_id: int):
+    """Marks claims issued until now as revoked on every worker sharing the state backend."""
+    # claims older than the TTL are never fresh anyway, so the marker can expire with them
+    shared_state.backend.set(f'revoked:{user_id}', repr(time.time()), current_app.config['SESSION_CLAIMS_TTL'])
+
+
+def _revoked_after(user_id: int, issued_at: float) -> bool:
+    revoked_at = shared_state.backend.get(f'revoked:{user_id}')
+    # signed timestamps have whole-second resolution
+    return revoked_at is not None and int(issued_at) <= float(revoked_at)
+
+
+def clear():
+    session.pop(CLAIMS_KEY, None)
+
+
+def fast_principal(user_id: int) -> ClaimsPrincipal | None:
+    """A DB-free principal for safe requests carrying fresh, matching, unlocked claims."""
+    if not enabled() or request.method not in SAFE_METHODS:
+        return None
+    claims, issued_at = read()
+    if claims is None or not _fresh(issued_at) or claims['uid'] != user_id or claims['lk']:
+        return None
+    if _revoked_after(user_id, issued_at):
+        return None
+    return ClaimsPrincipal.from_claims(claims)
+
+
+def validate(user) -> bool:
+    """
+    Checks a DB-loaded user against the session claims and refreshes them.
+    Returns False if the session was revoked by a session version bump.
+    """
+    if not enabled():
+        return True
+    claims, issued_at = read()
+    if claims is not None and claims['sv'] != (user.session_version or 0):
+        clear()
+        return False
+    if claims is None or not _fresh(issued_at) or _revoked_after(user.id, issued_at):
+        issue(user)
+    return True
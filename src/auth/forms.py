@@ -1,8 +1,6 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField
-from wtforms.validators import DataRequired, Email, Length, EqualTo, ValidationError
-
-from src.auth.models import User
+from wtforms.validators import DataRequired, Email, Length, EqualTo
 
 class PasswordBaseForm(FlaskForm):
     """A base form that provides standard password and confirmation fields."""
@@ -23,15 +21,13 @@ class RegistrationForm(PasswordBaseForm):
                             DataRequired(message="Email is required."),
                             Email(message="Please enter a valid email address.")
                         ])
-    submit = SubmitField('Sign Up')
-
-    def validate_email(self, email):
-        user = User.query.filter_by(email=email.data).first()
-        if user:
-            raise ValidationError('Email address is already registered. Please log in.')
-
+    # Uniqueness is enforced by the INSERT itself (`User.create_if_absent`), not by a SELECT here
     submit = SubmitField('Create Account')
 
+    def email_taken(self):
+        """Reports a duplicate email found by the insert as an ordinary field error."""
+        self.email.errors.append('Email address is already registered. Please log in.')
+
 class LoginForm(FlaskForm):
     email = StringField('Email Address',
                         validators=[
@@ -0,0 +1,265 @@
+"""
+Password-hash policy: calibrated cost parameters and rehash-on-login.
+
+Werkzeug picks its scrypt/pbkdf2 parameters per release, and a stored hash
+keeps whatever parameters were current when it was created. Here the
+parameters are an explicit policy instead:
+
+* `PASSWORD_HASH_METHOD` is a full Werkzeug method string such as
+  ``scrypt:65536:8:1`` or ``pbkdf2:sha256:1000000``; every new hash (sign-up,
+  password reset, bulk import) uses it. ``flask hash calibrate`` measures this
+  machine and recommends the strongest parameters that fit a latency budget,
+  so the security/CPU trade-off is chosen deliberately and revisited when the
+  hardware changes.
+* After a successful login the stored hash is compared with the policy. An
+  outdated one is recomputed from the password the user just proved, on a
+  background thread through the hashing pool, and written with a conditional
+  UPDATE that only replaces the exact hash that was checked. The login
+  response never waits for it. A rehash that can't get a pool slot, is
+  already pending for the same user, or would queue beyond
+  `PASSWORD_REHASH_MAX_PENDING`, is simply skipped until the next login, so a
+  burst of logins never piles up plaintext passwords in memory.
+
+``flask hash status`` shows how many users are still on each method.
+"""
+import atexit
+import hashlib
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash
+
+from src.extensions import db
+from src.auth.models import User
+from src.auth.hashing import hashing_pool, HashingPoolSaturated
+from src.auth.identity import identity_cache
+
+HASH_ALGORITHMS = ('scrypt', 'pbkdf2')
+
+# calibration never recommends less than these
+MIN_SCRYPT_N = 2 ** 14
+MIN_PBKDF2_ITERATIONS = 600_000
+
+
+@lru_cache(maxsize=32)
+def normalize_method(method: str) -> str:
+    """Spells out Werkzeug's defaults, e.g. ``scrypt`` -> ``scrypt:32768:8:1``, as stored in hashes."""
+    algorithm, *args = method.split(':')
+    if algorithm == 'scrypt':
+        n = int(args[0]) if args else 2 ** 15
+        r = int(args[1]) if len(args) > 1 else 8
+        p = int(args[2]) if len(args) > 2 else 1
+        return f'scrypt:{n}:{r}:{p}'
+    if algorithm == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        if hash_name not in hashlib.algorithms_available:
+            raise ValueError(f'Unknown pbkdf2 digest {hash_name!r}')
+        return f'pbkdf2:{hash_name}:{iterations}'
+    raise ValueError(f'PASSWORD_HASH_METHOD must start with one of {HASH_ALGORITHMS}, got {method!r}')
+
+
+def method_of(pwhash: str) -> str:
+    """The method part of a stored hash (everything before the salt)."""
+    return pwhash.split('$', 1)[0]
+
+
+def needs_rehash(pwhash: str, method: str) -> bool:
+    return method_of(pwhash) != normalize_method(method)
+
+
+def time_hash(method: str, rounds: int = 3) -> float:
+    """Best-of-`rounds` seconds for one hash with `method` on this machine."""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        generate_password_hash('calibration-password', method=method)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate(algorithm: str = 'scrypt', target_ms: float = 250.0, max_memory_mb: int = 64) -> dict:
+    """
+    The strongest `algorithm` parameters whose hash takes at most `target_ms` here.
+    scrypt doubles its cost factor (r=8, p=1) while the time and `max_memory_mb` allow;
+    pbkdf2 scales the iteration count from a short probe.
+    """
+    if algorithm == 'scrypt':
+        n = MIN_SCRYPT_N
+        seconds = time_hash(f'scrypt:{n}:8:1')
+        # each doubling of n roughly doubles both time and memory (128 * n * r bytes)
+        while seconds * 2 * 1000 <= target_ms and 128 * (n * 2) * 8 <= max_memory_mb * 1024 * 1024:
+            candidate = time_hash(f'scrypt:{n * 2}:8:1')
+            if candidate * 1000 > target_ms:
+                break
+            n, seconds = n * 2, candidate
+        method = f'scrypt:{n}:8:1'
+    elif algorithm == 'pbkdf2':
+        probe = 10_000
+        per_iteration = time_hash(f'pbkdf2:sha256:{probe}') / probe
+        iterations = max(int(target_ms / 1000 / per_iteration) // 10_000 * 10_000, MIN_PBKDF2_ITERATIONS)
+        method = f'pbkdf2:sha256:{iterations}'
+        seconds = time_hash(method, rounds=1)
+    else:
+        raise ValueError(f'algorithm must be one of {HASH_ALGORITHMS}')
+    return {'method': method, 'hash_ms': seconds * 1000, 'target_ms': target_ms}
+
+
+class _RehashState:
+    """Per-application background rehash thread and counters."""
+
+    def __init__(self, app):
+        self.app = app
+        self.executor = None
+        self.lock = threading.Lock()
+        self.futures = {} # user id -> pending rehash
+        self.rehashed = 0
+        self.skipped = 0
+        self.stale = 0
+
+    def submit(self, user_id: int, fn, *args):
+        """Queues a rehash, or counts it as skipped (returning None) if the user already has one or the queue is full."""
+        with self.lock:
+            if user_id in self.futures or len(self.futures) >= self.app.config['PASSWORD_REHASH_MAX_PENDING']:
+                self.skipped += 1
+                return None
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='rehash')
+            future = self.futures[user_id] = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda done: self._done(user_id, done))
+        return future
+
+    def _done(self, user_id: int, future):
+        with self.lock:
+            if self.futures.get(user_id) is future:
+                del self.futures[user_id]
+
+    def count(self, outcome: str):
+        with self.lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+
+class HashPolicy:
+    """Validates the configured hash method and upgrades outdated hashes after login."""
+
+    def __init__(self, app=None):
+        self._states = weakref.WeakSet()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        app.config.setdefault('PASSWORD_REHASH_ON_LOGIN', True)
+        app.config.setdefault('PASSWORD_REHASH_MAX_PENDING', 16)
+        # fail at startup, not on the first sign-up, and store the explicit form
+        app.config['PASSWORD_HASH_METHOD'] = normalize_method(app.config['PASSWORD_HASH_METHOD'])
+        state = _RehashState(app)
+        app.extensions['hash_policy'] = state
+        self._states.add(state)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    @property
+    def _state(self) -> _RehashState:
+        return current_app.extensions['hash_policy']
+
+    @property
+    def method(self) -> str:
+        return current_app.config['PASSWORD_HASH_METHOD']
+
+    def maybe_rehash(self, user_id: int, old_hash: str, password: str) -> bool:
+        """
+        Schedules a rehash if `old_hash` (which `password` was just checked against)
+        is outdated. Returns whether one was scheduled.
+        """
+        if not current_app.config['PASSWORD_REHASH_ON_LOGIN'] or not needs_rehash(old_hash, self.method):
+            return False
+        state = self._state
+        return state.submit(user_id, self._rehash, state, user_id, old_hash, password) is not None
+
+    def _rehash(self, state: _RehashState, user_id: int, old_hash: str, password: str):
+        app = state.app
+        with app.app_context():
+            try:
+                new_hash = hashing_pool.generate(password, method=app.config['PASSWORD_HASH_METHOD'])
+            except HashingPoolSaturated:
+                # logins have priority over upgrades; the next login tries again
+                state.count('skipped')
+                return
+            try:
+                with db.engine.begin() as conn:
+                    # only replace the hash that was checked, never a password changed meanwhile
+                    result = conn.execute(update(User.__table__)
+                                          .where(User.__table__.c.id == user_id,
+                                                 User.__table__.c.password_hash == old_hash)
+                                          .values(password_hash=new_hash))
+            except Exception:
+                app.logger.exception(f"Rehash of user {user_id} failed")
+                state.count('skipped')
+                return
+            if result.rowcount:
+                # a Core UPDATE skips the mapper events that normally invalidate the cache
+                identity_cache.invalidate(user_id)
+                state.count('rehashed')
+            else:
+                state.count('stale')
+
+    def wait(self, timeout: float | None = None):
+        """Blocks until every scheduled rehash has finished (tests, shutdown)."""
+        state = self._state
+        with state.lock:
+            futures = list(state.futures.values())
+        for future in futures:
+            future.result(timeout)
+
+    def stats(self) -> dict:
+        state = self._state
+        with state.lock:
+            return {'method': self.method, 'pending': len(state.futures), 'rehashed': state.rehashed,
+                    'skipped': state.skipped, 'stale': state.stale}
+
+    def shutdown(self):
+        """Lets scheduled rehashes finish. Registered with `atexit`."""
+        for state in list(self._states):
+            if state.executor is not None:
+                state.executor.shutdown(wait=True)
+
+
+hash_policy = HashPolicy()
+
+hash_cli = AppGroup('hash', help='Password-hash policy.')
+
+
+@hash_cli.command('calibrate')
+@click.option('--algorithm', type=click.Choice(HASH_ALGORITHMS), default='scrypt', show_default=True)
+@click.option('--target-ms', default=250.0, show_default=True, help='Latency budget for one hash.')
+@click.option('--max-memory-mb', default=64, show_default=True, help='scrypt memory limit per hash.')
+def calibrate_command(algorithm, target_ms, max_memory_mb):
+    """Measures this machine and recommends a PASSWORD_HASH_METHOD."""
+    result = calibrate(algorithm, target_ms, max_memory_mb)
+    click.echo(f"{result['method']} takes {result['hash_ms']:.0f} ms here (budget {target_ms:.0f} ms)")
+    if result['hash_ms'] > target_ms:
+        click.echo('The minimum parameters already exceed the budget; consider more HASH_POOL_WORKERS.')
+    click.echo(f"PASSWORD_HASH_METHOD={result['method']}")
+
+
+@hash_cli.command('status')
+def status_command():
+    """Counts users per stored hash method against the current policy."""
+    hashes = db.session.scalars(select(User.password_hash).execution_options(yield_per=1000))
+    counts = Counter(method_of(pwhash) for pwhash in hashes)
+    policy = current_app.config['PASSWORD_HASH_METHOD']
+    click.echo(f'Policy: {policy}')
+    for method, count in counts.most_common():
+        marker = '' if method == policy else '  (rehashed on next login)'
+        click.echo(f'{count:>8}  {method}{marker}')
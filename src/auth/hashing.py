@@ -0,0 +1,251 @@
+"""
+Bounded worker pool for password hashing.
+
+Werkzeug's scrypt/pbkdf2 hashes are deliberately CPU-heavy. Running them on the
+request thread lets a burst of logins starve every other route on the worker, so
+all hashing goes through a process pool sized to the machine's cores. Admission
+is bounded: once `max_pending` hashes are queued or running, new work is
+rejected immediately with `HashingPoolSaturated` instead of piling up.
+
+If a worker process dies (OOM kill, segfault) the pool is broken for good: the
+hashes it was running fail with `HashingPoolSaturated` like any other
+overload, and the next hash starts a fresh pool.
+"""
+import asyncio
+import atexit
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HashingPoolSaturated(Exception):
+    """Raised when the pool cannot accept (or finish) a hash in time."""
+
+
+def _timed_call(fn, *args):
+    """Runs inside the worker process and reports how long the hash itself took."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+class HashingPool:
+    """
+    Runs password hashing on a process pool with fast-fail admission control.
+    Setting `HASH_POOL_WORKERS = 0` hashes inline on the calling thread, which is
+    handy for debugging but keeps the admission limit and statistics.
+    """
+
+    def __init__(self, app=None):
+        self._executor = None
+        self._atexit_registered = False
+        self._lock = threading.Lock()
+        self.max_workers = os.cpu_count() or 1
+        self.max_pending = self.max_workers * 4
+        self.timeout = 10.0
+        self.method = 'scrypt'
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._reset_stats()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HASH_POOL_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('HASH_POOL_MAX_PENDING', app.config['HASH_POOL_WORKERS'] * 4)
+        app.config.setdefault('HASH_POOL_TIMEOUT', 10.0)
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt')
+        self.configure(workers=app.config['HASH_POOL_WORKERS'],
+                       max_pending=app.config['HASH_POOL_MAX_PENDING'],
+                       timeout=app.config['HASH_POOL_TIMEOUT'],
+                       method=app.config['PASSWORD_HASH_METHOD'])
+        app.extensions['hashing_pool'] = self
+
+    def configure(self, workers: int, max_pending: int, timeout: float, method: str | None = None):
+        """
+        (Re)sizes the pool. A running executor is only replaced if the worker count changed.
+        `method` is the Werkzeug hash method new hashes use (see `src.auth.hash_policy`).
+        """
+        with self._lock:
+            if self._executor is not None and workers != self.max_workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.max_workers = workers
+            self.max_pending = max_pending
+            self.timeout = timeout
+            if method is not None:
+                self.method = method
+            self._slots = threading.BoundedSemaphore(max_pending) if max_pending > 0 else None
+
+    def _reset_stats(self):
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._restarts = 0
+        self._hash_seconds = 0.0
+        self._wait_seconds = 0.0
+        self._max_hash_seconds = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                    if not self._atexit_registered:
+                        atexit.register(self.shutdown)
+                        self._atexit_registered = True
+        return self._executor
+
+    def _admit(self):
+        """Takes a pending slot or raises; returns the callback that gives the slot back."""
+        slots = self._slots
+        if slots is None or not slots.acquire(blocking=False):
+            with self._lock:
+                self._rejected += 1
+            raise HashingPoolSaturated('Too many password hashes are already queued.')
+
+        with self._lock:
+            self._pending += 1
+
+        def release(*_):
+            with self._lock:
+                self._pending -= 1
+            slots.release()
+        return release
+
+    def _record(self, submitted: float, hash_seconds: float):
+        elapsed = time.perf_counter() - submitted
+        with self._lock:
+            self._completed += 1
+            self._hash_seconds += hash_seconds
+            self._wait_seconds += max(elapsed - hash_seconds, 0.0)
+            self._max_hash_seconds = max(self._max_hash_seconds, hash_seconds)
+
+    def _timed_out_error(self) -> HashingPoolSaturated:
+        with self._lock:
+            self._timed_out += 1
+        return HashingPoolSaturated('Password hashing timed out.')
+
+    def _broken_error(self, executor) -> HashingPoolSaturated:
+        """Drops a pool whose worker died, so the next hash builds a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self._restarts += 1
+        executor.shutdown(wait=False)
+        return HashingPoolSaturated('A password hashing worker died.')
+
+    def _submit(self, fn, *args):
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(_timed_call, fn, *args)
+        except BrokenProcessPool:
+            raise self._broken_error(executor)
+
+    def _run(self, fn, *args):
+        release = self._admit()
+        submitted = time.perf_counter()
+
+        if self.max_workers <= 0:
+            try:
+                result, hash_seconds = _timed_call(fn, *args)
+            finally:
+                release()
+        else:
+            try:
+                executor, future = self._submit(fn, *args)
+            except HashingPoolSaturated:
+                release()
+                raise
+            # the slot is held until the hash really finishes, even if the caller gives up
+            future.add_done_callback(release)
+            try:
+                result, hash_seconds = future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                raise self._timed_out_error()
+            except BrokenProcessPool:
+                raise self._broken_error(executor)
+
+        self._record(submitted, hash_seconds)
+        return result
+
+    async def _run_async(self, fn, *args):
+        if self.max_workers <= 0:
+            return self._run(fn, *args)
+
+        release = self._admit()
+        submitted = time.perf_counter()
+        try:
+            executor, future = self._submit(fn, *args)
+        except HashingPoolSaturated:
+            release()
+            raise
+        future.add_done_callback(release)
+        try:
+            result, hash_seconds = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out_error()
+        except BrokenProcessPool:
+            raise self._broken_error(executor)
+
+        self._record(submitted, hash_seconds)
+        return result
+
+    def generate(self, password: str, **kwargs) -> str:
+        """Pool-backed equivalent of `werkzeug.security.generate_password_hash`, using the policy method."""
+        return self._run(_generate_with_options, password, {'method': self.method, **kwargs})
+
+    def check(self, pwhash: str, password: str) -> bool:
+        """Pool-backed equivalent of `werkzeug.security.check_password_hash`."""
+        return self._run(check_password_hash, pwhash, password)
+
+    async def generate_async(self, password: str, **kwargs) -> str:
+        """`generate` for coroutine views: awaits the pool instead of blocking the thread."""
+        return await self._run_async(_generate_with_options, password, {'method': self.method, **kwargs})
+
+    async def check_async(self, pwhash: str, password: str) -> bool:
+        """`check` for coroutine views: awaits the pool instead of blocking the thread."""
+        return await self._run_async(check_password_hash, pwhash, password)
+
+    def stats(self) -> dict:
+        """A snapshot of queue depth and per-hash latency for monitoring."""
+        with self._lock:
+            completed = self._completed
+            return {
+                'workers': self.max_workers,
+                'max_pending': self.max_pending,
+                'queue_depth': self._pending,
+                'completed': completed,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+                'restarts': self._restarts,
+                'hash_seconds_total': self._hash_seconds,
+                'avg_hash_ms': (self._hash_seconds / completed * 1000) if completed else 0.0,
+                'avg_wait_ms': (self._wait_seconds / completed * 1000) if completed else 0.0,
+                'max_hash_ms': self._max_hash_seconds * 1000,
+            }
+
+    def prewarm(self) -> int:
+        """Starts the worker processes now instead of on the first login. Returns how many answered."""
+        if self.max_workers <= 0:
+            return 0
+        executor = self._get_executor()
+        futures = [executor.submit(os.getpid) for _ in range(self.max_workers)]
+        return len({future.result(timeout=self.timeout) for future in futures})
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _generate_with_options(password: str, options: dict) -> str:
+    return generate_password_hash(password, **options)
+
+
+hashing_pool = HashingPool()
@@ -0,0 +1,143 @@
+"""
+Per-worker identity cache for `load_user`.
+
+Flask-Login calls the user loader on every authenticated request. Instead of a
+SELECT per page view, a detached snapshot of each `User` row is kept in a small
+LRU with a TTL. On a hit the snapshot is merged into the request's session with
+`load=False`, which rebuilds a normal persistent instance without touching the DB.
+
+Entries are dropped whenever the row is updated or deleted (mapper events in
+`src.auth.models`) and on logout, so password resets, lockouts and profile
+changes are picked up immediately by this worker. Each invalidation also bumps
+a per-user generation in the shared-state backend (see `src.shared_state`),
+and a snapshot cached under an older generation is treated as a miss, so other
+workers and nodes see the change on their next request instead of after the
+TTL. With the ``memory`` backend the generation is per process and other
+workers still rely on the TTL.
+
+Only `IDENTITY_COLUMNS` are loaded; profile fields load on first access. With
+`IDENTITY_PRINCIPAL` the loader skips the ORM entirely and returns a
+`Principal`: a read-only ``__slots__`` object with just those columns, which is
+cached as-is and never enters the session's identity map.
+"""
+from flask import current_app
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from src.cache import TTLCache
+from src.shared_state import shared_state
+
+
+def detached_copy(instance):
+    """
+    Builds a clean, session-less copy of an ORM instance holding only its loaded
+    column values; columns it never loaded stay unloaded in the copy too.
+    """
+    state = inspect(instance)
+    copy = state.mapper.class_manager.new_instance()
+    for attr in state.mapper.column_attrs:
+        if attr.key in state.dict:
+            setattr(copy, attr.key, state.dict[attr.key])
+    make_transient_to_detached(copy)
+    return copy
+
+
+class Principal:
+    """
+    A compact, read-only `current_user`: the identity columns and the
+    Flask-Login user interface, without the ORM instance state or a ``__dict__``.
+    (`UserMixin` is not a base class because it has no ``__slots__``.)
+    """
+
+    __slots__ = ('id', 'email', 'is_locked', 'session_version')
+
+    is_active = True
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, id: int, email: str, is_locked: bool, session_version: int):
+        object.__setattr__(self, 'id', id)
+        object.__setattr__(self, 'email', email)
+        object.__setattr__(self, 'is_locked', bool(is_locked))
+        object.__setattr__(self, 'session_version', session_version or 0)
+
+    @classmethod
+    def of(cls, user) -> 'Principal':
+        """The principal for a loaded `User` (or another principal)."""
+        return cls(user.id, user.email, user.is_locked, user.session_version)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} is read-only')
+
+    def get_id(self) -> str:
+        return str(self.id)
+
+    def __eq__(self, other):
+        if hasattr(other, 'get_id') and not getattr(other, 'is_anonymous', False):
+            return self.get_id() == other.get_id()
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.email}>'
+
+
+class IdentityCache(TTLCache):
+    """Detached user snapshots keyed by user id."""
+
+
+class IdentityCacheExtension:
+    """Attaches one `IdentityCache` per application, sized from the config."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 1024)
+        app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+        app.config.setdefault('IDENTITY_PRINCIPAL', False)
+        app.extensions['identity_cache'] = IdentityCache(app.config['IDENTITY_CACHE_SIZE'],
+                                                         app.config['IDENTITY_CACHE_TTL'])
+
+    @property
+    def cache(self) -> IdentityCache | None:
+        if not current_app:
+            return None
+        return current_app.extensions.get('identity_cache')
+
+    def generation(self, user_id: int) -> int:
+        """The shared invalidation counter for `user_id`. Read it before loading the row."""
+        value = shared_state.backend.get(f'identity:{user_id}')
+        return int(value) if value else 0
+
+    def get(self, user_id: int):
+        """A cached snapshot, unless some worker invalidated the user since it was stored."""
+        cache = self.cache
+        entry = cache.get(user_id) if cache is not None else None
+        if entry is None:
+            return None
+        generation, snapshot = entry
+        if generation != self.generation(user_id):
+            cache.invalidate(user_id)
+            return None
+        return snapshot
+
+    def put(self, user_id: int, snapshot, generation: int):
+        cache = self.cache
+        if cache is not None:
+            cache.put(user_id, (generation, snapshot))
+
+    def invalidate(self, user_id: int, shared: bool = True):
+        """Drops the local snapshot and, unless `shared` is False, every other worker's."""
+        cache = self.cache
+        if cache is not None:
+            cache.invalidate(user_id)
+            if shared:
+                # outlives every snapshot cached under the old generation
+                shared_state.backend.incr(f'identity:{user_id}', current_app.config['IDENTITY_CACHE_TTL'] + 1)
+
+
+identity_cache = IdentityCacheExtension()
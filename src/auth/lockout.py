@@ -0,0 +1,78 @@
+"""
+Failed-login tracking without writing to the `users` table on every bad password.
+
+Failures are counted in a sliding window keyed by user (``user:<id>``) and by
+client IP (``ip:<address>``). The counters live in the shared-state backend
+(`SHARED_STATE_BACKEND`, see `src.shared_state`), so every worker, and with the
+``redis`` backend every node, sees the same counts.
+
+`User.failed_login_attempts`, `is_locked` and `locked_until` are only written
+when a lock actually trips, so the row stays the durable record of a lockout.
+The trip is a single conditional ``UPDATE`` (`User.lock`) that only matches an
+unlocked row, so concurrent failures crossing the threshold, on any worker,
+lock the account and bump its session version exactly once.
+"""
+from datetime import datetime, timezone, timedelta
+
+from flask import current_app
+
+from src.shared_state import shared_state, StateBackend
+
+
+class LockoutTracker:
+    """Applies `MAX_LOGIN_ATTEMPTS`/`LOCKOUT_DURATION_MINUTES` on top of the shared-state counters."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAX_LOGIN_ATTEMPTS', 5)
+        app.config.setdefault('LOCKOUT_DURATION_MINUTES', 15)
+        app.config.setdefault('LOGIN_ATTEMPT_WINDOW_MINUTES', app.config['LOCKOUT_DURATION_MINUTES'])
+        app.config.setdefault('MAX_LOGIN_ATTEMPTS_PER_IP', 50)
+
+    @property
+    def backend(self) -> StateBackend:
+        return shared_state.backend
+
+    @property
+    def window(self) -> float:
+        return current_app.config['LOGIN_ATTEMPT_WINDOW_MINUTES'] * 60
+
+    def ip_blocked(self, ip_address: str | None) -> bool:
+        """True once an address has sprayed too many failures across any accounts."""
+        if not ip_address:
+            return False
+        return self.backend.count(f'ip:{ip_address}', self.window) >= current_app.config['MAX_LOGIN_ATTEMPTS_PER_IP']
+
+    def register_failure(self, user, ip_address: str | None) -> bool:
+        """
+        Counts a failed attempt. If it reaches the threshold, the account is locked
+        (the caller commits) and True is returned, also when a concurrent request
+        locked it first.
+        """
+        if ip_address:
+            self.backend.hit(f'ip:{ip_address}', self.window)
+        if user is None:
+            return False
+
+        failures = self.backend.hit(f'user:{user.id}', self.window)
+        if failures < current_app.config['MAX_LOGIN_ATTEMPTS']:
+            return False
+
+        until = datetime.now(timezone.utc) + timedelta(minutes=current_app.config['LOCKOUT_DURATION_MINUTES'])
+        # one conditional UPDATE: of concurrent failures past the threshold only the first locks
+        user.lock(failures, until)
+        # the row now carries the lock; start counting afresh once it expires
+        self.backend.reset(f'user:{user.id}')
+        return True
+
+    def failures(self, user) -> int:
+        return self.backend.count(f'user:{user.id}', self.window)
+
+    def reset(self, user):
+        self.backend.reset(f'user:{user.id}')
+
+
+lockout_tracker = LockoutTracker()
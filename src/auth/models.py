@@ -2,9 +2,12 @@ from src.extensions import db
 from flask_login import UserMixin
 from datetime import datetime, timezone
 from typing import Optional
+import base64
+import binascii
 
-from flask import current_app
-from itsdangerous import URLSafeTimedSerializer as Serializer
+from sqlalchemy import select, tuple_, update, or_
+from sqlalchemy.orm import load_only, object_session
+from sqlalchemy.orm.attributes import set_committed_value
 
 class BaseModel(db.Model):
     """An Abstract base model"""
@@ -27,6 +30,8 @@ class User(UserMixin, BaseModel):
     failed_login_attempts = db.Column(db.Integer, default=0)
     is_locked = db.Column(db.Boolean, default=False)
     locked_until = db.Column(db.DateTime(timezone=True), nullable=True)
+    # bumped to revoke every signed session claim issued for this user
+    session_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     # profile data
     username = db.Column(db.String(50), unique=True, nullable=True)
@@ -38,22 +43,135 @@ class User(UserMixin, BaseModel):
     def __repr__(self):
         return f'<User {self.email}>'
 
+    @classmethod
+    def create_if_absent(cls, email: str, password_hash: str) -> Optional[int]:
+        """
+        Registers a new account in one INSERT guarded by the unique email index.
+        Returns the new id, or None if the email is already taken. The caller commits.
+        """
+        from src.database import insert_ignoring_conflicts
+        now = datetime.now(timezone.utc)
+        inserted = insert_ignoring_conflicts(db.session, cls, [{
+            'email': email,
+            'password_hash': password_hash,
+            'failed_login_attempts': 0,
+            'is_locked': False,
+            'session_version': 0,
+            'created_at': now,
+            'updated_at': now,
+        }], ['email'])
+        return inserted[0] if inserted else None
+
+    @classmethod
+    def for_login(cls, email: str) -> Optional['User']:
+        """The account behind a login attempt, loading only `LOGIN_COLUMNS`."""
+        query = select(cls).options(load_only(*LOGIN_COLUMNS)).filter_by(email=email).limit(1)
+        return db.session.scalars(query).first()
+
+    def revoke_sessions(self):
+        """Invalidates all outstanding session claims (password reset, lockout)."""
+        self.session_version = User.session_version + 1
+
+    def lock(self, failures: int, until: datetime) -> bool:
+        """
+        Locks the account and revokes its sessions in one conditional UPDATE, unless a
+        lock is already in force, so failures racing past the threshold lock it once.
+        Returns True if this call locked it. The caller commits.
+        """
+        cls = type(self)
+        now = datetime.now(timezone.utc)
+        statement = (
+            update(cls)
+            .where(cls.id == self.id)
+            .where(or_(cls.is_locked.isnot(True), cls.locked_until.is_(None), cls.locked_until <= now))
+            .values(failed_login_attempts=failures, is_locked=True, locked_until=until,
+                    session_version=cls.session_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        session = db.session
+        if session.get_bind(mapper=cls.__mapper__).dialect.update_returning:
+            row = session.execute(statement.returning(cls.session_version)).first()
+            if row is None:
+                return False
+            set_committed_value(self, 'session_version', row.session_version)
+        else:
+            # e.g. SQLite before 3.35: the new session version is loaded when next read
+            if not session.execute(statement).rowcount:
+                return False
+            # expired in whichever session holds the instance, which need not be this one
+            owner = object_session(self)
+            if owner is not None:
+                owner.expire(self, ['session_version'])
+        # keep the loaded instance in step without a SELECT
+        for key, value in (('failed_login_attempts', failures), ('is_locked', True), ('locked_until', until)):
+            set_committed_value(self, key, value)
+        _note_user_change(session, self.id, revoked=True)
+        return True
+
     def get_reset_token(self) -> str:
         """Generates a cryptographically sign token containing the user ID"""
-        s = Serializer( current_app.config['SECRET_KEY'])
-        return s.dumps({'user_id':self.id})
+        from src.auth.reset_tokens import reset_tokens
+        return reset_tokens.issue(self.id)
     @staticmethod
-    def verify_reset_token(token:str, expires_sec: int = 1800) -> Optional['User']:
-        """Verifies the token and returns the user if it is valid and not expired."""
-        s = Serializer( current_app.config['SECRET_KEY'])
-        try:
-            user_id = s.loads(token, max_age=expires_sec)['user_id']
-        except Exception:
+    def verify_reset_token(token:str, expires_sec: int | None = None) -> Optional['User']:
+        """
+        Verifies the token and returns the user if it is valid, not expired and not yet used.
+        `expires_sec` defaults to (and is capped by) `RESET_TOKEN_MAX_AGE`.
+        """
+        from src.auth.reset_tokens import reset_tokens
+        user_id = reset_tokens.verify(token, max_age=expires_sec)
+        if user_id is None:
             return None
-        #return User.query.get(user_id)
         return db.session.get(User, user_id)
 
 
+# Column groups for the hot paths; everything else (profile fields, timestamps) loads on first access
+LOGIN_COLUMNS = (User.id, User.email, User.password_hash, User.failed_login_attempts, User.is_locked,
+                 User.locked_until, User.session_version)
+# in `Principal` argument order
+IDENTITY_COLUMNS = (User.id, User.email, User.is_locked, User.session_version)
+
+
+class UsedResetToken(db.Model):
+    """
+    SHA-256 digest of a consumed password-reset token (see `src.auth.reset_tokens`).
+    Kept only until the token would have expired anyway.
+    """
+    __tablename__ = "used_reset_tokens"
+
+    digest = db.Column(db.String(64), primary_key=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
+    def __repr__(self):
+        return f'<UsedResetToken {self.digest[:12]}>'
+
+
+class OutboxEmail(BaseModel):
+    """
+    A queued outbound email (see `src.mail`). Rows are written by the request and
+    delivered in batches by the mail worker, so nothing is lost if SMTP is down.
+    """
+    __tablename__ = "mail_outbox"
+
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text, nullable=False)
+
+    # 'pending' until delivered ('sent') or out of attempts ('failed')
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # the row is due at this time; a worker claims a batch by pushing it into the future
+    next_attempt_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                                default=lambda: datetime.now(timezone.utc))
+    last_error = db.Column(db.String(255), nullable=True)
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (db.Index('ix_mail_outbox_due', 'status', 'next_attempt_at'),)
+
+    def __repr__(self):
+        return f'<OutboxEmail {self.id} to {self.recipient}: {self.status}>'
+
+
 class AuditLog(BaseModel):
     """
     Tracks historical authentication events for security auditing.
@@ -69,6 +187,89 @@ class AuditLog(BaseModel):
     def __repr__(self):
         return f'<AuditLog {self.user_id} - Success: {self.was_successful}>'
 
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'ip_address': self.ip_address,
+            'was_successful': self.was_successful,
+        }
+
+    @staticmethod
+    def encode_cursor(log: 'AuditLog') -> str:
+        """An opaque keyset cursor pointing just past `log`."""
+        raw = f"{log.created_at.isoformat()}|{log.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, int]:
+        """Reverses `encode_cursor`. Raises ValueError on malformed input."""
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            created_at, log_id = raw.rsplit('|', 1)
+            return datetime.fromisoformat(created_at), int(log_id)
+        except (binascii.Error, UnicodeDecodeError) as e:
+            raise ValueError('Malformed cursor') from e
+
+    @classmethod
+    def history_query(cls, user_id: int, cursor: Optional[str] = None, limit: int = 20,
+                      since: Optional[datetime] = None):
+        """
+        The SELECT behind `history_page`, for callers that execute it themselves
+        (e.g. on the async engine). It fetches `limit + 1` rows; pass them to `split_page`.
+        """
+        query = select(cls).where(cls.user_id == user_id)
+        if since is not None:
+            query = query.where(cls.created_at >= since)
+        if cursor:
+            created_at, log_id = cls.decode_cursor(cursor)
+            query = query.where(tuple_(cls.created_at, cls.id) < tuple_(created_at, log_id))
+
+        # fetch one extra row to learn whether another page exists
+        return query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1)
+
+    @classmethod
+    def split_page(cls, rows: list['AuditLog'], limit: int) -> tuple[list['AuditLog'], Optional[str]]:
+        items = rows[:limit]
+        next_cursor = cls.encode_cursor(items[-1]) if len(rows) > limit else None
+        return items, next_cursor
+
+    @classmethod
+    def history_page(cls, user_id: int, cursor: Optional[str] = None, limit: int = 20,
+                     since: Optional[datetime] = None) -> tuple[list['AuditLog'], Optional[str]]:
+        """
+        Returns one page of a user's events, newest first, plus the cursor for the next page.
+        Uses keyset pagination on (created_at, id) so every page is an index range scan.
+        `since` bounds the scan to recent partitions. A page that runs past the hot table
+        continues into the SQLite archive tables written by `flask audit rotate`.
+        """
+        rows = db.session.scalars(cls.history_query(user_id, cursor, limit, since)).all()
+        if len(rows) <= limit:
+            from src.auth.retention import archived_history
+            before = (rows[-1].created_at, rows[-1].id) if rows else (cls.decode_cursor(cursor) if cursor else None)
+            rows += archived_history(db.session, user_id, limit + 1 - len(rows), before, since)
+        return cls.split_page(rows, limit)
+
+
+# Matches the dashboard/history access pattern: one user's events, newest first
+db.Index('ix_audit_logs_user_history', AuditLog.user_id, AuditLog.created_at.desc(), AuditLog.id)
+
+
+class AuditDailyRollup(db.Model):
+    """
+    Per-user, per-day login counts that replace raw `AuditLog` rows once they age
+    past the retention window (see `flask audit compact`).
+    """
+    __tablename__ = "audit_daily_rollups"
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    success_count = db.Column(db.Integer, nullable=False, default=0)
+    failure_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<AuditDailyRollup {self.user_id} {self.day}: {self.success_count}/{self.failure_count}>'
+
 
 
 
@@ -76,8 +277,84 @@ class AuditLog(BaseModel):
 # This tells Flask-Login how to find a user in the database using the ID from the cookie
 
 from src.extensions import login_manager
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session as SQLAlchemySession
+from src.auth.identity import identity_cache, detached_copy, Principal
+from src.auth import claims
 
 @login_manager.user_loader
-def load_user(user_id) -> Optional[User]:
-    """Retrieves a user by their ID from the encrypted session cookie."""
-    return User.query.get(int(user_id))
+def load_user(user_id) -> Optional[User | Principal]:
+    """Retrieves a user by their ID from the encrypted session cookie, via the identity cache."""
+    user_id = int(user_id)
+    # safe requests with fresh signed claims never touch the users table
+    principal = claims.fast_principal(user_id)
+    if principal is not None:
+        return principal
+
+    snapshot = identity_cache.get(user_id)
+    if current_app.config['IDENTITY_PRINCIPAL']:
+        # immutable, so the cached principal itself is handed out
+        user = snapshot
+        if user is None:
+            generation = identity_cache.generation(user_id)
+            row = db.session.execute(select(*IDENTITY_COLUMNS).where(User.id == user_id)).first()
+            if row is not None:
+                user = Principal(*row)
+                identity_cache.put(user_id, user, generation)
+    elif snapshot is not None:
+        # rebuild a session-bound instance from the snapshot without a SELECT
+        user = db.session.merge(snapshot, load=False)
+    else:
+        # read before the row: an invalidation racing the SELECT then makes this snapshot stale
+        generation = identity_cache.generation(user_id)
+        user = db.session.get(User, user_id, options=[load_only(*IDENTITY_COLUMNS)])
+        if user is not None:
+            identity_cache.put(user_id, detached_copy(user), generation)
+
+    if user is not None and not claims.validate(user):
+        return None # the session version was bumped: treat the session as revoked
+    return user
+
+
+# Any write to a user row (password reset, lockout, profile edits) drops its cached identity.
+# Other workers are told once the change is committed, so they can't re-cache the old row.
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_cached_identity(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        _note_user_change(session, target.id)
+    else:
+        identity_cache.invalidate(target.id, shared=False)
+
+def _note_user_change(session, user_id: int, revoked: bool = False):
+    """Drops this worker's snapshot now; the commit tells the others (also used by bulk UPDATEs)."""
+    identity_cache.invalidate(user_id, shared=False)
+    session.info.setdefault('changed_users', set()).add(user_id)
+    if revoked:
+        session.info.setdefault('revoked_users', set()).add(user_id)
+
+@event.listens_for(User, 'before_update')
+def _note_session_revocation(mapper, connection, target):
+    # the history is gone by after_update once the SQL expression has been executed
+    session = object_session(target)
+    if session is not None and inspect(target).attrs.session_version.history.has_changes():
+        session.info.setdefault('revoked_users', set()).add(target.id)
+
+@event.listens_for(SQLAlchemySession, 'after_commit')
+def _publish_user_changes(session):
+    changed = session.info.pop('changed_users', ())
+    revoked = session.info.pop('revoked_users', ())
+    if not has_app_context():
+        return
+    for user_id in changed:
+        identity_cache.invalidate(user_id)
+    if claims.enabled():
+        for user_id in revoked:
+            claims.publish_revocation(user_id)
+
+@event.listens_for(SQLAlchemySession, 'after_rollback')
+def _forget_user_changes(session):
+    session.info.pop('changed_users', None)
+    session.info.pop('revoked_users', None)
@@ -0,0 +1,134 @@
+"""
+Password-reset tokens: cached serializer, verified-token cache and single-use ledger.
+
+* The `URLSafeTimedSerializer` is built once per app (rebuilt only if
+  `SECRET_KEY` changes) instead of on every verification.
+* Verified tokens are kept in a bounded LRU keyed by the token's SHA-256 digest,
+  so repeat visits to the reset page skip the signature check and the database.
+* A token is consumed by inserting its digest into `used_reset_tokens` in the
+  same transaction as the password change. The primary key turns that insert
+  into the single-use check: two concurrent submissions cannot both succeed, and
+  a replay is rejected by a primary-key lookup (then from the cache), never by
+  loading the user. Ledger rows are only needed until the token would have
+  expired anyway; `flask reset-tokens purge` deletes the rest. For that reason
+  no caller may verify with a `max_age` above `RESET_TOKEN_MAX_AGE`.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from itsdangerous import URLSafeTimedSerializer as Serializer, BadData
+from sqlalchemy import delete
+
+from src.cache import TTLCache
+from src.extensions import db
+from src.database import insert_ignoring_conflicts
+from src.auth.models import UsedResetToken
+
+
+def token_digest(token: str) -> str:
+    # only digests are stored: a leaked ledger must not contain usable tokens
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class _ResetTokenState:
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.secret = None
+        self.serializer = None
+
+
+class ResetTokens:
+    """Issues, verifies and consumes password-reset tokens for the current app."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESET_TOKEN_MAX_AGE', 1800)
+        app.config.setdefault('RESET_TOKEN_CACHE_SIZE', 1024)
+        app.config.setdefault('RESET_TOKEN_CACHE_TTL', 60)
+        app.extensions['reset_tokens'] = _ResetTokenState(
+            TTLCache(app.config['RESET_TOKEN_CACHE_SIZE'], app.config['RESET_TOKEN_CACHE_TTL']))
+
+    @property
+    def _state(self) -> _ResetTokenState:
+        return current_app.extensions['reset_tokens']
+
+    @property
+    def cache(self) -> TTLCache:
+        return self._state.cache
+
+    def serializer(self) -> Serializer:
+        state = self._state
+        secret = current_app.config['SECRET_KEY']
+        if state.secret != secret:
+            state.serializer, state.secret = Serializer(secret), secret
+        return state.serializer
+
+    def issue(self, user_id: int) -> str:
+        return self.serializer().dumps({'user_id': user_id})
+
+    def verify(self, token: str, max_age: int | None = None) -> int | None:
+        """
+        The user id of a valid, unexpired, unconsumed token, else None. Never touches `users`.
+        `max_age` defaults to, and may not exceed, `RESET_TOKEN_MAX_AGE`.
+        """
+        limit = current_app.config['RESET_TOKEN_MAX_AGE']
+        if max_age is None:
+            max_age = limit
+        elif max_age > limit:
+            # the ledger only remembers a used token for RESET_TOKEN_MAX_AGE; a longer age would allow replays
+            raise ValueError(f'max_age {max_age} exceeds RESET_TOKEN_MAX_AGE ({limit})')
+        digest = token_digest(token)
+        entry = self.cache.get(digest)
+        if entry is None:
+            try:
+                payload, issued_at = self.serializer().loads(token, return_timestamp=True)
+                user_id = int(payload['user_id'])
+            except (BadData, KeyError, TypeError, ValueError):
+                return None
+            consumed = db.session.get(UsedResetToken, digest) is not None
+            entry = (user_id, issued_at.timestamp(), consumed)
+            self.cache.put(digest, entry)
+
+        user_id, issued_at, consumed = entry
+        if consumed or time.time() - issued_at > max_age:
+            return None
+        return user_id
+
+    def consume(self, token: str) -> bool:
+        """
+        Records the token as used in the current transaction (the caller commits).
+        Returns False if another request already consumed it.
+        """
+        digest = token_digest(token)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=current_app.config['RESET_TOKEN_MAX_AGE'])
+        inserted = insert_ignoring_conflicts(db.session, UsedResetToken,
+                                             [{'digest': digest, 'expires_at': expires_at}], ['digest'])
+        # the next verify re-reads the ledger and caches the token as consumed
+        self.cache.invalidate(digest)
+        return bool(inserted)
+
+    def purge(self, now: datetime | None = None) -> int:
+        """Deletes ledger rows for tokens that have expired anyway. The caller commits."""
+        now = now or datetime.now(timezone.utc)
+        result = db.session.execute(delete(UsedResetToken).where(UsedResetToken.expires_at < now))
+        return max(result.rowcount, 0)
+
+
+reset_tokens = ResetTokens()
+
+tokens_cli = AppGroup('reset-tokens', help='Password-reset token ledger maintenance.')
+
+
+@tokens_cli.command('purge')
+def purge_command():
+    """Deletes consumed-token records whose tokens have expired."""
+    count = reset_tokens.purge()
+    db.session.commit()
+    click.echo(f'Purged {count} expired reset-token records')
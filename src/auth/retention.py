@@ -0,0 +1,266 @@
+"""
+Monthly partitioning, retention and rollups for `audit_logs`.
+
+* PostgreSQL: `audit_logs` is natively partitioned by month on `created_at`
+  (migration 7d2e4a9c1b3f). `flask audit rotate` creates the upcoming monthly
+  partitions ahead of time; anything else lands in `audit_logs_default`. If
+  rotate ran late, the missed months' rows are moved out of the default
+  partition into their own partitions first.
+* SQLite: `audit_logs` is the hot table. `flask audit rotate` moves months older
+  than the hot window into indexed `audit_logs_YYYY_MM` archive tables.
+  `AuditLog.history_page` continues into them (`archived_history`) once a page
+  runs past the hot table, so `/dashboard/history` still pages through
+  everything.
+
+`flask audit compact` folds every raw event older than `AUDIT_RETENTION_DAYS`
+into `audit_daily_rollups` (per user and day) and then deletes it, dropping whole
+partitions/archive tables where possible. The dashboard only reads the hot window
+(`AUDIT_HOT_MONTHS`), so it never scans cold months.
+"""
+import re
+from datetime import datetime, timezone, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import text, bindparam, DateTime, select, table, column, tuple_
+
+from src.extensions import db
+
+AUDIT_TABLE = 'audit_logs'
+_PARTITION_RE = re.compile(r'^audit_logs_(\d{4})_(\d{2})$')
+
+
+def month_start(moment: datetime, offset: int = 0) -> datetime:
+    """The first instant (UTC) of the month `offset` months away from `moment`."""
+    month_index = moment.year * 12 + moment.month - 1 + offset
+    return datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(month: datetime) -> str:
+    return f'{AUDIT_TABLE}_{month.year:04d}_{month.month:02d}'
+
+
+def partition_month(name: str) -> datetime | None:
+    match = _PARTITION_RE.match(name)
+    if match is None:
+        return None
+    return datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+
+
+def hot_window_start(now: datetime | None = None) -> datetime:
+    """Oldest timestamp the dashboard reads: the start of the month `AUDIT_HOT_MONTHS` ago."""
+    now = now or datetime.now(timezone.utc)
+    return month_start(now, -current_app.config['AUDIT_HOT_MONTHS'])
+
+
+def _cutoff_param(sql: str):
+    return text(sql).bindparams(bindparam('cutoff', type_=DateTime(timezone=True)))
+
+
+def _range_params(sql: str):
+    return text(sql).bindparams(bindparam('start', type_=DateTime(timezone=True)),
+                                bindparam('end', type_=DateTime(timezone=True)))
+
+
+def _is_postgres(conn) -> bool:
+    return conn.dialect.name == 'postgresql'
+
+
+def _is_partitioned(conn) -> bool:
+    if not _is_postgres(conn):
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {'table': AUDIT_TABLE}).first() is not None
+
+
+def _monthly_tables(conn) -> list[str]:
+    """Monthly partitions (PostgreSQL) or archive tables (SQLite), oldest first."""
+    if _is_postgres(conn):
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ), {'table': AUDIT_TABLE})
+    else:
+        rows = conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'audit_logs_%'"))
+    return sorted(name for (name,) in rows if partition_month(name) is not None)
+
+
+def _create_partition(conn, name: str, start: datetime):
+    default = f'{AUDIT_TABLE}_default'
+    params = {'start': start, 'end': month_start(start, 1)}
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{params['end'].isoformat()}')"
+    stranded = conn.execute(_range_params(
+        f"SELECT 1 FROM {default} WHERE created_at >= :start AND created_at < :end LIMIT 1"
+    ), params).first()
+    if stranded is None:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {AUDIT_TABLE} {bounds}"))
+        return
+    # the default partition holds rows for this month, which would make CREATE ... PARTITION OF
+    # fail: move them into a standalone table first, then attach it
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {AUDIT_TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(_range_params(
+        f"WITH moved AS (DELETE FROM {default} WHERE created_at >= :start AND created_at < :end RETURNING *) "
+        f"INSERT INTO {name} SELECT * FROM moved"
+    ), params)
+    conn.execute(text(f"ALTER TABLE {AUDIT_TABLE} ATTACH PARTITION {name} {bounds}"))
+
+
+def ensure_partitions(conn, now: datetime, months_ahead: int) -> list[str]:
+    """
+    Creates native monthly partitions up to `months_ahead` from now, starting at
+    the oldest month stranded in the default partition (PostgreSQL only).
+    """
+    if not _is_partitioned(conn):
+        return []
+    existing = set(_monthly_tables(conn))
+    oldest = conn.execute(text(f"SELECT MIN(created_at) FROM {AUDIT_TABLE}_default")).scalar()
+    month = month_start(min(oldest, now) if oldest is not None else now)
+    created = []
+    while month <= month_start(now, months_ahead):
+        name = partition_name(month)
+        if name not in existing:
+            _create_partition(conn, name, month)
+            created.append(name)
+        month = month_start(month, 1)
+    return created
+
+
+def rotate_archives(conn, now: datetime, hot_months: int) -> dict[str, int]:
+    """Moves months older than the hot window out of `audit_logs` into archive tables (SQLite only)."""
+    if _is_postgres(conn):
+        return {}
+    boundary = month_start(now, -hot_months)
+    oldest = conn.execute(_cutoff_param(
+        f"SELECT MIN(created_at) FROM {AUDIT_TABLE} WHERE created_at < :cutoff"
+    ), {'cutoff': boundary}).scalar()
+    if oldest is None:
+        return {}
+    if isinstance(oldest, str):
+        oldest = datetime.fromisoformat(oldest)
+
+    moved = {}
+    month = month_start(oldest)
+    while month < boundary:
+        name = partition_name(month)
+        params = {'start': month, 'end': month_start(month, 1)}
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} AS SELECT * FROM {AUDIT_TABLE} WHERE 0"))
+        # the same access path as ix_audit_logs_user_history, for archived_history
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_user_history ON {name} (user_id, created_at DESC, id)"))
+        conn.execute(_range_params(
+            f"INSERT INTO {name} SELECT * FROM {AUDIT_TABLE} WHERE created_at >= :start AND created_at < :end"
+        ), params)
+        result = conn.execute(_range_params(
+            f"DELETE FROM {AUDIT_TABLE} WHERE created_at >= :start AND created_at < :end"
+        ), params)
+        if result.rowcount:
+            moved[name] = result.rowcount
+        month = month_start(month, 1)
+    return moved
+
+
+def archived_history(session, user_id: int, limit: int, before: tuple[datetime, int] | None = None,
+                     since: datetime | None = None) -> list:
+    """
+    A user's events from the SQLite archive tables, newest first, as transient
+    `AuditLog` objects. `before` is the (created_at, id) keyset bound a page
+    continues from. On PostgreSQL the partitions are part of `audit_logs`, so
+    this is always empty.
+    """
+    from src.auth.models import AuditLog
+    if since is not None and since >= hot_window_start():
+        # rotate only archives months older than the hot window
+        return []
+    conn = session.connection()
+    if _is_postgres(conn):
+        return []
+    logs = []
+    # archive tables cover disjoint months, all older than the hot table
+    for name in reversed(_monthly_tables(conn)):
+        if len(logs) >= limit:
+            break
+        if since is not None and month_start(partition_month(name), 1) <= since:
+            break
+        archive = table(name, *(column(c.name, c.type) for c in AuditLog.__table__.columns))
+        query = select(*archive.c).where(archive.c.user_id == user_id)
+        if since is not None:
+            query = query.where(archive.c.created_at >= since)
+        if before is not None:
+            query = query.where(tuple_(archive.c.created_at, archive.c.id) < tuple_(*before))
+        query = query.order_by(archive.c.created_at.desc(), archive.c.id.desc()).limit(limit - len(logs))
+        # not attached to the session: archived ids may repeat ids in the hot table
+        logs += [AuditLog(**row._mapping) for row in conn.execute(query)]
+    return logs
+
+
+def _roll_up(conn, table: str, cutoff: datetime) -> int:
+    """Adds the per-user/day counts of `table` rows older than `cutoff` into the rollup table."""
+    result = conn.execute(_cutoff_param(f"""
+        INSERT INTO audit_daily_rollups (user_id, day, success_count, failure_count)
+        SELECT user_id, date(created_at),
+               SUM(CASE WHEN was_successful THEN 1 ELSE 0 END),
+               SUM(CASE WHEN was_successful THEN 0 ELSE 1 END)
+        FROM {table}
+        WHERE created_at < :cutoff
+        GROUP BY user_id, date(created_at)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            success_count = audit_daily_rollups.success_count + excluded.success_count,
+            failure_count = audit_daily_rollups.failure_count + excluded.failure_count
+    """), {'cutoff': cutoff})
+    return max(result.rowcount, 0)
+
+
+def compact(conn, cutoff: datetime) -> dict[str, int]:
+    """
+    Rolls every raw event older than `cutoff` into `audit_daily_rollups` and removes it.
+    Monthly tables that end before the cutoff are dropped whole instead of row by row.
+    """
+    summary = {'rollup_rows': 0, 'deleted_rows': 0, 'dropped_tables': 0}
+    sources = _monthly_tables(conn) + [AUDIT_TABLE]
+    if _is_partitioned(conn):
+        sources.append(f'{AUDIT_TABLE}_default')
+        sources.remove(AUDIT_TABLE) # the parent holds no rows of its own
+
+    for table in sources:
+        month = partition_month(table)
+        whole_table = month is not None and month_start(month, 1) <= cutoff
+        summary['rollup_rows'] += _roll_up(conn, table, cutoff)
+        if whole_table:
+            count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            conn.execute(text(f"DROP TABLE {table}"))
+            summary['deleted_rows'] += count
+            summary['dropped_tables'] += 1
+        else:
+            result = conn.execute(_cutoff_param(f"DELETE FROM {table} WHERE created_at < :cutoff"), {'cutoff': cutoff})
+            summary['deleted_rows'] += max(result.rowcount, 0)
+    return summary
+
+
+audit_cli = AppGroup('audit', help='Audit log partitioning and retention.')
+
+
+@audit_cli.command('rotate')
+@click.option('--months-ahead', default=2, show_default=True, help='Future partitions to pre-create (PostgreSQL).')
+def rotate_command(months_ahead):
+    """Creates upcoming partitions (PostgreSQL) or archives cold months (SQLite)."""
+    now = datetime.now(timezone.utc)
+    with db.engine.begin() as conn:
+        created = ensure_partitions(conn, now, months_ahead)
+        moved = rotate_archives(conn, now, current_app.config['AUDIT_HOT_MONTHS'])
+    for name in created:
+        click.echo(f'Created partition {name}')
+    for name, count in moved.items():
+        click.echo(f'Archived {count} events into {name}')
+
+
+@audit_cli.command('compact')
+@click.option('--older-than-days', type=int, default=None, help='Defaults to AUDIT_RETENTION_DAYS.')
+def compact_command(older_than_days):
+    """Rolls old events into per-user/day counts and deletes the raw rows."""
+    days = older_than_days if older_than_days is not None else current_app.config['AUDIT_RETENTION_DAYS']
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    with db.engine.begin() as conn:
+        summary = compact(conn, cutoff)
+    click.echo(f"Compacted {summary['deleted_rows']} events older than {cutoff:%Y-%m-%d} into "
+               f"{summary['rollup_rows']} daily rollups ({summary['dropped_tables']} tables dropped)")
@@ -1,122 +1,170 @@
+import asyncio
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, current_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timezone, timedelta
+from datetime import datetime, timezone
 
 from src.extensions import db
-from src.auth.models import User, AuditLog
+from src.auth.models import User
 from src.auth.forms import RegistrationForm, LoginForm, RequestResetForm, ResetPasswordForm
+from src.auth.hashing import hashing_pool, HashingPoolSaturated
+from src.auth.hash_policy import hash_policy
+from src.auth.audit import audit_sink
+from src.auth.lockout import lockout_tracker
+from src.auth.identity import identity_cache, Principal
+from src.auth.reset_tokens import reset_tokens
+from src.auth import claims
+from src.metrics import metrics
+from src.mail import mailer
 
 auth_bp = Blueprint('auth',__name__,url_prefix='/auth')
 
-@auth_bp.route('/register',methods=['GET','POST'])
-def register():
+@auth_bp.errorhandler(HashingPoolSaturated)
+def hashing_overloaded(error):
+    """Shed load cheaply instead of queueing behind a credential-stuffing wave."""
+    current_app.logger.warning(f"Hashing pool rejected work: {error}")
+    if request.endpoint == 'auth.login':
+        metrics.count_login('overloaded')
+    return 'The service is busy, please try again shortly.', 503, {'Retry-After': '1'}
+
+def _register_prelude():
+    """Everything before hashing. Returns (form, response); a response short-circuits."""
     if current_user.is_authenticated:
-        return redirect(url_for('main.index'))  # home
+        return None, redirect(url_for('main.index'))  # home
 
     form = RegistrationForm()
-    if form.validate_on_submit():
-        existing_user = User.query.filter_by(email=form.email.data).first()
-        if existing_user:
-            flash('Email address is already registered.','danger')
-            return redirect(url_for('auth.register'))
-
-        # Replace the db.session.add block with this:
-        try:
-            hashed_pw = generate_password_hash(form.password.data)
-            new_user = User(email=form.email.data, password_hash=hashed_pw)
-            db.session.add(new_user)
-            db.session.commit()
-            flash('Account created successfully! Please log in.', 'success')
-            return redirect(url_for('auth.login'))
-        except Exception as e:
-            db.session.rollback() # Concern #2: Unbounded Transaction Fix
-            flash('An error occurred while creating your account.', 'danger')
-            return redirect(url_for('auth.register'))
+    if not form.validate_on_submit():
+        return form, render_template('auth/register.html',form=form)
+    return form, None
+
+def _register_finish(form, hashed_pw: str):
+    try:
+        # one round-trip: the unique email index decides whether the account is new
+        new_user_id = User.create_if_absent(form.email.data, hashed_pw)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback() # Concern #2: Unbounded Transaction Fix
+        flash('An error occurred while creating your account.', 'danger')
+        return redirect(url_for('auth.register'))
 
+    if new_user_id is not None:
+        flash('Account created successfully! Please log in.', 'success')
+        return redirect(url_for('auth.login'))
+    form.email_taken()
     return render_template('auth/register.html',form=form)
 
-@auth_bp.route('/login', methods=['GET', 'POST'])
-def login():
+@auth_bp.route('/register',methods=['GET','POST'])
+def register():
+    form, response = _register_prelude()
+    if response is not None:
+        return response
+    # hash outside the try block so an overloaded pool surfaces as a 503
+    hashed_pw = hashing_pool.generate(form.password.data)
+    return _register_finish(form, hashed_pw)
+
+async def register_async():
+    """`register` for ASYNC_MODE (see src/aio.py)."""
+    form, response = await asyncio.to_thread(_register_prelude)
+    if response is not None:
+        return response
+    hashed_pw = await hashing_pool.generate_async(form.password.data)
+    return await asyncio.to_thread(_register_finish, form, hashed_pw)
+
+def _login_prelude():
+    """Everything before the password check. Returns (form, user, response); a response short-circuits."""
     if current_user.is_authenticated:
-        return redirect(url_for('main.dashboard'))
+        return None, None, redirect(url_for('main.dashboard'))
+
+    # Spraying many accounts from one address is throttled before the form is parsed or any hashing
+    if request.method == 'POST' and lockout_tracker.ip_blocked(request.remote_addr):
+        metrics.count_login('throttled')
+        flash('Too many failed attempts. Please try again later.', 'danger')
+        return None, None, redirect(url_for('auth.login'))
 
     form = LoginForm()
+    if not form.validate_on_submit():
+        return form, None, render_template('auth/login.html', form=form)
+
+    user = User.for_login(form.email.data)
+
+    # Lockout check
+    if user and user.is_locked:
+        if user.locked_until:
+            # FIX: SQLite strips timezones. Add UTC back if it is missing!
+            lock_expiration = user.locked_until
+            if lock_expiration.tzinfo is None:
+                lock_expiration = lock_expiration.replace(tzinfo=timezone.utc)
+
+            if datetime.now(timezone.utc) < lock_expiration:
+                # Still locked! Calculate remaining minutes
+                time_left = lock_expiration - datetime.now(timezone.utc)
+                minutes = int(time_left.total_seconds() // 60) + 1
+                metrics.count_login('locked')
+                flash(f'Account locked. Try again in {minutes} minutes.', 'danger')
+                return form, None, redirect(url_for('auth.login'))
+            # An expired lock is simply ignored here; the row is cleared by the next successful login
+
+    return form, user, None
+
+def _login_finish(form, user, password_ok: bool):
+    if password_ok:
+        try:
+            user.last_login = datetime.now(timezone.utc)
+            user.failed_login_attempts = 0
+            user.is_locked = False
+            user.locked_until = None
+            lockout_tracker.reset(user)
+            # before the commit, which expires the loaded password_hash
+            hash_policy.maybe_rehash(user.id, user.password_hash, form.password.data)
+
+            audit_sink.record(user.id, request.remote_addr, was_successful=True)
+            # taken before the commit expires the row, so logging in needs no refresh SELECT
+            principal = Principal.of(user)
+            db.session.commit()
 
-    if form.validate_on_submit():
-        user = User.query.filter_by(email=form.email.data).first()
-
-        # Lockout check
-        if user and user.is_locked:
-            if user.locked_until:
-                # FIX: SQLite strips timezones. Add UTC back if it is missing!
-                lock_expiration = user.locked_until
-                if lock_expiration.tzinfo is None:
-                    lock_expiration = lock_expiration.replace(tzinfo=timezone.utc)
-
-                if datetime.now(timezone.utc) < lock_expiration:
-                    # Still locked! Calculate remaining minutes
-                    time_left = lock_expiration - datetime.now(timezone.utc)
-                    minutes = int(time_left.total_seconds() // 60) + 1
-                    flash(f'Account locked. Try again in {minutes} minutes.', 'danger')
-                    return redirect(url_for('auth.login'))
-                else:
-                    # unlock account
-                    user.is_locked = False
-                    user.failed_login_attempts = 0
-                    user.locked_until = None
-                    db.session.commit()
-
-
-        # Password check
-        if user and check_password_hash(user.password_hash,form.password.data):
+            login_user(principal)
+            if claims.enabled():
+                claims.issue(principal)
+            metrics.count_login('success')
+            flash('Welcome back!','success')
+            return redirect(url_for('main.dashboard'))
+        except Exception as e:
+            db.session.rollback()
+            flash('An error occurred during login.','danger')
+    else:
+        # failures are counted by the tracker; the users row is only written when a lock trips
+        lockout_tracker.register_failure(user, request.remote_addr)
+        metrics.count_login('failure')
+        if user:
             try:
-                user.last_login = datetime.now(timezone.utc)
-                user.failed_login_attempts = 0
-
-                log = AuditLog(
-                    user_id = user.id,
-                    ip_address = request.remote_addr,
-                    was_successful = True
-                )
-                db.session.add(log)
+                audit_sink.record(user.id, request.remote_addr, was_successful=False)
                 db.session.commit()
-
-                login_user(user)
-                flash('Welcome back!','success')
-                return redirect(url_for('main.dashboard'))
             except Exception as e:
                 db.session.rollback()
-                flash('An error occurred during login.','danger')
-        else:
-            if user:
-                try:
-                    # tell the SQL engine to do the math at the row level
-                    user.failed_login_attempts = User.failed_login_attempts + 1
-                    db.session.commit() # Execute the math in SQL
-                    db.session.refresh(user)
-
-                    max_attempts = current_app.config.get('MAX_LOGIN_ATTEMPTS', 5)
-                    lockout_duration = current_app.config.get('LOCKOUT_DURATION_MINUTES', 15)
-                    if user.failed_login_attempts >= max_attempts:
-                        user.is_locked = True
-                        user.locked_until = datetime.now(timezone.utc) + timedelta(minutes=lockout_duration)
-
-                    log = AuditLog(
-                        user_id = user.id,
-                        ip_address = request.remote_addr,
-                        was_successful = False
-                    )
-                    db.session.add(log)
-                    db.session.commit()
-                except Exception as e:
-                    db.session.rollback()
-            flash('Invalid email or password.','danger')
+        flash('Invalid email or password.','danger')
     return render_template('auth/login.html', form=form)
 
+@auth_bp.route('/login', methods=['GET', 'POST'])
+def login():
+    form, user, response = _login_prelude()
+    if response is not None:
+        return response
+    # Password check
+    password_ok = bool(user) and hashing_pool.check(user.password_hash, form.password.data)
+    return _login_finish(form, user, password_ok)
+
+async def login_async():
+    """`login` for ASYNC_MODE: ORM work runs on a worker thread, the hash is awaited on the pool."""
+    form, user, response = await asyncio.to_thread(_login_prelude)
+    if response is not None:
+        return response
+    password_ok = bool(user) and await hashing_pool.check_async(user.password_hash, form.password.data)
+    return await asyncio.to_thread(_login_finish, form, user, password_ok)
+
 @auth_bp.route('/logout')
 @login_required
 def logout():
+    identity_cache.invalidate(current_user.id)
+    claims.clear()
     logout_user()
     flash('You have been logged out.', 'info')
     return redirect(url_for('auth.login'))
@@ -131,8 +179,11 @@ def request_reset():
         user : User | None = User.query.filter_by(email=form.email.data).first()
         if user:
             token = user.get_reset_token()
-            # We haven't installed Flask-Mail yet, so we will just print it to the server console for now!
-            current_app.logger.info(f"MOCK EMAIL: Send reset link to {user.email} -> /reset_password/{token}")
+            # queued in the outbox; the mail worker sends it, so SMTP latency never reaches this request
+            reset_url = url_for('auth.reset_token', token=token, _external=True)
+            mailer.enqueue(user.email, 'Password reset request',
+                           f"To reset your password, visit the following link:\n{reset_url}\n\n"
+                           "If you did not make this request, simply ignore this email.")
 
         flash('If an account with that email exists, a password reset link has been sent.', 'info')
         return redirect(url_for('auth.login'))
@@ -144,19 +195,29 @@ def reset_token(token):
     if current_user.is_authenticated:
         return redirect(url_for('main.dashboard'))
 
-    user: User | None = User.verify_reset_token(token)
-    if user is None:
+    # signature, expiry and the single-use ledger are checked without loading the user
+    user_id = reset_tokens.verify(token)
+    if user_id is None:
         flash('That is an invalid or expired token', 'warning')
         return redirect(url_for('auth.request_reset'))
 
     form = ResetPasswordForm()
     if form.validate_on_submit():
-        hashed_password = generate_password_hash(form.password.data)
+        hashed_password = hashing_pool.generate(form.password.data)
+        user = db.session.get(User, user_id)
+        # consuming the token in the same transaction makes it single-use even under concurrent submits
+        if user is None or not reset_tokens.consume(token):
+            db.session.rollback()
+            flash('That is an invalid or expired token', 'warning')
+            return redirect(url_for('auth.request_reset'))
+
         user.password_hash = hashed_password
 
         user.is_locked = False
         user.failed_login_attempts = 0
         user.locked_until = None
+        user.revoke_sessions() # sessions opened with the old password stop working
+        lockout_tracker.reset(user)
 
         db.session.commit()
         flash('Your password has been updated! You are now able to log in', 'success')
@@ -0,0 +1,156 @@
+"""
+Engine tuning and read/write routing for Flask-SQLAlchemy.
+
+* `configure_engines` turns the `DB_*` settings of the active config profile into
+  `SQLALCHEMY_ENGINE_OPTIONS` (and options for the optional ``replica`` bind).
+* `install_sqlite_pragmas` applies `SQLITE_PRAGMAS` (WAL, synchronous=NORMAL,
+  busy_timeout) on every new SQLite connection, so concurrent login writes no
+  longer serialise on the rollback journal lock.
+* `RoutingSession` sends reads to the ``replica`` bind inside views decorated
+  with `use_replica`; flushes and everything else go to the primary.
+* `insert_ignoring_conflicts` is a one-statement ``INSERT ... ON CONFLICT DO
+  NOTHING RETURNING`` for SQLite and PostgreSQL, so callers can rely on a
+  unique index instead of a SELECT before every insert. Like `User.lock`, it
+  falls back to rowcount (one statement per row) where the dialect has no
+  ``INSERT ... RETURNING``, e.g. SQLite before 3.35.
+"""
+import inspect
+from functools import wraps
+
+from flask import g, has_request_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+
+REPLICA_BIND = 'replica'
+
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def build_engine_options(config, uri: str) -> dict:
+    """Engine keyword arguments for `uri` from the `DB_*` settings."""
+    url = make_url(uri)
+    if _is_memory_sqlite(url):
+        # Flask-SQLAlchemy pins in-memory SQLite to a StaticPool; pool sizing does not apply
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+    backend = url.get_backend_name()
+    if backend == 'sqlite':
+        # busy_timeout is applied as a pragma; the driver-level timeout just has to match it
+        options['connect_args'] = {'timeout': config['SQLITE_PRAGMAS'].get('busy_timeout', 5000) / 1000}
+    else:
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+        if backend == 'postgresql' and config['DB_STATEMENT_TIMEOUT_MS']:
+            options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+def configure_engines(app):
+    """Fills in engine options for the primary and replica binds. Call before `db.init_app`."""
+    config = app.config
+    config.setdefault('DB_POOL_SIZE', 5)
+    config.setdefault('DB_MAX_OVERFLOW', 10)
+    config.setdefault('DB_POOL_TIMEOUT', 30)
+    config.setdefault('DB_POOL_RECYCLE', 3600)
+    config.setdefault('DB_POOL_PRE_PING', True)
+    config.setdefault('DB_STATEMENT_TIMEOUT_MS', 0)
+    config.setdefault('SQLITE_PRAGMAS', {})
+
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in config:
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(config, config['SQLALCHEMY_DATABASE_URI'])
+
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    replica = binds.get(REPLICA_BIND)
+    if isinstance(replica, str):
+        binds[REPLICA_BIND] = {'url': replica, **build_engine_options(config, replica)}
+    config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_sqlite_pragmas(engine, pragmas: dict):
+    """Runs `PRAGMA key=value` for every new DB-API connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for key, value in pragmas.items():
+                cursor.execute(f'PRAGMA {key}={value}')
+        finally:
+            cursor.close()
+
+
+def use_replica(view):
+    """Marks a read-only view: its queries may be served by the ``replica`` bind."""
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            g.db_use_replica = True
+            return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_use_replica = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """Routes reads to the replica inside `use_replica` views, everything else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('db_use_replica'):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def insert_ignoring_conflicts(session, model, rows: list[dict], index_elements: list[str] | None) -> list:
+    """
+    Inserts `rows` into `model`'s table, skipping rows that collide on the unique
+    `index_elements` (None: on any unique constraint). Returns the primary keys of
+    the rows actually inserted.
+    """
+    primary_key = model.__mapper__.primary_key[0]
+    if not rows:
+        return []
+    dialect = session.get_bind(mapper=model.__mapper__).dialect
+    if dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        # no portable ON CONFLICT: fall back to one savepoint per row
+        inserted = []
+        for row in rows:
+            try:
+                with session.begin_nested():
+                    inserted.append(session.execute(insert(model).returning(primary_key), row).scalar_one())
+            except IntegrityError:
+                pass
+        return inserted
+
+    if dialect.insert_returning:
+        statement = dialect_insert(model).on_conflict_do_nothing(index_elements=index_elements).returning(primary_key)
+        return list(session.execute(statement, rows).scalars())
+    # e.g. SQLite before 3.35: one Core statement per row, kept if its rowcount says it inserted
+    statement = dialect_insert(model.__table__).on_conflict_do_nothing(index_elements=index_elements)
+    connection = session.connection(bind_arguments={'mapper': model.__mapper__})
+    inserted = []
+    for row in rows:
+        result = connection.execute(statement, row)
+        if result.rowcount:
+            inserted.append(result.inserted_primary_key[0])
+    return inserted
@@ -1,7 +1,13 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 
-db = SQLAlchemy()
+from src.database import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 login_manager = LoginManager()
-migrate = Migrate()
+
+
+def init_migrate(app):
+    """Registers Flask-Migrate; imported here because it pulls in all of Alembic."""
+    from flask_migrate import Migrate
+    Migrate(app, db)
@@ -0,0 +1,223 @@
+"""
+Health checks served from a cached snapshot.
+
+Load balancers and Kubernetes probe every pod every few seconds. Running
+`SELECT 1` per probe turns that into steady database load, and a hung database
+hangs the probe with it. Instead the checks run every `HEALTH_PROBE_INTERVAL`
+and the endpoints only read the last result:
+
+* ``database`` / ``database.<bind>``: `SELECT 1` latency on every engine,
+  bounded by `HEALTH_PROBE_TIMEOUT`. A probe still stuck from the previous
+  round is reported as down instead of piling up another connection.
+* ``db_pool`` / ``db_pool.<bind>``: checked-out connections against
+  pool size + overflow.
+* ``hash_pool``: password hashes queued or running against `HASH_POOL_MAX_PENDING`.
+* ``audit_buffer``: audit events waiting to be flushed against `AUDIT_BUFFER_MAX`;
+  degraded once any event was dropped after a failed flush.
+
+Each check is ``ok``, ``degraded`` (over its `HEALTH_*_WARN` threshold) or
+``down``. `/livez` only says the process serves requests. `/readyz` fails while
+a check is down or the snapshot is older than `HEALTH_MAX_AGE`. `/status`
+returns the full snapshot.
+
+`HEALTH_PROBE_MODE` is ``thread`` (a background thread per process, started by
+the first probe request, so it also works after a ``--preload`` fork) or
+``inline`` (the request that finds the snapshot older than the interval
+refreshes it).
+"""
+import atexit
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from src.extensions import db
+
+HEALTH_PROBE_MODES = ('thread', 'inline')
+SEVERITY = {'ok': 0, 'degraded': 1, 'down': 2}
+
+
+def _ping(engine) -> float:
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    return (time.perf_counter() - start) * 1000
+
+
+def _ratio_check(used: int, limit: int, warn: float, **details) -> dict:
+    saturation = used / limit if limit > 0 else 0.0
+    return {'status': 'degraded' if limit > 0 and saturation >= warn else 'ok',
+            'saturation': round(saturation, 3), **details}
+
+
+class _HealthState:
+    """Per-application snapshot, probe thread and in-flight database pings."""
+
+    def __init__(self, app):
+        self.app = app
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.snapshot = None
+        self.first_result = threading.Event()
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.worker = None
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='health-ping')
+        self.pings = {}
+        self.started_at = time.time()
+
+    def start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name='health-probes', daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        while not self.stopping:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception:
+                self.app.logger.exception("Health probes failed")
+            self.wakeup.wait(self.app.config['HEALTH_PROBE_INTERVAL'])
+
+    def refresh(self) -> dict:
+        """Runs every check once and publishes the result. Needs an app context."""
+        with self.refresh_lock:
+            start = time.perf_counter()
+            checks = {}
+            for bind, engine in db.engines.items():
+                suffix = f'.{bind}' if bind else ''
+                checks[f'database{suffix}'] = self._check_database(bind, engine)
+                pool = self._check_pool(engine)
+                if pool is not None:
+                    checks[f'db_pool{suffix}'] = pool
+            config = self.app.config
+            pool = self.app.extensions.get('hashing_pool')
+            if pool is not None:
+                stats = pool.stats()
+                checks['hash_pool'] = _ratio_check(stats['queue_depth'], stats['max_pending'],
+                                                   config['HEALTH_HASH_QUEUE_WARN'], queue_depth=stats['queue_depth'],
+                                                   max_pending=stats['max_pending'], rejected=stats['rejected'])
+            buffer = self.app.extensions.get('audit_sink')
+            if buffer is not None:
+                with buffer.lock:
+                    pending, dropped = len(buffer.rows), buffer.dropped
+                checks['audit_buffer'] = _ratio_check(pending, config['AUDIT_BUFFER_MAX'],
+                                                      config['HEALTH_AUDIT_BACKLOG_WARN'],
+                                                      pending=pending, dropped=dropped)
+                if dropped:
+                    # events were lost after failed flushes; readiness is unaffected but it must show up
+                    checks['audit_buffer']['status'] = 'degraded'
+
+            worst = max((check['status'] for check in checks.values()), key=SEVERITY.get, default='ok')
+            snapshot = {
+                'status': worst,
+                'checked_at': time.time(),
+                'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+                'checks': checks,
+            }
+            with self.lock:
+                self.snapshot = snapshot
+            self.first_result.set()
+            return snapshot
+
+    def _check_database(self, bind, engine) -> dict:
+        config = self.app.config
+        future = self.pings.get(bind)
+        if future is not None and not future.done():
+            return {'status': 'down', 'error': 'previous probe still running'}
+        future = self.pings[bind] = self.executor.submit(_ping, engine)
+        try:
+            latency_ms = future.result(config['HEALTH_PROBE_TIMEOUT'])
+        except FutureTimeoutError:
+            return {'status': 'down', 'error': f"no answer within {config['HEALTH_PROBE_TIMEOUT']}s"}
+        except Exception as e:
+            return {'status': 'down', 'error': str(e) or type(e).__name__}
+        status = 'degraded' if latency_ms >= config['HEALTH_DB_LATENCY_WARN_MS'] else 'ok'
+        return {'status': status, 'latency_ms': round(latency_ms, 2)}
+
+    def _check_pool(self, engine) -> dict | None:
+        pool = engine.pool
+        if not isinstance(pool, QueuePool):
+            # StaticPool/NullPool (in-memory SQLite, tests) have nothing to saturate
+            return None
+        # QueuePool only exposes its overflow limit privately; negative means unlimited
+        max_overflow = getattr(pool, '_max_overflow', 0)
+        capacity = pool.size() + max_overflow if max_overflow >= 0 else 0
+        return _ratio_check(pool.checkedout(), capacity, self.app.config['HEALTH_POOL_SATURATION_WARN'],
+                            checked_out=pool.checkedout(), capacity=capacity)
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+        self.executor.shutdown(wait=False)
+
+
+class HealthMonitor:
+    """Keeps a periodically refreshed health snapshot for the probe endpoints."""
+
+    def __init__(self, app=None):
+        self._states = weakref.WeakSet()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('HEALTH_PROBE_MODE', 'thread')
+        app.config.setdefault('HEALTH_PROBE_INTERVAL', 5.0)
+        app.config.setdefault('HEALTH_PROBE_TIMEOUT', 2.0)
+        app.config.setdefault('HEALTH_MAX_AGE', app.config['HEALTH_PROBE_INTERVAL'] * 3)
+        app.config.setdefault('HEALTH_DB_LATENCY_WARN_MS', 250.0)
+        app.config.setdefault('HEALTH_POOL_SATURATION_WARN', 0.9)
+        app.config.setdefault('HEALTH_HASH_QUEUE_WARN', 0.8)
+        app.config.setdefault('HEALTH_AUDIT_BACKLOG_WARN', 0.8)
+        if app.config['HEALTH_PROBE_MODE'] not in HEALTH_PROBE_MODES:
+            raise ValueError(f"HEALTH_PROBE_MODE must be one of {HEALTH_PROBE_MODES}")
+
+        state = _HealthState(app)
+        app.extensions['health'] = state
+        self._states.add(state)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    @property
+    def _state(self) -> _HealthState:
+        return current_app.extensions['health']
+
+    def refresh(self) -> dict:
+        """Runs the checks now on the calling thread."""
+        return self._state.refresh()
+
+    def snapshot(self) -> dict:
+        """The latest result plus its age. Only the very first call may wait (at most one probe timeout)."""
+        state = self._state
+        config = current_app.config
+        if config['HEALTH_PROBE_MODE'] == 'thread':
+            state.start()
+            state.first_result.wait(config['HEALTH_PROBE_TIMEOUT'] + 1.0)
+        else:
+            with state.lock:
+                current = state.snapshot
+            if current is None or time.time() - current['checked_at'] >= config['HEALTH_PROBE_INTERVAL']:
+                state.refresh()
+
+        with state.lock:
+            current = state.snapshot
+        if current is None:
+            return {'status': 'down', 'checked_at': None, 'age_s': None, 'stale': True, 'checks': {}}
+        age = time.time() - current['checked_at']
+        return {**current, 'age_s': round(age, 3), 'stale': age > config['HEALTH_MAX_AGE']}
+
+    def shutdown(self):
+        """Stops every probe thread. Registered with `atexit`."""
+        for state in list(self._states):
+            state.stop()
+
+
+health = HealthMonitor()
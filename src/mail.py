@@ -0,0 +1,319 @@
+"""
+Outbound mail through a durable outbox.
+
+Requests never talk to SMTP. `mailer.enqueue` writes an `OutboxEmail` row and
+returns; a worker delivers due rows in batches of `MAIL_BATCH_SIZE` over one
+SMTP connection per batch.
+
+* Claiming a batch is a single ``UPDATE ... RETURNING`` that pushes the rows'
+  `next_attempt_at` past `MAIL_CLAIM_TIMEOUT`, so several processes can run
+  workers without sending a message twice. A worker that dies mid-batch just
+  lets the claim expire and the rows are retried.
+* A failed send is retried with exponential backoff (`MAIL_RETRY_BASE` doubled
+  per attempt, capped at `MAIL_RETRY_MAX`) until `MAIL_MAX_ATTEMPTS`, after
+  which the row is marked ``failed``.
+
+`MAIL_WORKER` is ``thread`` (a background thread per process, started by the
+first enqueue) or ``off`` (run `flask mail send` from cron or a dedicated
+process instead). Without `MAIL_SERVER` messages are written to the log rather
+than sent. `flask mail debug-server` runs a local SMTP sink for development.
+"""
+import atexit
+import random
+import smtplib
+import threading
+import weakref
+from datetime import datetime, timezone, timedelta
+from email.message import EmailMessage
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, update, func
+
+from src.extensions import db
+from src.auth.models import OutboxEmail
+
+MAIL_WORKER_MODES = ('thread', 'off')
+
+
+class LogTransport:
+    """Writes messages to the application log; used when no `MAIL_SERVER` is configured."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def send(self, message: EmailMessage):
+        self.app.logger.info(f"MAIL to {message['To']}: {message['Subject']}\n{message.get_content()}")
+
+
+class SMTPTransport:
+    """One SMTP connection, reused for every message of a batch."""
+
+    def __init__(self, app):
+        self.config = app.config
+        self.connection = None
+
+    def __enter__(self):
+        config = self.config
+        self.connection = smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=config['MAIL_TIMEOUT'])
+        if config['MAIL_USE_TLS']:
+            self.connection.starttls()
+        if config['MAIL_USERNAME']:
+            self.connection.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.connection.quit()
+        except smtplib.SMTPException:
+            self.connection.close()
+        except OSError:
+            pass
+        return False
+
+    def send(self, message: EmailMessage):
+        self.connection.send_message(message)
+
+
+def backoff_seconds(attempts: int, base: float, cap: float) -> float:
+    """Exponential backoff with +/-10% jitter so a recovered server isn't hit by every row at once."""
+    delay = min(base * 2 ** max(attempts - 1, 0), cap)
+    return delay * random.uniform(0.9, 1.1)
+
+
+class _MailWorker:
+    """Per-application background delivery thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self.wakeup = threading.Event()
+        self.stopping = False
+        self.worker = None
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def start(self):
+        with self.lock:
+            if self.worker is None:
+                self.worker = threading.Thread(target=self._run, name='mail-worker', daemon=True)
+                self.worker.start()
+
+    def _run(self):
+        interval = self.app.config['MAIL_POLL_INTERVAL']
+        while not self.stopping:
+            self.wakeup.wait(interval)
+            self.wakeup.clear()
+            self.drain()
+
+    def drain(self) -> int:
+        """Delivers batches until nothing is due. Returns the number of messages sent."""
+        total = 0
+        with self.app.app_context():
+            try:
+                while True:
+                    result = mailer.deliver_pending()
+                    total += result['sent']
+                    if result['claimed'] < self.app.config['MAIL_BATCH_SIZE']:
+                        break
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception("Mail delivery failed")
+            finally:
+                db.session.remove()
+        return total
+
+    def stop(self):
+        self.stopping = True
+        self.wakeup.set()
+
+
+class Mailer:
+    """Queues email in the outbox and delivers it in batches."""
+
+    def __init__(self, app=None):
+        self._workers = weakref.WeakSet()
+        self._atexit_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_SERVER', None)
+        app.config.setdefault('MAIL_PORT', 25)
+        app.config.setdefault('MAIL_USE_TLS', False)
+        app.config.setdefault('MAIL_USERNAME', None)
+        app.config.setdefault('MAIL_PASSWORD', None)
+        app.config.setdefault('MAIL_DEFAULT_SENDER', 'no-reply@localhost')
+        app.config.setdefault('MAIL_TIMEOUT', 10.0)
+        app.config.setdefault('MAIL_WORKER', 'thread')
+        app.config.setdefault('MAIL_BATCH_SIZE', 50)
+        app.config.setdefault('MAIL_POLL_INTERVAL', 5.0)
+        app.config.setdefault('MAIL_MAX_ATTEMPTS', 5)
+        app.config.setdefault('MAIL_RETRY_BASE', 30.0)
+        app.config.setdefault('MAIL_RETRY_MAX', 3600.0)
+        app.config.setdefault('MAIL_CLAIM_TIMEOUT', 300.0)
+        if app.config['MAIL_WORKER'] not in MAIL_WORKER_MODES:
+            raise ValueError(f"MAIL_WORKER must be one of {MAIL_WORKER_MODES}")
+
+        worker = _MailWorker(app)
+        app.extensions['mailer'] = worker
+        self._workers.add(worker)
+        if not self._atexit_registered:
+            atexit.register(self.shutdown)
+            self._atexit_registered = True
+
+    def transport(self, app=None):
+        app = app or current_app._get_current_object()
+        return SMTPTransport(app) if app.config['MAIL_SERVER'] else LogTransport(app)
+
+    def enqueue(self, recipient: str, subject: str, body: str) -> OutboxEmail:
+        """Stores a message in the outbox and commits; delivery happens off the request path."""
+        message = OutboxEmail(recipient=recipient, subject=subject, body=body)
+        db.session.add(message)
+        db.session.commit()
+
+        worker: _MailWorker = current_app.extensions['mailer']
+        if current_app.config['MAIL_WORKER'] == 'thread':
+            worker.start()
+            worker.wakeup.set()
+        return message
+
+    def _claim(self, now: datetime) -> list[int]:
+        config = current_app.config
+        due = (select(OutboxEmail.id)
+               .where(OutboxEmail.status == 'pending', OutboxEmail.next_attempt_at <= now)
+               .order_by(OutboxEmail.next_attempt_at)
+               .limit(config['MAIL_BATCH_SIZE']))
+        claimed = db.session.scalars(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(due.scalar_subquery()), OutboxEmail.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=config['MAIL_CLAIM_TIMEOUT']),
+                    attempts=OutboxEmail.attempts + 1)
+            .returning(OutboxEmail.id)
+        ).all()
+        db.session.commit()
+        return claimed
+
+    def _build(self, row: OutboxEmail) -> EmailMessage:
+        message = EmailMessage()
+        message['From'] = current_app.config['MAIL_DEFAULT_SENDER']
+        message['To'] = row.recipient
+        message['Subject'] = row.subject
+        message.set_content(row.body)
+        return message
+
+    def deliver_pending(self, now: datetime | None = None) -> dict:
+        """Claims one batch of due messages and sends it over a single connection."""
+        config = current_app.config
+        now = now or datetime.now(timezone.utc)
+        ids = self._claim(now)
+        result = {'claimed': len(ids), 'sent': 0, 'retried': 0, 'failed': 0}
+        if not ids:
+            return result
+
+        rows = db.session.scalars(select(OutboxEmail).where(OutboxEmail.id.in_(ids)).order_by(OutboxEmail.id)).all()
+        pending = list(rows)
+        try:
+            with self.transport() as transport:
+                while pending:
+                    row = pending[0]
+                    try:
+                        transport.send(self._build(row))
+                    except smtplib.SMTPRecipientsRefused as e:
+                        # a bad address fails on its own; the connection is still good
+                        self._failed_attempt(row, e, now)
+                    except (smtplib.SMTPException, OSError):
+                        raise
+                    except Exception as e:
+                        # a message that cannot be built or encoded fails on its own too
+                        current_app.logger.exception(f"Mail {row.id} could not be sent")
+                        self._failed_attempt(row, e, now)
+                    else:
+                        row.status = 'sent'
+                        row.sent_at = datetime.now(timezone.utc)
+                        row.last_error = None
+                        result['sent'] += 1
+                    pending.pop(0)
+        except (smtplib.SMTPException, OSError) as e:
+            # the connection is gone: everything not yet sent goes back with backoff
+            for row in pending:
+                self._failed_attempt(row, e, now)
+
+        for row in rows:
+            if row.status == 'failed':
+                result['failed'] += 1
+            elif row.status == 'pending':
+                result['retried'] += 1
+        db.session.commit()
+
+        worker: _MailWorker = current_app.extensions['mailer']
+        with worker.lock:
+            worker.sent += result['sent']
+            worker.retried += result['retried']
+            worker.failed += result['failed']
+        return result
+
+    def _failed_attempt(self, row: OutboxEmail, error: Exception, now: datetime):
+        config = current_app.config
+        row.last_error = f'{type(error).__name__}: {error}'[:255]
+        if row.attempts >= config['MAIL_MAX_ATTEMPTS']:
+            row.status = 'failed'
+        else:
+            delay = backoff_seconds(row.attempts, config['MAIL_RETRY_BASE'], config['MAIL_RETRY_MAX'])
+            row.next_attempt_at = now + timedelta(seconds=delay)
+
+    def stats(self) -> dict:
+        worker: _MailWorker = current_app.extensions['mailer']
+        pending = db.session.scalar(select(func.count()).select_from(OutboxEmail)
+                                    .where(OutboxEmail.status == 'pending'))
+        with worker.lock:
+            return {'pending': pending, 'sent': worker.sent, 'retried': worker.retried, 'failed': worker.failed}
+
+    def shutdown(self):
+        """Stops every background worker after one last delivery pass. Registered with `atexit`."""
+        for worker in list(self._workers):
+            if worker.worker is not None:
+                worker.stop()
+                worker.drain()
+
+
+mailer = Mailer()
+
+mail_cli = AppGroup('mail', help='Outbound mail queue.')
+
+
+@mail_cli.command('send')
+def send_command():
+    """Delivers every message that is due now."""
+    total = {'sent': 0, 'retried': 0, 'failed': 0}
+    while True:
+        result = mailer.deliver_pending()
+        for key in total:
+            total[key] += result[key]
+        if result['claimed'] < current_app.config['MAIL_BATCH_SIZE']:
+            break
+    click.echo(f"Sent {total['sent']} messages ({total['retried']} to retry, {total['failed']} failed)")
+
+
+@mail_cli.command('debug-server')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=1025, show_default=True)
+def debug_server_command(host, port):
+    """Runs a local SMTP server that prints every message it receives (MAIL_SERVER=localhost, MAIL_PORT=1025)."""
+    from src.mail_debug import DebuggingSMTPServer
+    server = DebuggingSMTPServer(host, port, echo=click.echo)
+    click.echo(f'Debugging SMTP server listening on {host}:{server.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
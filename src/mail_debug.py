@@ -0,0 +1,96 @@
+"""
+A minimal SMTP sink for development and tests (`flask mail debug-server`).
+
+Speaks just enough SMTP for `smtplib` (HELO/EHLO, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT), keeps every received message in `messages` and counts
+connections, so tests can check that a batch reused one connection.
+"""
+import socketserver
+import threading
+from email import message_from_bytes, policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+
+    def _reply(self, line: str):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server: DebuggingSMTPServer = self.server
+        with server.lock:
+            server.connections += 1
+        self._reply('220 localhost debugging SMTP')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').rstrip('\r\n')
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self._reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command.split(':', 1)[1].strip(), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b'.\r\n', b'.\n'):
+                        break
+                    # undo dot-stuffing
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                message = message_from_bytes(b''.join(lines), policy=policy.default)
+                server.receive(sender, recipients, message)
+                self._reply('250 OK: queued')
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self._reply('250 OK')
+            elif verb == 'NOOP':
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+
+class DebuggingSMTPServer(socketserver.ThreadingTCPServer):
+    """Collects messages in memory. Port 0 picks a free port (see `port`)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, echo=None):
+        super().__init__((host, port), _SMTPHandler)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.echo = echo
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def receive(self, sender, recipients, message):
+        with self.lock:
+            self.messages.append(message)
+        if self.echo:
+            self.echo(f"---------- from {sender} to {', '.join(recipients)}\n{message.as_string()}")
+
+    def start(self):
+        """Serves on a daemon thread (for tests)."""
+        # a short poll interval keeps stop() (and test teardown) fast
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='debug-smtp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
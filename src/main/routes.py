@@ -1,9 +1,13 @@
-from flask import Blueprint, render_template, jsonify
+import asyncio
+
+from flask import Blueprint, render_template, jsonify, request, current_app
 from flask_login import login_required, current_user
-import time
-from sqlalchemy import text
-from src.extensions import db
+from src.database import use_replica
+from src.aio import async_db
+from src.health import health
 from src.auth.models import AuditLog
+from src.auth.retention import hot_window_start
+from src.auth.activity import recent_activity
 
 main_bp = Blueprint('main',__name__)
 
@@ -13,33 +17,82 @@ def index():
 
 @main_bp.route('/dashboard')
 @login_required
+@use_replica
 def dashboard():
     """The private dashboard for logged-in users only."""
-    # Fetch the 10 most recent logs for the current user, sorted newest first
-    recent_logs = AuditLog.query.filter_by(user_id=current_user.id)\
-                                .order_by(AuditLog.created_at.desc())\
-                                .limit(10).all()
+    # The 10 most recent events for the current user, newest first, from the user's ring buffer;
+    # a miss reads only the hot partition(s), older activity lives in rollups/archives
+    recent_logs = recent_activity.recent(current_user.id, limit=10, since=hot_window_start())
 
     return render_template('dashboard.html', user=current_user, logs=recent_logs)
 
+@login_required
+@use_replica
+async def dashboard_async():
+    """`dashboard` for ASYNC_MODE: a ring miss is hydrated off the loop, forced DB reads use the async engine."""
+    since = hot_window_start()
+    recent_logs = recent_activity.cached(current_user.id, limit=10, since=since)
+    if recent_logs is None and current_app.config['RECENT_ACTIVITY_FORCE_DB']:
+        rows = await async_db.scalars(AuditLog.history_query(current_user.id, limit=10, since=since))
+        recent_logs, _ = AuditLog.split_page(rows, 10)
+    elif recent_logs is None:
+        recent_logs = await asyncio.to_thread(recent_activity.recent, current_user.id, 10, since)
 
-@main_bp.route('/status')
-def status():
-    """Liveness probe for infrastructure monitoring."""
-    start_time = time.perf_counter()
+    return render_template('dashboard.html', user=current_user, logs=recent_logs)
+
+
+@main_bp.route('/dashboard/history')
+@login_required
+@use_replica
+def audit_history():
+    """JSON audit history with keyset pagination: pass back `next_cursor` to get the next page."""
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    if limit < 1:
+        return jsonify({"error": "limit must be positive"}), 400
     try:
-        db.session.execute(text('SELECT 1'))
-        latency_ms = (time.perf_counter()-start_time)*1000
-        return jsonify({
-            "status": "online",
-            "database": "connected",
-            "latency_ms": round(latency_ms, 2)
-        }), 200
-    except Exception as e:
-        # 503 service unavailable
-        return jsonify({
-            "status": "degraded",
-            "database": "disconnected",
-            "error": str(e)
-        }), 503
+        logs, next_cursor = AuditLog.history_page(current_user.id, cursor=request.args.get('cursor'), limit=limit)
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+
+    return jsonify({
+        "items": [log.to_dict() for log in logs],
+        "next_cursor": next_cursor
+    }), 200
+
+
+@main_bp.route('/livez')
+def livez():
+    """Liveness: the process is serving requests. Never touches the database."""
+    return jsonify({"status": "alive"}), 200
 
+@main_bp.route('/readyz')
+def readyz():
+    """Readiness: a fresh health snapshot with no check down (see src/health.py)."""
+    snapshot = health.snapshot()
+    failing = sorted(name for name, check in snapshot['checks'].items() if check['status'] == 'down')
+    ready = not failing and not snapshot['stale']
+    return jsonify({
+        "ready": ready,
+        "failing": failing,
+        "stale": snapshot['stale'],
+        "age_s": snapshot['age_s']
+    }), 200 if ready else 503
+
+@main_bp.route('/status')
+def status():
+    """Health report for infrastructure monitoring, served from the cached probe snapshot."""
+    snapshot = health.snapshot()
+    database = snapshot['checks'].get('database', {})
+    connected = database.get('status') in ('ok', 'degraded')
+    body = {
+        "status": "online" if snapshot['status'] == 'ok' and not snapshot['stale'] else "degraded",
+        "database": "connected" if connected else "disconnected",
+        "latency_ms": database.get('latency_ms'),
+        "checked_at": snapshot['checked_at'],
+        "age_s": snapshot['age_s'],
+        "checks": snapshot['checks']
+    }
+    if 'error' in database:
+        body["error"] = database['error']
+    # 503 service unavailable
+    return jsonify(body), 200 if connected and not snapshot['stale'] else 503
@@ -0,0 +1,249 @@
+"""
+Prometheus-style instrumentation served at `/metrics`.
+
+Recorded per worker process:
+
+* `http_request_duration_seconds` - latency histogram per endpoint
+* `http_requests_total` - requests per endpoint, method and status
+* `db_queries_total` / `db_query_seconds_total` - SQL statements and time per endpoint
+* `login_attempts_total` - login outcomes
+* password hashing, identity cache and audit buffer statistics, read at scrape time
+
+Every thread writes into its own shard of plain dicts, so recording a sample
+never takes a lock; shards are only merged when `/metrics` is scraped. The
+shards of threads that have exited are folded into one retired shard, so
+short-lived threads (the dev server starts one per request) don't pile up.
+Each gunicorn worker exposes its own numbers.
+"""
+import bisect
+import threading
+import time
+import weakref
+
+from flask import g, request, current_app, Response, has_request_context
+from sqlalchemy import event
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by endpoint.'),
+    'http_requests_total': ('counter', 'Requests by endpoint, method and status.'),
+    'db_queries_total': ('counter', 'SQL statements executed, by endpoint.'),
+    'db_query_seconds_total': ('counter', 'Time spent in SQL statements, by endpoint.'),
+    'login_attempts_total': ('counter', 'Login attempts by outcome.'),
+}
+
+
+class _Shard:
+    """One thread's private counters and histograms."""
+
+    def __init__(self, thread: threading.Thread | None = None):
+        self.counters: dict[tuple, float] = {}
+        self.histograms: dict[tuple, list] = {}
+        self.thread = weakref.ref(thread) if thread is not None else None
+
+    def live(self) -> bool:
+        thread = self.thread() if self.thread is not None else None
+        return thread is not None and thread.is_alive()
+
+    def merge_into(self, counters: dict, histograms: dict, width: int):
+        for key, value in list(self.counters.items()):
+            counters[key] = counters.get(key, 0) + value
+        for key, series in list(self.histograms.items()):
+            merged = histograms.setdefault(key, [0] * width)
+            for i, value in enumerate(list(series)):
+                merged[i] += value
+
+
+class MetricsRegistry:
+    """Counters and fixed-bucket histograms sharded per thread."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards: list[_Shard] = []
+        self._retired = _Shard() # everything recorded by threads that have exited
+        self._prune_at = 64
+        self._register_lock = threading.Lock()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._register_lock:
+                self._shards.append(shard)
+                if len(self._shards) >= self._prune_at:
+                    self._prune()
+                    self._prune_at = max(2 * len(self._shards), 64)
+        return shard
+
+    def _prune(self):
+        """Folds the shards of exited threads into the retired shard. The caller holds the register lock."""
+        live = []
+        for shard in self._shards:
+            if shard.live():
+                live.append(shard)
+            else:
+                # its thread is gone, so nothing writes to it any more
+                shard.merge_into(self._retired.counters, self._retired.histograms, len(self.buckets) + 2)
+        self._shards = live
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        series = histograms.get(key)
+        if series is None:
+            # one slot per bucket plus +Inf, then sum
+            series = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def collect(self) -> tuple[dict, dict]:
+        """Merges every shard into (counters, histograms)."""
+        counters: dict[tuple, float] = {}
+        histograms: dict[tuple, list] = {}
+        with self._register_lock:
+            self._prune()
+            shards = [self._retired, *self._shards]
+            for shard in shards:
+                shard.merge_into(counters, histograms, len(self.buckets) + 2)
+        return counters, histograms
+
+    def reset(self):
+        with self._register_lock:
+            for shard in [self._retired, *self._shards]:
+                shard.counters.clear()
+                shard.histograms.clear()
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ''
+    parts = ','.join(f'{key}="{str(value)}"' for key, value in labels)
+    return '{' + parts + '}'
+
+
+def render(registry: MetricsRegistry, gauges: dict[str, tuple[str, str, float]]) -> str:
+    """Text exposition format (version 0.0.4)."""
+    counters, histograms = registry.collect()
+    lines = []
+
+    by_name: dict[str, list] = {}
+    for (name, labels), value in counters.items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        kind, help_text = HELP.get(name, ('counter', name))
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        for labels, value in sorted(by_name[name]):
+            lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    hist_by_name: dict[str, list] = {}
+    for (name, labels), series in histograms.items():
+        hist_by_name.setdefault(name, []).append((labels, series))
+    for name in sorted(hist_by_name):
+        kind, help_text = HELP.get(name, ('histogram', name))
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for labels, series in sorted(hist_by_name[name]):
+            cumulative = 0
+            for bound, count in zip(registry.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {series[-1]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+
+    for name in sorted(gauges):
+        kind, help_text, value = gauges[name]
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {value}']
+
+    return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """Flask extension wiring request, SQL and login instrumentation into a registry."""
+
+    def __init__(self, app=None):
+        self.registry = MetricsRegistry()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.extensions['metrics'] = self
+        app.before_request(self._start_timer)
+        app.after_request(self._record_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+
+        from src.extensions import db
+        with app.app_context():
+            for engine in db.engines.values():
+                self.instrument_engine(engine)
+
+    def instrument_engine(self, engine):
+        if event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            return
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    def count_login(self, outcome: str):
+        self.registry.inc('login_attempts_total', (('outcome', outcome),))
+
+    def _start_timer(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_queries = 0
+        g._metrics_query_seconds = 0.0
+
+    def _record_request(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is None or request.endpoint == 'metrics':
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        self.registry.observe('http_request_duration_seconds', (('endpoint', endpoint),), time.perf_counter() - start)
+        self.registry.inc('http_requests_total', (('endpoint', endpoint), ('method', request.method),
+                                                  ('status', response.status_code)))
+        self.registry.inc('db_queries_total', (('endpoint', endpoint),), g.get('_metrics_queries', 0))
+        self.registry.inc('db_query_seconds_total', (('endpoint', endpoint),), g.get('_metrics_query_seconds', 0.0))
+        return response
+
+    def _gauges(self) -> dict:
+        gauges = {}
+        pool = current_app.extensions.get('hashing_pool')
+        if pool is not None:
+            stats = pool.stats()
+            gauges['password_hash_queue_depth'] = ('gauge', 'Hashes queued or running.', stats['queue_depth'])
+            gauges['password_hashes_total'] = ('counter', 'Completed password hashes.', stats['completed'])
+            gauges['password_hash_seconds_total'] = ('counter', 'CPU time spent hashing.', stats['hash_seconds_total'])
+            gauges['password_hash_rejected_total'] = ('counter', 'Hashes refused by admission control.', stats['rejected'])
+        cache = current_app.extensions.get('identity_cache')
+        if cache is not None:
+            stats = cache.stats()
+            gauges['identity_cache_hits_total'] = ('counter', 'load_user cache hits.', stats['hits'])
+            gauges['identity_cache_misses_total'] = ('counter', 'load_user cache misses.', stats['misses'])
+        buffer = current_app.extensions.get('audit_sink')
+        if buffer is not None:
+            gauges['audit_buffer_pending'] = ('gauge', 'Audit events waiting to be flushed.', len(buffer.rows))
+        return gauges
+
+    def metrics_view(self):
+        return Response(render(self.registry, self._gauges()), mimetype='text/plain; version=0.0.4')
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # on the statement's own context: a statement that raises leaves nothing behind on the connection
+    context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_start', None)
+    if started is not None and has_request_context() and '_metrics_start' in g:
+        g._metrics_queries = g.get('_metrics_queries', 0) + 1
+        g._metrics_query_seconds = g.get('_metrics_query_seconds', 0.0) + time.perf_counter() - started
+
+
+metrics = Metrics()
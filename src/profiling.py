@@ -0,0 +1,166 @@
+"""
+SQL query profiling for development and CI.
+
+`SQL_PROFILER` (on in `DevConfig`) records every statement a request runs with
+its duration and origin: the innermost frame in this project's code, which for
+a lazy load triggered while rendering is the template itself. After the
+request the totals go into the ``X-SQL-Queries``/``X-SQL-Time-ms`` headers and
+the log, and any statement text repeated `SQL_PROFILER_N_PLUS_ONE` times or
+more is logged as a likely N+1 (lazy relationships such as `User.audit_logs`
+loaded once per row).
+
+`capture_queries` records the same information for any block of code; the
+`max_queries` fixture in ``tests/conftest.py`` uses it to give endpoints a
+query budget, so a new lazy load fails CI instead of reaching production.
+"""
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import g, request, current_app, has_request_context
+from sqlalchemy import event
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# project frames that only pass statements through; the caller is the interesting origin
+_PLUMBING = (os.path.abspath(__file__), os.path.join(PROJECT_ROOT, 'src', 'database.py'))
+
+
+def query_origin() -> str:
+    """``path:line in function`` of the innermost project frame on the stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(PROJECT_ROOT) and filename not in _PLUMBING
+                and f'{os.sep}site-packages{os.sep}' not in filename):
+            path = os.path.relpath(filename, PROJECT_ROOT)
+            if path.endswith('.html'):
+                # compiled template code: the Python line number means nothing to the reader
+                return path
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryLog:
+    """The statements of one request (or `capture_queries` block) with timings and origins."""
+
+    def __init__(self):
+        self.queries: list[dict] = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def record(self, statement: str, duration: float, origin: str):
+        self.queries.append({'statement': statement, 'duration_ms': duration * 1000, 'origin': origin})
+
+    @property
+    def total_ms(self) -> float:
+        return sum(query['duration_ms'] for query in self.queries)
+
+    def repeated(self, threshold: int) -> list[dict]:
+        """Statements run at least `threshold` times (same SQL, any parameters), most frequent first."""
+        counts = Counter(query['statement'] for query in self.queries)
+        return [{
+            'statement': statement,
+            'count': count,
+            'origins': sorted({q['origin'] for q in self.queries if q['statement'] == statement}),
+        } for statement, count in counts.most_common() if count >= threshold]
+
+    def report(self) -> str:
+        lines = [f'{len(self)} queries, {self.total_ms:.1f} ms']
+        for i, query in enumerate(self.queries, 1):
+            statement = ' '.join(query['statement'].split())
+            lines.append(f"{i:>3}. {query['duration_ms']:.2f} ms  {query['origin']}\n     {statement}")
+        return '\n'.join(lines)
+
+
+def _listen(engines, on_query):
+    """Attaches timing listeners to `engines`; returns a function that detaches them."""
+    # the start time lives on the statement's context, so a failed statement leaks nothing
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._profiler_start = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profiler_start', None)
+        if started is not None:
+            on_query(statement, time.perf_counter() - started)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before)
+        event.listen(engine, 'after_cursor_execute', after)
+
+    def remove():
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', before)
+            event.remove(engine, 'after_cursor_execute', after)
+    return remove
+
+
+@contextmanager
+def capture_queries(app):
+    """Collects every statement `app`'s engines run inside the block into a `QueryLog`."""
+    from src.extensions import db
+    log = QueryLog()
+    with app.app_context():
+        engines = list(db.engines.values())
+    remove = _listen(engines, lambda statement, duration: log.record(statement, duration, query_origin()))
+    try:
+        yield log
+    finally:
+        remove()
+
+
+class QueryProfiler:
+    """Per-request SQL capture with N+1 warnings, installed when `SQL_PROFILER` is on."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQL_PROFILER', False)
+        app.config.setdefault('SQL_PROFILER_N_PLUS_ONE', 3)
+        app.config.setdefault('SQL_PROFILER_LOG_QUERIES', False)
+        if app.config['SQL_PROFILER']:
+            self.install(app)
+
+    def install(self, app):
+        from src.extensions import db
+        if app.extensions.get('sql_profiler'):
+            return
+        app.extensions['sql_profiler'] = self
+        with app.app_context():
+            _listen(list(db.engines.values()), self._on_query)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _on_query(self, statement: str, duration: float):
+        # background threads (audit flush, health probes) have no request profile
+        if has_request_context() and '_sql_profile' in g:
+            g._sql_profile.record(statement, duration, query_origin())
+
+    def _start(self):
+        g._sql_profile = QueryLog()
+
+    def _finish(self, response):
+        log: QueryLog | None = g.pop('_sql_profile', None)
+        if log is None:
+            return response
+        config = current_app.config
+        response.headers['X-SQL-Queries'] = str(len(log))
+        response.headers['X-SQL-Time-ms'] = f'{log.total_ms:.2f}'
+
+        endpoint = request.endpoint or request.path
+        if config['SQL_PROFILER_LOG_QUERIES']:
+            current_app.logger.debug(f'SQL for {request.method} {endpoint}: {log.report()}')
+        for repeat in log.repeated(config['SQL_PROFILER_N_PLUS_ONE']):
+            statement = ' '.join(repeat['statement'].split())
+            current_app.logger.warning(f"Possible N+1 in {endpoint}: {repeat['count']}x {statement} "
+                                       f"(from {', '.join(repeat['origins'])})")
+        return response
+
+
+sql_profiler = QueryProfiler()
@@ -0,0 +1,173 @@
+"""
+Per-client token buckets checked before a request reaches its view.
+
+Every POST to an endpoint listed in `RATE_LIMITS` (login, registration and the
+password-reset forms) takes one token from the bucket for (endpoint, client
+IP) in a `before_request` hook. An empty bucket answers a plain-text ``429``
+with ``Retry-After`` straight away. Abusive traffic never gets as far as form
+parsing, CSRF and email validation or a `User` SELECT. Unlike the per-account
+lockout, this also throttles one address spraying many emails.
+
+The client IP is `request.remote_addr`. Behind `TRUSTED_PROXY_COUNT` reverse
+proxies `create_app` installs Werkzeug's `ProxyFix`, so that is the address from
+``X-Forwarded-For``.
+
+Buckets live in process memory (`TokenBucketStore`), so each worker enforces
+its own limits. Cross-worker spraying is still caught by the lockout tracker's
+shared per-IP window. Once a bucket has refilled it is equivalent to no
+bucket, so a time wheel drops it at that point. Memory is therefore bounded by
+the clients active within one refill period, with no periodic full scans.
+"""
+import math
+import threading
+import time
+from functools import lru_cache
+
+from flask import current_app, request, Response
+
+from src.metrics import metrics
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+@lru_cache(maxsize=64)
+def parse_limit(spec: str) -> tuple[int, float]:
+    """``'10/minute'`` -> (burst capacity, tokens refilled per second)."""
+    try:
+        count, period = spec.split('/')
+        capacity, seconds = int(count), PERIODS[period.strip().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError(f"Invalid rate limit {spec!r}, expected e.g. '10/minute'") from None
+    if capacity < 1:
+        raise ValueError(f"Invalid rate limit {spec!r}: the count must be positive")
+    return capacity, capacity / seconds
+
+
+class TokenBucketStore:
+    """
+    Thread-safe token buckets, one ``[tokens, updated_at, full_at]`` list per key.
+
+    Each bucket has one entry on a wheel of `slots` ticks, filed under the
+    tick at which it will be full again. When the wheel passes that tick the
+    bucket is dropped if it is still idle. Otherwise it is filed again for
+    its new refill time, so taking a token never touches the wheel.
+    """
+
+    def __init__(self, max_keys: int = 100000, tick: float = 1.0, slots: int = 64):
+        self.max_keys = max_keys
+        self.tick = tick
+        self.slots = slots
+        self._buckets: dict = {}
+        self._wheel: list[list] = [[] for _ in range(slots)]
+        self._cursor = None # the last tick processed
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.evicted = 0
+        self.untracked = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, capacity: int, rate: float, now: float | None = None) -> float:
+        """Takes a token for `key`. Returns 0 if allowed, else the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._advance(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    # fail open rather than evict a bucket that is still limiting someone
+                    self.untracked += 1
+                    return 0.0
+                tokens = capacity - 1
+                bucket = self._buckets[key] = [tokens, now, now + 1 / rate]
+                self._schedule(key, bucket[2])
+                return 0.0
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            if tokens < 1:
+                self.rejected += 1
+                return (1 - tokens) / rate
+            bucket[0], bucket[1], bucket[2] = tokens - 1, now, now + (capacity - tokens + 1) / rate
+            return 0.0
+
+    def _schedule(self, key, full_at: float):
+        cursor = self._cursor
+        # beyond the wheel's horizon the bucket is simply looked at again one revolution later
+        due = min(max(math.ceil(full_at / self.tick), cursor + 1), cursor + self.slots)
+        self._wheel[due % self.slots].append(key)
+
+    def _advance(self, now: float):
+        target = int(now // self.tick)
+        if self._cursor is None:
+            self._cursor = target
+            return
+        # after a long idle spell one revolution visits every slot
+        start = max(self._cursor + 1, target - self.slots + 1)
+        self._cursor = target
+        for tick in range(start, target + 1):
+            slot = tick % self.slots
+            keys, self._wheel[slot] = self._wheel[slot], []
+            for key in keys:
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    continue
+                if bucket[2] <= now:
+                    del self._buckets[key]
+                    self.evicted += 1
+                else:
+                    self._schedule(key, bucket[2])
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._wheel = [[] for _ in range(self.slots)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'buckets': len(self._buckets),
+                'max_keys': self.max_keys,
+                'rejected': self.rejected,
+                'evicted': self.evicted,
+                'untracked': self.untracked,
+            }
+
+
+class RateLimiter:
+    """Applies `RATE_LIMITS` per client IP and endpoint before the view runs."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_ENABLED', True)
+        app.config.setdefault('RATE_LIMITS', {})
+        app.config.setdefault('RATE_LIMIT_METHODS', ('POST',))
+        app.config.setdefault('RATE_LIMIT_MAX_KEYS', 100000)
+        for spec in app.config['RATE_LIMITS'].values():
+            parse_limit(spec) # fail at startup, not on the first request
+        app.extensions['rate_limiter'] = TokenBucketStore(app.config['RATE_LIMIT_MAX_KEYS'])
+        app.before_request(self._check)
+
+    def _check(self):
+        config = current_app.config
+        if not config['RATE_LIMIT_ENABLED'] or request.method not in config['RATE_LIMIT_METHODS']:
+            return None
+        spec = config['RATE_LIMITS'].get(request.endpoint)
+        if spec is None:
+            return None
+        capacity, rate = parse_limit(spec)
+        wait = current_app.extensions['rate_limiter'].take((request.endpoint, request.remote_addr), capacity, rate)
+        if not wait:
+            return None
+        if request.endpoint == 'auth.login':
+            metrics.count_login('rate_limited')
+        return Response('Too many requests, please slow down.\n', 429, {'Retry-After': str(math.ceil(wait))},
+                        mimetype='text/plain')
+
+    def stats(self) -> dict:
+        return current_app.extensions['rate_limiter'].stats()
+
+
+rate_limiter = RateLimiter()
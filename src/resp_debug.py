@@ -0,0 +1,233 @@
+"""
+An in-memory Redis-protocol stand-in for development and tests (`flask state debug-server`).
+
+Implements just the commands `RedisStateBackend` sends (strings with expiry,
+INCR, sorted-set sliding windows, MULTI/EXEC) plus PING, SELECT, AUTH and
+FLUSHDB. Every command runs under one lock, so a MULTI/EXEC block is atomic
+like on a real server. `connections` counts client connections, so tests can
+check that workers reuse theirs.
+"""
+import socketserver
+import threading
+import time
+
+
+class _RESPError(Exception):
+    pass
+
+
+class _Status:
+    def __init__(self, text: str):
+        self.text = text
+
+
+def _score(bound: str) -> tuple[float, bool]:
+    """A ZRANGEBYSCORE bound as (value, exclusive)."""
+    exclusive = bound.startswith('(')
+    value = bound[1:] if exclusive else bound
+    return float(value), exclusive
+
+
+def _in_range(score: float, low: tuple, high: tuple) -> bool:
+    above = score > low[0] if low[1] else score >= low[0]
+    below = score < high[0] if high[1] else score <= high[0]
+    return above and below
+
+
+class _RESPHandler(socketserver.StreamRequestHandler):
+
+    def _write(self, reply):
+        self.wfile.write(self._encode(reply))
+
+    def _encode(self, reply) -> bytes:
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, _RESPError):
+            return b'-ERR %s\r\n' % str(reply).encode()
+        if isinstance(reply, bool):
+            return b':%d\r\n' % int(reply)
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, list):
+            return b'*%d\r\n' % len(reply) + b''.join(self._encode(item) for item in reply)
+        if isinstance(reply, _Status):
+            return b'+%s\r\n' % reply.text.encode()
+        data = str(reply).encode()
+        return b'$%d\r\n%s\r\n' % (len(data), data)
+
+    def _read_command(self) -> list[str] | None:
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # inline command, e.g. from telnet
+            return line.decode().split()
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2].decode())
+        return args
+
+    def handle(self):
+        server: DebuggingRESPServer = self.server
+        with server.lock:
+            server.connections += 1
+        queued = None
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name = command[0].upper() if command else ''
+            if name == 'MULTI':
+                queued = []
+                self._write(_Status('OK'))
+            elif name == 'EXEC':
+                if queued is None:
+                    self._write(_RESPError('EXEC without MULTI'))
+                    continue
+                with server.lock:
+                    self._write([server.run(cmd) for cmd in queued])
+                queued = None
+            elif name == 'DISCARD':
+                queued = None
+                self._write(_Status('OK'))
+            elif name == 'QUIT':
+                self._write(_Status('OK'))
+                return
+            elif queued is not None:
+                queued.append(command)
+                self._write(_Status('QUEUED'))
+            else:
+                with server.lock:
+                    self._write(server.run(command))
+
+
+class DebuggingRESPServer(socketserver.ThreadingTCPServer):
+    """Keeps every key in memory. Port 0 picks a free port (see `port`)."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), _RESPHandler)
+        self.data: dict = {}
+        self.expires: dict[str, float] = {}
+        self.connections = 0
+        self.commands = 0
+        self.lock = threading.RLock()
+        self._thread = None
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def _live(self, key: str):
+        deadline = self.expires.get(key)
+        if deadline is not None and deadline <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def run(self, command: list[str]):
+        """Executes one command; the caller holds `lock`."""
+        self.commands += 1
+        name, args = command[0].upper(), command[1:]
+        try:
+            handler = getattr(self, f'_cmd_{name.lower()}', None)
+            if handler is None:
+                # e.g. CLIENT SETINFO sent by real clients on connect
+                return _RESPError(f"unknown command '{name}'")
+            return handler(*args)
+        except (TypeError, ValueError) as e:
+            return _RESPError(f"wrong arguments for '{name}': {e}")
+
+    def _cmd_ping(self, *args):
+        return _Status('PONG')
+
+    def _cmd_select(self, db):
+        return _Status('OK')
+
+    def _cmd_auth(self, *args):
+        return _Status('OK')
+
+    def _cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return _Status('OK')
+
+    def _cmd_get(self, key):
+        value = self._live(key)
+        if isinstance(value, dict):
+            return _RESPError('WRONGTYPE')
+        return value
+
+    def _cmd_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        options = [option.upper() for option in options]
+        if 'PX' in options:
+            self.expires[key] = time.time() + int(options[options.index('PX') + 1]) / 1000
+        elif 'EX' in options:
+            self.expires[key] = time.time() + int(options[options.index('EX') + 1])
+        return _Status('OK')
+
+    def _cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def _cmd_incr(self, key):
+        value = int(self._live(key) or 0) + 1
+        self.data[key] = str(value)
+        return value
+
+    def _cmd_pexpire(self, key, milliseconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def _zset(self, key) -> dict:
+        value = self._live(key)
+        if value is None:
+            value = self.data[key] = {}
+        return value
+
+    def _cmd_zadd(self, key, *pairs):
+        zset = self._zset(key)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def _cmd_zremrangebyscore(self, key, low, high):
+        zset = self._live(key) or {}
+        low, high = _score(low), _score(high)
+        doomed = [member for member, score in zset.items() if _in_range(score, low, high)]
+        for member in doomed:
+            del zset[member]
+        return len(doomed)
+
+    def _cmd_zcard(self, key):
+        return len(self._live(key) or {})
+
+    def _cmd_zcount(self, key, low, high):
+        low, high = _score(low), _score(high)
+        return sum(_in_range(score, low, high) for score in (self._live(key) or {}).values())
+
+    def start(self):
+        """Serves on a daemon thread (for tests)."""
+        # a short poll interval keeps stop() (and test teardown) fast
+        self._thread = threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05},
+                                        name='debug-resp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
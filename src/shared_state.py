@@ -0,0 +1,480 @@
+"""
+Shared state for everything that must agree across gunicorn workers and nodes.
+
+Lockout counters, per-IP throttling, identity-cache invalidation and session
+revocation all go through one small backend (`SHARED_STATE_BACKEND`), so
+adding workers or nodes does not add writes to the database:
+
+* ``memory`` - per-process dicts. Fastest, but every worker keeps its own state.
+* ``sqlite`` - a WAL-mode SQLite file (`SHARED_STATE_PATH`) shared by every
+               worker on the host.
+* ``redis``  - any server speaking the Redis protocol (`SHARED_STATE_URL`),
+               shared by every node. Sliding windows are sorted sets updated in
+               one ``MULTI``/``EXEC``. `flask state debug-server` runs a local
+               stand-in for development and tests.
+
+Every backend offers the same two primitives: sliding-window hit counters
+(`hit`/`count`/`reset`) and small string values with a TTL
+(`get`/`set`/`incr`/`delete`).
+
+The ``sqlite`` and ``redis`` backends are wrapped in a `FailoverStateBackend`,
+the one place that decides what an outage means. While the shared backend is
+unreachable, every call is served by a per-process ``memory`` backend instead
+of failing the request:
+
+* lockout and per-IP counting degrade to per-worker limits rather than
+  letting every attempt through or answering 500;
+* cache-invalidation and revocation reads fail open: identity snapshots and
+  signed claims are bounded by `IDENTITY_CACHE_TTL`/`SESSION_CLAIMS_TTL`.
+
+The shared backend is tried again after `SHARED_STATE_RETRY_AFTER` seconds, so
+an outage costs one timeout per interval rather than one per request.
+"""
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from urllib.parse import urlparse
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+
+SHARED_STATE_BACKENDS = ('memory', 'sqlite', 'redis')
+
+
+class StateBackendError(Exception):
+    """Raised when the shared-state server rejects a command or cannot be reached."""
+
+
+class StateBackend(ABC):
+    """Interface for sliding-window counters and expiring values."""
+
+    @abstractmethod
+    def hit(self, key: str, window: float) -> int:
+        """Records an event for `key` and returns how many fall inside the window."""
+
+    @abstractmethod
+    def count(self, key: str, window: float) -> int:
+        """Returns how many events for `key` fall inside the window."""
+
+    @abstractmethod
+    def reset(self, key: str):
+        """Forgets every event recorded for `key`."""
+
+    @abstractmethod
+    def get(self, key: str) -> str | None:
+        """Returns the value of `key`, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float):
+        """Stores `value` under `key` for `ttl` seconds."""
+
+    @abstractmethod
+    def incr(self, key: str, ttl: float) -> int:
+        """Atomically increments an integer value (missing = 0) and (re)sets its TTL."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Removes the value of `key`."""
+
+
+class MemoryStateBackend(StateBackend):
+    """In-process state. Expired keys are swept out every `sweep_every` writes."""
+
+    def __init__(self, sweep_every: int = 1000):
+        self.sweep_every = sweep_every
+        self._hits: dict[str, tuple[deque, float]] = {}
+        self._values: dict[str, tuple[str, float]] = {}
+        self._lock = threading.Lock()
+        self._ops = 0
+
+    def _trim(self, hits: deque, cutoff: float):
+        while hits and hits[0] <= cutoff:
+            hits.popleft()
+
+    def _wrote(self, now: float):
+        self._ops += 1
+        if self._ops % self.sweep_every == 0:
+            self._sweep(now)
+
+    def hit(self, key, window):
+        now = time.time()
+        with self._lock:
+            hits = self._hits[key][0] if key in self._hits else deque()
+            self._trim(hits, now - window)
+            hits.append(now)
+            # a key is only useful until its newest hit leaves the window
+            self._hits[key] = (hits, now + window)
+            self._wrote(now)
+            return len(hits)
+
+    def count(self, key, window):
+        now = time.time()
+        with self._lock:
+            entry = self._hits.get(key)
+            if entry is None:
+                return 0
+            self._trim(entry[0], now - window)
+            return len(entry[0])
+
+    def reset(self, key):
+        with self._lock:
+            self._hits.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[0]
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self._lock:
+            self._values[key] = (str(value), now + ttl)
+            self._wrote(now)
+
+    def incr(self, key, ttl):
+        now = time.time()
+        with self._lock:
+            entry = self._values.get(key)
+            value = int(entry[0]) + 1 if entry is not None and entry[1] > now else 1
+            self._values[key] = (str(value), now + ttl)
+            self._wrote(now)
+            return value
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+
+    def _sweep(self, now: float):
+        for store in (self._hits, self._values):
+            for key in [key for key, entry in store.items() if entry[1] <= now]:
+                del store[key]
+
+    def __len__(self):
+        return len(self._hits) + len(self._values)
+
+
+class SQLiteStateBackend(StateBackend):
+    """State in a shared SQLite file so every worker on the host sees the same values."""
+
+    def __init__(self, path: str, sweep_every: int = 1000):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._pid = None
+        self._ops = 0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = self._connect()
+        conn.execute('CREATE TABLE IF NOT EXISTS window_hits (key TEXT NOT NULL, ts REAL NOT NULL, expires_at REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS ix_window_hits_key_ts ON window_hits (key, ts)')
+        conn.execute('CREATE TABLE IF NOT EXISTS state_values (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        # connections must never cross a fork, so reopen them in each new worker process
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _wrote(self, conn: sqlite3.Connection, now: float):
+        self._ops += 1
+        if self._ops % self.sweep_every == 0:
+            conn.execute('DELETE FROM window_hits WHERE expires_at <= ?', (now,))
+            conn.execute('DELETE FROM state_values WHERE expires_at <= ?', (now,))
+
+    def hit(self, key, window):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT INTO window_hits (key, ts, expires_at) VALUES (?, ?, ?)', (key, now, now + window))
+        self._wrote(conn, now)
+        return conn.execute('SELECT COUNT(*) FROM window_hits WHERE key = ? AND ts > ?',
+                            (key, now - window)).fetchone()[0]
+
+    def count(self, key, window):
+        return self._connect().execute('SELECT COUNT(*) FROM window_hits WHERE key = ? AND ts > ?',
+                                       (key, time.time() - window)).fetchone()[0]
+
+    def reset(self, key):
+        self._connect().execute('DELETE FROM window_hits WHERE key = ?', (key,))
+
+    def get(self, key):
+        row = self._connect().execute('SELECT value FROM state_values WHERE key = ? AND expires_at > ?',
+                                      (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        now = time.time()
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO state_values (key, value, expires_at) VALUES (?, ?, ?)',
+                     (key, str(value), now + ttl))
+        self._wrote(conn, now)
+
+    def incr(self, key, ttl):
+        now = time.time()
+        conn = self._connect()
+        # one statement, so concurrent workers can't lose an increment
+        value = conn.execute(
+            'INSERT INTO state_values (key, value, expires_at) VALUES (?, 1, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = CASE WHEN expires_at > ? THEN CAST(value AS INTEGER) + 1 ELSE 1 END, '
+            'expires_at = excluded.expires_at RETURNING value',
+            (key, now + ttl, now)).fetchone()[0]
+        self._wrote(conn, now)
+        return int(value)
+
+    def delete(self, key):
+        self._connect().execute('DELETE FROM state_values WHERE key = ?', (key,))
+
+
+class RESPConnection:
+    """A minimal Redis-protocol (RESP2) client: one socket per thread, pipelined commands."""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        parsed = urlparse(url)
+        if parsed.scheme != 'redis':
+            raise ValueError(f'SHARED_STATE_URL must be a redis:// URL, got {url!r}')
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._pid = None
+
+    def _socket(self):
+        if self._pid != os.getpid():
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+            setup = ([('AUTH', self.password)] if self.password else []) + ([('SELECT', self.db)] if self.db else [])
+            if setup:
+                self._roundtrip(conn, setup)
+        return conn
+
+    def _close(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    @staticmethod
+    def _encode(args) -> bytes:
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            out.append(b'$%d\r\n%s\r\n' % (len(data), data))
+        return b''.join(out)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('connection closed by server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            return StateBackendError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [self._read(reader) for _ in range(length)]
+        raise StateBackendError(f'unexpected reply {line!r}')
+
+    def _roundtrip(self, conn, commands) -> list:
+        sock, reader = conn
+        sock.sendall(b''.join(self._encode(command) for command in commands))
+        replies = [self._read(reader) for _ in commands]
+        for reply in replies:
+            if isinstance(reply, StateBackendError):
+                raise reply
+        return replies
+
+    def pipeline(self, *commands) -> list:
+        """Sends every command in one write and returns their replies in order."""
+        for attempt in (1, 2):
+            try:
+                return self._roundtrip(self._socket(), commands)
+            except (OSError, ConnectionError) as e:
+                # a server restart leaves a dead socket behind: reconnect once
+                self._close()
+                if attempt == 2:
+                    raise StateBackendError(f'shared state unreachable at {self.host}:{self.port}: {e}') from e
+
+    def execute(self, *args):
+        return self.pipeline(args)[0]
+
+    def transaction(self, *commands) -> list:
+        """Runs the commands atomically (``MULTI``/``EXEC``) and returns their results."""
+        results = self.pipeline(('MULTI',), *commands, ('EXEC',))[-1]
+        if results is None:
+            raise StateBackendError('transaction aborted')
+        for result in results:
+            if isinstance(result, StateBackendError):
+                raise result
+        return results
+
+
+class RedisStateBackend(StateBackend):
+    """State on a Redis-protocol server shared by every node. Keys are namespaced by `prefix`."""
+
+    def __init__(self, url: str, prefix: str = '', timeout: float = 2.0):
+        self.client = RESPConnection(url, timeout)
+        self.prefix = prefix
+
+    def hit(self, key, window):
+        now = time.time()
+        key = self.prefix + key
+        results = self.client.transaction(
+            ('ZREMRANGEBYSCORE', key, '-inf', now - window),
+            ('ZADD', key, now, f'{now}:{uuid.uuid4().hex[:8]}'),
+            ('ZCARD', key),
+            ('PEXPIRE', key, int(window * 1000) + 1))
+        return results[2]
+
+    def count(self, key, window):
+        return self.client.execute('ZCOUNT', self.prefix + key, f'({time.time() - window}', '+inf')
+
+    def reset(self, key):
+        self.client.execute('DEL', self.prefix + key)
+
+    def get(self, key):
+        return self.client.execute('GET', self.prefix + key)
+
+    def set(self, key, value, ttl):
+        self.client.execute('SET', self.prefix + key, value, 'PX', max(int(ttl * 1000), 1))
+
+    def incr(self, key, ttl):
+        key = self.prefix + key
+        return self.client.transaction(('INCR', key), ('PEXPIRE', key, max(int(ttl * 1000), 1)))[0]
+
+    def delete(self, key):
+        self.client.execute('DEL', self.prefix + key)
+
+
+class FailoverStateBackend(StateBackend):
+    """Uses `primary` while it answers and a per-process `MemoryStateBackend` while it doesn't."""
+
+    def __init__(self, primary: StateBackend, retry_after: float = 5.0):
+        self.primary = primary
+        self.fallback = MemoryStateBackend()
+        self.retry_after = retry_after
+        self.failures = 0
+        self._down_until = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self._down_until
+
+    def _call(self, name: str, *args):
+        if not self.degraded:
+            try:
+                return getattr(self.primary, name)(*args)
+            except (StateBackendError, sqlite3.Error) as e:
+                self._down_until = time.monotonic() + self.retry_after
+                self.failures += 1
+                if has_app_context():
+                    current_app.logger.warning(f"Shared state unavailable ({e}); using per-worker state "
+                                               f"for the next {self.retry_after}s")
+        return getattr(self.fallback, name)(*args)
+
+    def hit(self, key, window):
+        return self._call('hit', key, window)
+
+    def count(self, key, window):
+        return self._call('count', key, window)
+
+    def reset(self, key):
+        return self._call('reset', key)
+
+    def get(self, key):
+        return self._call('get', key)
+
+    def set(self, key, value, ttl):
+        return self._call('set', key, value, ttl)
+
+    def incr(self, key, ttl):
+        return self._call('incr', key, ttl)
+
+    def delete(self, key):
+        return self._call('delete', key)
+
+
+def build_backend(config) -> StateBackend:
+    backend = config['SHARED_STATE_BACKEND']
+    if backend == 'memory':
+        return MemoryStateBackend()
+    if backend == 'sqlite':
+        return FailoverStateBackend(SQLiteStateBackend(config['SHARED_STATE_PATH']),
+                                    config['SHARED_STATE_RETRY_AFTER'])
+    if backend == 'redis':
+        return FailoverStateBackend(RedisStateBackend(config['SHARED_STATE_URL'], config['SHARED_STATE_PREFIX'],
+                                                      config['SHARED_STATE_TIMEOUT']),
+                                    config['SHARED_STATE_RETRY_AFTER'])
+    raise ValueError(f"SHARED_STATE_BACKEND must be one of {SHARED_STATE_BACKENDS}")
+
+
+class SharedState:
+    """Attaches the configured shared-state backend to the application."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SHARED_STATE_BACKEND', 'memory')
+        app.config.setdefault('SHARED_STATE_PATH', os.path.join(app.instance_path, 'shared_state.db'))
+        app.config.setdefault('SHARED_STATE_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('SHARED_STATE_PREFIX', 'auth:')
+        app.config.setdefault('SHARED_STATE_TIMEOUT', 2.0)
+        app.config.setdefault('SHARED_STATE_RETRY_AFTER', 5.0)
+        app.extensions['shared_state'] = build_backend(app.config)
+
+    @property
+    def backend(self) -> StateBackend:
+        return current_app.extensions['shared_state']
+
+
+shared_state = SharedState()
+
+state_cli = AppGroup('state', help='Shared-state backend.')
+
+
+@state_cli.command('debug-server')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=6379, show_default=True)
+def debug_server_command(host, port):
+    """Runs an in-memory Redis-protocol stand-in (SHARED_STATE_BACKEND=redis)."""
+    from src.resp_debug import DebuggingRESPServer
+    server = DebuggingRESPServer(host, port)
+    click.echo(f'Debugging shared-state server listening on {host}:{server.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,163 @@
+"""
+Startup cost: profiling and the pieces that keep `create_app` cheap.
+
+* `flask startup profile` re-imports the app in a fresh interpreter under
+  ``python -X importtime`` and reports the slowest modules together with the
+  time spent in `create_app` itself.
+* Flask-Migrate pulls in Alembic, the largest import in the app, yet only the
+  `flask db ...` commands use it. `running_cli()` lets `create_app` skip it
+  when the app is built by gunicorn, uvicorn or the test suite.
+* `precompile_templates` (`TEMPLATE_PRECOMPILE`) compiles every Jinja template
+  during `create_app`. Under ``gunicorn --preload`` that happens once in the
+  master and the compiled templates are shared by every forked worker, instead
+  of each worker compiling them on its first requests. With
+  `TEMPLATE_CACHE_DIR` the compiled bytecode is also kept on disk for the next
+  cold start.
+* The gunicorn profile (``gunicorn.conf.py``) calls `after_fork` and `prewarm`
+  from its ``post_fork`` hook and `drain` from ``worker_exit``. A new worker
+  drops the pooled connections it inherited from the preloaded master, then
+  opens its own connections, hashing processes and health probes before
+  taking traffic. An exiting worker flushes what it still buffers.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import click
+from flask.cli import AppGroup, ScriptInfo
+from jinja2 import FileSystemBytecodeCache
+
+# runs in the child interpreter; prints its own timings as the last stdout line
+_PROFILE_SCRIPT = """
+import json, time
+start = time.perf_counter()
+from src import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+print(json.dumps({'import_ms': (imported - start) * 1000, 'create_app_ms': (created - imported) * 1000}))
+"""
+
+
+def running_cli() -> bool:
+    """
+    True while the `flask` command (e.g. `flask db upgrade`) is building the app.
+    Other click programs, such as `uvicorn asgi:app`, have no `ScriptInfo`.
+    """
+    ctx = click.get_current_context(silent=True)
+    return ctx is not None and isinstance(ctx.find_object(ScriptInfo), ScriptInfo)
+
+
+def precompile_templates(app) -> int:
+    """Loads every template into the Jinja cache now instead of on first render."""
+    env = app.jinja_env
+    cache_dir = app.config.get('TEMPLATE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    names = env.list_templates()
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def after_fork(app):
+    """
+    Forgets the connection pools inherited from the parent process. `close=False`
+    leaves the parent's sockets alone; the worker opens its own on demand.
+    """
+    from src.extensions import db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def prewarm(app) -> dict:
+    """Does the work a worker's first requests would otherwise pay for. Returns what was warmed and how long it took."""
+    from src.extensions import db
+    from src.auth.hashing import hashing_pool
+    from src.health import health
+
+    start = time.perf_counter()
+    warmed = {'db_connections': 0, 'templates': 0, 'hash_workers': 0}
+    with app.app_context():
+        for engine in db.engines.values():
+            # up to PREWARM_DB_CONNECTIONS, checked out together so the pool really opens that many
+            size = getattr(engine.pool, 'size', lambda: 1)()
+            connections = [engine.connect() for _ in range(min(app.config['PREWARM_DB_CONNECTIONS'], size))]
+            for connection in connections:
+                connection.exec_driver_sql('SELECT 1')
+                connection.close()
+            warmed['db_connections'] += len(connections)
+        if not app.config['TEMPLATE_PRECOMPILE']:
+            # otherwise create_app already compiled them, in the master under --preload
+            warmed['templates'] = precompile_templates(app)
+        warmed['hash_workers'] = hashing_pool.prewarm()
+        # starts the probe thread and waits for the first snapshot, so /readyz is right immediately
+        health.snapshot()
+    warmed['seconds'] = round(time.perf_counter() - start, 3)
+    return warmed
+
+
+def drain(app):
+    """Lets a worker finish its background work before it exits: rehashes, audit events, mail, probes, hashing."""
+    from src.auth.audit import audit_sink
+    from src.auth.hash_policy import hash_policy
+    from src.auth.hashing import hashing_pool
+    from src.health import health
+    from src.mail import mailer
+
+    with app.app_context():
+        hash_policy.shutdown()
+        audit_sink.shutdown()
+        mailer.shutdown()
+        health.shutdown()
+        hashing_pool.shutdown()
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parses `-X importtime` lines into {'module', 'self_ms', 'cumulative_ms', 'depth'} dicts."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        modules.append({
+            'module': name.strip(),
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000,
+            # two spaces of indentation per nesting level
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+        })
+    return modules
+
+
+def profile_startup(env: dict | None = None) -> dict:
+    """Imports and builds the app in a fresh interpreter and returns its timings and import profile."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _PROFILE_SCRIPT],
+                            capture_output=True, text=True, env=env or os.environ.copy(), check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    return {**timings, 'modules': parse_importtime(result.stderr)}
+
+
+startup_cli = AppGroup('startup', help='Startup profiling.')
+
+
+@startup_cli.command('profile')
+@click.option('--top', default=20, show_default=True, help='Modules to list.')
+@click.option('--sort', 'sort_key', type=click.Choice(['cumulative', 'self']), default='cumulative', show_default=True)
+@click.option('--max-depth', type=int, default=None, help='Only list modules nested at most this deep.')
+def profile_command(top, sort_key, max_depth):
+    """Reports import and create_app() time for a cold start."""
+    report = profile_startup()
+    modules = report['modules']
+    if max_depth is not None:
+        modules = [m for m in modules if m['depth'] <= max_depth]
+    modules.sort(key=lambda m: m[f'{sort_key}_ms'], reverse=True)
+
+    click.echo(f"import src: {report['import_ms']:.1f} ms   create_app(): {report['create_app_ms']:.1f} ms")
+    click.echo(f"{'self ms':>9} {'cumul. ms':>10}  module")
+    for m in modules[:top]:
+        click.echo(f"{m['self_ms']:>9.1f} {m['cumulative_ms']:>10.1f}  {m['module']}")
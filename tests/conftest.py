@@ -1,4 +1,6 @@
 # tests/conftest.py
+import contextlib
+import functools
 import os
 import pytest
 # FIX: Force the in-memory database BEFORE the app or config is imported!
@@ -8,6 +10,7 @@ from flask import Flask
 from src import create_app
 from src.extensions import db
 from src.auth.models import User
+from src.profiling import capture_queries
 
 @pytest.fixture
 def app():
@@ -19,7 +22,11 @@ def app():
         "TESTING": True,
         "SQLALCHEMY_DATABASE_URI": "sqlite://", # 'sqlite://' with no path means "in-memory only"
         "WTF_CSRF_ENABLED": False, # Disable CSRF tokens just for automated testing
-        "SECRET_KEY": "test-secret-key"
+        "SECRET_KEY": "test-secret-key",
+        "AUDIT_LOG_MODE": "sync", # Write audit rows in the request's own commit so tests can see them
+        "MAIL_WORKER": "off", # Tests deliver the outbox explicitly instead of from a background thread
+        "HEALTH_PROBE_MODE": "inline", # Probes run on the request, never concurrently with the test
+        "RATE_LIMIT_ENABLED": False # Tests post from one address far faster than any client would
     })
 
     # Create the database tables in RAM
@@ -34,12 +41,33 @@ def client(app: Flask):
     """A test client for the app to simulate browser requests."""
     return app.test_client()
 
+@functools.cache
+def existing_user_hash() -> str:
+    """scrypt is deliberately slow (~150 ms), so the fixture user's hash is computed once per session."""
+    from werkzeug.security import generate_password_hash
+    return generate_password_hash("password123")
+
 @pytest.fixture
 def init_database(app: Flask):
     """A fixture that provides a pre-populated database with one test user."""
     with app.app_context():
-        from werkzeug.security import generate_password_hash
-        user = User(email="existing@test.com", password_hash=generate_password_hash("password123"))
+        user = User(email="existing@test.com", password_hash=existing_user_hash())
         db.session.add(user)
         db.session.commit()
         return db
+
+@pytest.fixture
+def max_queries(app: Flask):
+    """
+    Query budget for a block: `with max_queries(3): client.get('/dashboard')` fails the test
+    if the block runs more SQL statements, or repeats one statement `max_repeats` times (N+1).
+    """
+    @contextlib.contextmanager
+    def budget(limit: int, max_repeats: int | None = None):
+        with capture_queries(app) as log:
+            yield log
+        if len(log) > limit:
+            pytest.fail(f"Query budget exceeded: {len(log)} > {limit}\n{log.report()}", pytrace=False)
+        if max_repeats is not None and log.repeated(max_repeats):
+            pytest.fail(f"Repeated statements (N+1?): {log.repeated(max_repeats)}\n{log.report()}", pytrace=False)
+    return budget
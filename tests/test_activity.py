@@ -0,0 +1,149 @@
+# tests/test_activity.py
+from datetime import datetime, timezone, timedelta
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src import create_app
+from src.extensions import db
+from src.auth.models import User, AuditLog
+from src.auth.audit import audit_sink
+from src.auth.activity import ActivityRings, ActivityEntry, recent_activity
+from src.shared_state import shared_state
+
+
+def _login(client: FlaskClient, password: str = 'password123'):
+    return client.post('/auth/login', data={'email': 'existing@test.com', 'password': password})
+
+def _entry(minute: int) -> ActivityEntry:
+    return ActivityEntry(datetime(2026, 1, 1, 0, minute, tzinfo=timezone.utc), '10.0.0.1', True)
+
+
+def test_rings_are_bounded_per_user_and_across_users():
+    """
+    GIVEN rings holding two events each for at most two users
+    WHEN more events and users arrive
+    THEN the oldest event and the least recently viewed user are dropped
+    """
+    rings = ActivityRings(max_users=2, size=2, ttl=60)
+    rings.store(1, 0, [_entry(1)])
+    rings.push(1, 1, _entry(2))
+    rings.push(1, 2, _entry(3))
+    assert rings.get(1, 2) == [_entry(3), _entry(2)]
+
+    rings.store(2, 0, [])
+    rings.get(1, 2) # user 1 is now the most recently viewed
+    rings.store(3, 0, [])
+    assert rings.get(2, 0) is None
+    assert rings.stats()['evictions'] == 1
+
+    # a push that skipped a generation means another worker recorded events in between
+    rings.push(1, 4, _entry(4))
+    assert rings.get(1, 2) is None and rings.get(1, 4) is None
+
+def test_dashboard_refresh_runs_no_sql(client: FlaskClient, init_database: SQLAlchemy, max_queries):
+    """
+    GIVEN a user whose ring was hydrated by a first dashboard view
+    WHEN they refresh, and after a new login event
+    THEN the dashboard runs no SQL and still shows every event
+    """
+    _login(client, 'wrong-password')
+    _login(client)
+    with max_queries(1):
+        client.get('/dashboard')
+
+    with max_queries(0):
+        response = client.get('/dashboard')
+    assert response.data.count(b'Failed') == 1 and response.data.count(b'bg-success') == 1
+
+    client.get('/auth/logout')
+    _login(client)
+    with max_queries(0):
+        response = client.get('/dashboard')
+    assert response.data.count(b'bg-success') == 2
+
+def test_buffered_events_are_shown_before_and_after_the_flush(app: Flask, init_database: SQLAlchemy):
+    """Events still in the audit buffer are merged into a hydrated ring exactly once."""
+    app.config.update(AUDIT_LOG_MODE='batched', AUDIT_BATCH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+    user = User.query.filter_by(email='existing@test.com').first()
+    db.session.add(AuditLog(user_id=user.id, was_successful=True, ip_address='10.0.0.1',
+                            created_at=datetime.now(timezone.utc) - timedelta(minutes=5)))
+    db.session.commit()
+    audit_sink.record(user.id, '10.0.0.2', was_successful=False)
+
+    app.extensions['recent_activity'].clear()
+    events = recent_activity.recent(user.id)
+    assert [entry.ip_address for entry in events] == ['10.0.0.2', '10.0.0.1']
+
+    audit_sink.flush()
+    app.extensions['recent_activity'].clear()
+    assert recent_activity.recent(user.id) == events
+
+def test_hydrate_between_buffering_and_push_counts_the_event_once(app: Flask, init_database: SQLAlchemy,
+                                                                  monkeypatch):
+    """
+    GIVEN an event already appended to the audit buffer but not yet pushed onto the ring
+    WHEN a dashboard read hydrates the ring in between
+    THEN the push that follows does not add the same event again
+    """
+    app.config.update(AUDIT_LOG_MODE='batched', AUDIT_BATCH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+    user = User.query.filter_by(email='existing@test.com').first()
+    push = recent_activity.record
+    def hydrate_then_push(*args):
+        app.extensions['recent_activity'].clear()
+        recent_activity.recent(user.id) # sees the buffered row
+        push(*args)
+    monkeypatch.setattr(recent_activity, 'record', hydrate_then_push)
+
+    audit_sink.record(user.id, '10.0.0.3', was_successful=True)
+
+    assert [entry.ip_address for entry in recent_activity.cached(user.id)] == ['10.0.0.3']
+    audit_sink.flush()
+
+def test_hydrate_sees_a_flush_in_progress_without_waiting_for_it(app: Flask, init_database: SQLAlchemy):
+    """
+    GIVEN an event a flush has taken from the buffer but not committed yet
+    WHEN a dashboard read hydrates the ring meanwhile
+    THEN it neither waits for the flush nor misses the event
+    """
+    app.config.update(AUDIT_LOG_MODE='batched', AUDIT_BATCH_SIZE=100, AUDIT_FLUSH_INTERVAL=3600)
+    user = User.query.filter_by(email='existing@test.com').first()
+    audit_sink.record(user.id, '10.0.0.4', was_successful=True)
+    buffer = app.extensions['audit_sink']
+
+    with buffer.flush_lock:
+        buffer.rows, buffer.in_flight = [], buffer.rows
+        app.extensions['recent_activity'].clear()
+        assert [entry.ip_address for entry in recent_activity.recent(user.id)] == ['10.0.0.4']
+        buffer.rows, buffer.in_flight = buffer.in_flight, []
+
+    audit_sink.flush()
+
+def test_force_db_reads_the_table_every_time(client: FlaskClient, init_database: SQLAlchemy, app: Flask,
+                                             max_queries):
+    """RECENT_ACTIVITY_FORCE_DB bypasses the rings and serves the same events from the table."""
+    _login(client)
+    client.get('/dashboard') # shows the flashed welcome message once
+    cached = client.get('/dashboard').data
+
+    app.config['RECENT_ACTIVITY_FORCE_DB'] = True
+    for _ in range(2):
+        with max_queries(1):
+            assert client.get('/dashboard').data == cached
+
+def test_events_recorded_by_another_worker_invalidate_the_ring(app: Flask, init_database: SQLAlchemy, tmp_path):
+    """A push on one worker bumps the shared generation, so the other worker hydrates again."""
+    other = create_app()
+    for worker in (app, other):
+        worker.config.update(SHARED_STATE_BACKEND='sqlite', SHARED_STATE_PATH=str(tmp_path / 'state.db'))
+        shared_state.init_app(worker)
+    user = User.query.filter_by(email='existing@test.com').first()
+
+    recent_activity.recent(user.id)
+    assert recent_activity.cached(user.id) == []
+
+    with other.app_context():
+        recent_activity.record(user.id, datetime.now(timezone.utc), '10.0.0.9', True)
+
+    assert recent_activity.cached(user.id) is None
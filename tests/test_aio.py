@@ -0,0 +1,122 @@
+# tests/test_aio.py
+import asyncio
+import json
+import threading
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, literal_column
+
+from src.aio import async_db, async_database_url, AsgiAdapter
+from src.auth.models import User, AuditLog
+
+
+def test_async_database_url():
+    """Sync URLs map to their async drivers; in-memory SQLite has no shareable async twin."""
+    assert async_database_url('sqlite:////tmp/app.db') == 'sqlite+aiosqlite:////tmp/app.db'
+    assert async_database_url('postgresql://u:p@db/auth') == 'postgresql+asyncpg://u:p@db/auth'
+    assert async_database_url('postgresql+psycopg2://u:p@db/auth') == 'postgresql+asyncpg://u:p@db/auth'
+    assert async_database_url('sqlite://') is None
+    assert async_database_url('mysql://u:p@db/auth') is None
+
+def test_async_views_cover_the_auth_flow(client: FlaskClient, app: Flask):
+    """
+    GIVEN ASYNC_MODE views installed
+    WHEN a user registers, logs in and opens the dashboard
+    THEN the coroutine views behave exactly like the sync ones
+    """
+    async_db.install_views(app)
+    assert asyncio.iscoroutinefunction(app.view_functions['auth.login'])
+
+    response = client.post('/auth/register', data={
+        'email': 'async@test.com', 'password': 'SecurePassword123', 'confirm_password': 'SecurePassword123'})
+    assert response.status_code == 302
+    user = User.query.filter_by(email='async@test.com').one()
+
+    response = client.post('/auth/login', data={'email': 'async@test.com', 'password': 'wrong-password'})
+    assert b'Invalid email or password' in response.data
+
+    response = client.post('/auth/login', data={'email': 'async@test.com', 'password': 'SecurePassword123'})
+    assert response.headers['Location'].endswith('/dashboard')
+    assert AuditLog.query.filter_by(user_id=user.id).count() == 2
+
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+    assert response.data.count(b'<tr>') >= 3
+
+    assert client.get('/status').status_code == 200
+
+def _http_scope(path: str) -> dict:
+    return {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'scheme': 'http', 'path': path,
+            'raw_path': path.encode(), 'root_path': '', 'query_string': b'', 'headers': [],
+            'server': ('testserver', 80), 'client': ('127.0.0.1', 50000)}
+
+def test_asgi_adapter_uses_pooled_async_engine(app: Flask, tmp_path):
+    """
+    GIVEN the ASGI adapter with an aiosqlite database
+    WHEN a request is served and a query runs on the loop after lifespan startup
+    THEN the query uses the server loop's pooled engine, which is disposed on shutdown
+    """
+    app.config.update(ASYNC_MODE=True, ASYNC_DATABASE_URI=f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+    async_db.init_app(app)
+    adapter = AsgiAdapter(app, threads=2)
+    engines = app.extensions['async_db']
+
+    async def serve():
+        lifespan_in = asyncio.Queue()
+        lifespan_out = []
+        async def lifespan_send(message):
+            lifespan_out.append(message['type'])
+        lifespan = asyncio.create_task(adapter({'type': 'lifespan'}, lifespan_in.get, lifespan_send))
+        await lifespan_in.put({'type': 'lifespan.startup'})
+        while not lifespan_out:
+            await asyncio.sleep(0.01)
+
+        sent = []
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def send(message):
+            sent.append(message)
+        await adapter(_http_scope('/status'), receive, send)
+        assert await async_db.scalars(select(literal_column('1'))) == [1]
+        pooled = dict(engines.pooled)
+
+        await lifespan_in.put({'type': 'lifespan.shutdown'})
+        await lifespan
+        return sent, pooled, lifespan_out
+
+    sent, pooled, lifespan_events = asyncio.run(serve())
+
+    assert sent[0]['status'] == 200
+    assert json.loads(b''.join(m.get('body', b'') for m in sent[1:]))['database'] == 'connected'
+    assert None in pooled
+    assert lifespan_events == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert engines.pooled == {}
+
+def test_asgi_adapter_runs_requests_on_its_thread_pool(app: Flask):
+    """Requests run on the adapter's pool threads; a flood of duplicate headers is still refused with 400."""
+    threads = []
+    @app.route('/thread-name')
+    def thread_name():
+        threads.append(threading.current_thread().name)
+        return 'ok'
+    adapter = AsgiAdapter(app, threads=2)
+
+    async def call(scope):
+        sent = []
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        async def send(message):
+            sent.append(message)
+        await adapter(scope, receive, send)
+        return sent
+
+    sent = asyncio.run(call(_http_scope('/thread-name')))
+    assert sent[0]['status'] == 200
+    assert b''.join(m.get('body', b'') for m in sent[1:]) == b'ok'
+    assert threads[0].startswith('asgi')
+
+    flood = dict(_http_scope('/thread-name'), headers=[(b'x-dup', b'1')] * (adapter.header_limit + 1))
+    assert asyncio.run(call(flood))[0]['status'] == 400
+    adapter.executor.shutdown()
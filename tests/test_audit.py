@@ -0,0 +1,102 @@
+# tests/test_audit.py
+import time
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src.auth.models import User, AuditLog
+from src.auth.audit import audit_sink
+from src.health import health
+
+
+def test_sync_mode_writes_with_login(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """In sync mode the audit row is committed together with the login itself."""
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    with app.app_context():
+        logs = AuditLog.query.all()
+        assert len(logs) == 1
+        assert logs[0].was_successful is True
+
+def test_batched_mode_buffers_until_threshold(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """
+    GIVEN the batched audit mode with a batch size of 3
+    WHEN fewer events than the batch size are recorded
+    THEN nothing is written until the threshold is crossed, then all rows land at once
+    """
+    app.config.update({"AUDIT_LOG_MODE": "batched", "AUDIT_BATCH_SIZE": 3, "AUDIT_FLUSH_INTERVAL": 3600})
+
+    for _ in range(2):
+        client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'wrong'})
+
+    with app.app_context():
+        assert AuditLog.query.count() == 0
+        assert audit_sink.stats()['pending'] == 2
+
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'wrong'})
+
+    with app.app_context():
+        assert AuditLog.query.count() == 3
+        stats = audit_sink.stats()
+        assert stats['pending'] == 0
+        assert stats['flushes'] == 1
+
+def test_explicit_flush_drains_buffer(app: Flask, init_database: SQLAlchemy):
+    """Shutdown-style flushes write whatever is still buffered."""
+    app.config.update({"AUDIT_LOG_MODE": "batched", "AUDIT_BATCH_SIZE": 100, "AUDIT_FLUSH_INTERVAL": 3600})
+
+    with app.app_context():
+        user = User.query.filter_by(email='existing@test.com').first()
+        audit_sink.record(user.id, '10.0.0.1', was_successful=False)
+        assert AuditLog.query.count() == 0
+
+        assert audit_sink.flush() == 1
+        log = AuditLog.query.one()
+        assert log.ip_address == '10.0.0.1'
+        assert log.created_at is not None
+
+def test_batched_mode_flushes_a_lone_event_on_the_timer(app: Flask, init_database: SQLAlchemy):
+    """An event below the batch size is written within the flush interval without another request."""
+    app.config.update({"AUDIT_LOG_MODE": "batched", "AUDIT_BATCH_SIZE": 100, "AUDIT_FLUSH_INTERVAL": 0.05})
+    buffer = app.extensions['audit_sink']
+    try:
+        with app.app_context():
+            user = User.query.filter_by(email='existing@test.com').first()
+            audit_sink.record(user.id, '10.0.0.1', was_successful=True)
+
+            deadline = time.monotonic() + 5
+            while not audit_sink.stats()['flushed'] and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert AuditLog.query.count() == 1
+    finally:
+        buffer.stop()
+        buffer.worker.join(timeout=5)
+
+def test_failed_flush_overflow_is_reported(app: Flask, init_database: SQLAlchemy, caplog, monkeypatch):
+    """
+    GIVEN a flush that fails while new events fill the buffer behind it
+    WHEN its rows are put back
+    THEN what does not fit under AUDIT_BUFFER_MAX is counted, logged and degrades the health check
+    """
+    app.config.update({"AUDIT_LOG_MODE": "batched", "AUDIT_BATCH_SIZE": 100, "AUDIT_FLUSH_INTERVAL": 3600,
+                       "AUDIT_BUFFER_MAX": 3})
+    buffer = app.extensions['audit_sink']
+    def database_down(table):
+        buffer.rows.extend([{}, {}]) # recorded by other requests meanwhile
+        raise RuntimeError('database is down')
+    monkeypatch.setattr('src.auth.audit.insert', database_down)
+    try:
+        with app.app_context():
+            user = User.query.filter_by(email='existing@test.com').first()
+            audit_sink.record(user.id, '10.0.0.1', was_successful=True)
+            audit_sink.record(user.id, '10.0.0.2', was_successful=True)
+
+            assert audit_sink.flush() == 0
+            assert audit_sink.stats()['pending'] == 3
+            assert audit_sink.stats()['dropped'] == 1
+            assert 'dropped 1 events' in caplog.text
+            assert health.refresh()['checks']['audit_buffer']['status'] == 'degraded'
+    finally:
+        buffer.rows.clear()
+        buffer.stop()
@@ -6,6 +6,7 @@ from flask.testing import FlaskClient
 from flask_login import current_user
 from flask_sqlalchemy import SQLAlchemy
 from src.auth.models import User, AuditLog
+from src.auth.lockout import lockout_tracker
 from freezegun import freeze_time
 from datetime import datetime, timezone, timedelta
 
@@ -25,13 +26,14 @@ def test_valid_login_and_logout(client: FlaskClient, init_database: SQLAlchemy):
         assert current_user.is_authenticated is False
 
 def test_invalid_login(client: FlaskClient, init_database: SQLAlchemy):
-    """Test that wrong passwords trigger the atomic rate limit counter."""
+    """Test that wrong passwords are counted by the lockout tracker, not on the user row."""
     client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'WrongPassword!!!'})
 
-    # Assert State: Check the actual database row
+    # Assert State: the tracker counted the failure and the database row was left alone
     user = User.query.filter_by(email='existing@test.com').first()
 
-    assert user.failed_login_attempts == 1
+    assert lockout_tracker.failures(user) == 1
+    assert user.failed_login_attempts == 0
     assert user.is_locked is False
 # tests/test_auth.py
 from flask_login import current_user
@@ -179,3 +181,14 @@ def test_reset_password_with_token(client: FlaskClient, init_database: SQLAlchem
 
     assert login_response.status_code == 302
     assert '/dashboard' in login_response.location
+
+def test_duplicate_registration_shows_field_error(client: FlaskClient, init_database: SQLAlchemy):
+    """A conflict reported by the INSERT is rendered as an email field error, not a 500."""
+    response = client.post('/auth/register', data={
+        'email': 'existing@test.com',
+        'password': 'NewPassword123',
+        'confirm_password': 'NewPassword123'
+    })
+
+    assert response.status_code == 200
+    assert b'Email address is already registered' in response.data
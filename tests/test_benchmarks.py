@@ -0,0 +1,49 @@
+# tests/test_benchmarks.py
+# Keeps the benchmark harness runnable; the real numbers come from `python -m benchmarks`.
+from flask import Flask
+
+from benchmarks import harness
+
+
+def test_percentile_nearest_rank():
+    """Percentiles use the nearest-rank method on sorted samples."""
+    samples = [float(n) for n in range(1, 101)]
+    assert harness.percentile(samples, 50) == 50.0
+    assert harness.percentile(samples, 99) == 99.0
+    assert harness.percentile([], 99) == 0.0
+
+def test_every_scenario_runs_without_server_errors(app: Flask):
+    """
+    GIVEN a small seeded database
+    WHEN every scenario runs a few operations through the test client
+    THEN each reports latency percentiles and no 5xx responses
+    """
+    ctx = harness.seed(app, users=5, audit_rows=50)
+    driver = harness.ClientDriver(app)
+
+    for name in harness.SCENARIOS:
+        result = harness.run_scenario(driver, name, ctx, requests=3)
+        assert result['requests'] == 3
+        assert result['errors'] == 0, (name, result['statuses'])
+        assert result['p50_ms'] <= result['p99_ms']
+
+def test_register_scenario_is_one_statement_per_signup(app: Flask):
+    """Registration relies on the unique email index: one INSERT per signup, no SELECT first."""
+    ctx = harness.seed(app, users=2, audit_rows=0)
+    driver = harness.ClientDriver(app)
+
+    result = harness.run_scenario(driver, 'register', ctx, requests=4)
+
+    assert result['statuses'] == {'302': 4}
+    assert result['queries_per_op'] == 1
+
+def test_allocations_are_measured_per_operation(app: Flask):
+    """With allocations on, the client driver reports the peak memory each request allocates."""
+    ctx = harness.seed(app, users=2, audit_rows=10)
+    driver = harness.ClientDriver(app)
+
+    result = harness.run_scenario(driver, 'dashboard_deep_history', ctx, requests=3, allocations=True)
+
+    assert result['statuses'] == {'200': 3}
+    assert result['alloc_kb_per_op'] > 0
+    assert harness.run_scenario(driver, 'status', ctx, requests=1)['alloc_kb_per_op'] is None
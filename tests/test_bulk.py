@@ -0,0 +1,84 @@
+# tests/test_bulk.py
+import json
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from src.auth.models import User
+
+
+def test_import_csv_dedupes_and_hashes(app: Flask, init_database: SQLAlchemy, tmp_path):
+    """
+    GIVEN a CSV with a new user, a pre-hashed user, an existing email, an in-file duplicate and a bad row
+    WHEN `flask users import` runs
+    THEN only the two new accounts are inserted and both can authenticate
+    """
+    prehashed = generate_password_hash('prehashed-pass')
+    path = tmp_path / 'users.csv'
+    path.write_text(
+        'email,password,password_hash,username\n'
+        'alice@test.com,alice-password,,alice\n'
+        'alice@test.com,other-password,,\n'
+        f'bob@test.com,,{prehashed},\n'
+        'existing@test.com,whatever123,,\n'
+        'not-an-email,password123,,\n'
+    )
+
+    result = app.test_cli_runner().invoke(args=['users', 'import', str(path), '--workers', '0', '--batch-size', '2'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 users (1 already existed, 1 duplicates in file, 1 invalid rows, 0 usernames' in result.output
+    alice = User.query.filter_by(email='alice@test.com').one()
+    assert alice.username == 'alice'
+    assert check_password_hash(alice.password_hash, 'alice-password')
+    assert User.query.filter_by(email='bob@test.com').one().password_hash == prehashed
+    assert User.query.count() == 3
+
+def test_import_rejects_fake_hashes_and_taken_usernames(app: Flask, init_database: SQLAlchemy, tmp_path):
+    """
+    GIVEN rows whose password_hash is not a hash (and no password), and rows reusing a username
+    WHEN they are imported in batches after a good one
+    THEN they are reported instead of aborting the run or storing the hash of an empty password
+    """
+    User.query.filter_by(email='existing@test.com').one().username = 'taken'
+    init_database.session.commit()
+    path = tmp_path / 'users.jsonl'
+    path.write_text('\n'.join(json.dumps(record) for record in [
+        {'email': 'first@test.com', 'password': 'first-password', 'username': 'first'},
+        {'email': 'nohash@test.com', 'password_hash': 'plaintext-by-mistake'},
+        {'email': 'squatter@test.com', 'password': 'password123', 'username': 'taken'},
+        {'email': 'copycat@test.com', 'password': 'password123', 'username': 'first'},
+        {'email': 'second@test.com', 'password': 'second-password', 'username': 'second'},
+    ]))
+
+    result = app.test_cli_runner().invoke(args=['users', 'import', str(path), '--workers', '0', '--batch-size', '2'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 users (0 already existed, 0 duplicates in file, 1 invalid rows, 2 usernames' in result.output
+    assert {user.email for user in User.query} == {'existing@test.com', 'first@test.com', 'second@test.com'}
+
+def test_import_csv_with_an_empty_password_and_a_fake_hash_is_invalid(app: Flask, init_database: SQLAlchemy,
+                                                                      tmp_path):
+    """In CSV a missing password is '', which must not be hashed and stored."""
+    path = tmp_path / 'users.csv'
+    path.write_text('email,password,password_hash\nnohash@test.com,,not-a-hash\n')
+
+    result = app.test_cli_runner().invoke(args=['users', 'import', str(path), '--workers', '0'])
+
+    assert 'Imported 0 users (0 already existed, 0 duplicates in file, 1 invalid rows' in result.output
+    assert User.query.filter_by(email='nohash@test.com').first() is None
+
+def test_export_jsonl_round_trip(app: Flask, init_database: SQLAlchemy, tmp_path):
+    """Exported JSONL can be fed back into import without creating duplicates."""
+    path = tmp_path / 'users.jsonl'
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['users', 'export', str(path)])
+    assert result.exit_code == 0
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record['email'] for record in records] == ['existing@test.com']
+    assert records[0]['password_hash'].count('$') >= 2
+
+    result = runner.invoke(args=['users', 'import', str(path), '--workers', '0'])
+    assert 'Imported 0 users (1 already existed' in result.output
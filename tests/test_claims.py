@@ -0,0 +1,56 @@
+# tests/test_claims.py
+from flask import Flask, g
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from src.extensions import db
+from src.auth.models import User
+from src.auth.claims import ClaimsPrincipal
+
+
+def _fresh_request_state(app: Flask):
+    """The test app context outlives requests, so drop Flask-Login's per-request user."""
+    g.pop('_login_user', None)
+    app.extensions['identity_cache'].clear()
+
+def test_read_requests_skip_user_lookup(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """
+    GIVEN signed session claims are enabled and the user has logged in
+    WHEN a read-only page is requested
+    THEN current_user is a ClaimsPrincipal and the users table is never queried
+    """
+    app.config['SESSION_CLAIMS_ENABLED'] = True
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+    _fresh_request_state(app)
+
+    user_queries = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            user_queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get('/dashboard')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert response.status_code == 200
+    assert b"existing@test.com" in response.data
+    assert isinstance(g._login_user, ClaimsPrincipal)
+    assert user_queries == []
+
+def test_version_bump_revokes_on_write(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """Bumping the session version logs the session out on the next write request."""
+    app.config['SESSION_CLAIMS_ENABLED'] = True
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    user = User.query.filter_by(email='existing@test.com').first()
+    user.revoke_sessions()
+    db.session.commit()
+    _fresh_request_state(app)
+
+    # a POST is a write: claims are checked against the row and the session is refused
+    response = client.post('/auth/login', data={})
+    assert response.status_code == 200 # the anonymous login form, not a redirect
+    assert b"Welcome Back" in response.data
@@ -0,0 +1,83 @@
+# tests/test_database.py
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine, text
+
+from config import Config, ProdConfig
+from src.database import (build_engine_options, configure_engines, install_sqlite_pragmas, use_replica, RoutingSession,
+                          insert_ignoring_conflicts)
+from src.extensions import db
+from src.auth.models import User
+
+
+def _config(profile) -> dict:
+    return {key: getattr(profile, key) for key in dir(profile) if key.isupper()}
+
+def test_engine_options_per_backend():
+    """
+    GIVEN the production profile
+    WHEN engine options are built for PostgreSQL, a SQLite file and in-memory SQLite
+    THEN only the settings that apply to each backend are passed
+    """
+    config = _config(ProdConfig)
+
+    pg = build_engine_options(config, 'postgresql://app@db/auth')
+    assert pg['pool_size'] == ProdConfig.DB_POOL_SIZE
+    assert pg['pool_recycle'] == 1800
+    assert pg['connect_args'] == {'options': f'-c statement_timeout={ProdConfig.DB_STATEMENT_TIMEOUT_MS}'}
+
+    sqlite_file = build_engine_options(config, 'sqlite:////tmp/app.db')
+    assert 'pool_recycle' not in sqlite_file
+    assert sqlite_file['connect_args'] == {'timeout': 5.0}
+
+    assert build_engine_options(config, 'sqlite://') == {}
+
+def test_sqlite_pragmas_applied_on_connect(tmp_path):
+    """New SQLite connections come up in WAL mode with synchronous=NORMAL."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    install_sqlite_pragmas(engine, Config.SQLITE_PRAGMAS)
+
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1 # NORMAL
+
+def test_read_only_views_use_replica(tmp_path):
+    """Queries inside a @use_replica view go to the replica bind; other views use the primary."""
+    app = Flask(__name__)
+    app.config.update(_config(Config))
+    app.config.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'primary.db'}",
+        'SQLALCHEMY_BINDS': {'replica': f"sqlite:///{tmp_path / 'replica.db'}"},
+    })
+    app.config.pop('SQLALCHEMY_ENGINE_OPTIONS', None)
+    configure_engines(app)
+    db = SQLAlchemy(session_options={'class_': RoutingSession})
+    db.init_app(app)
+
+    with app.app_context():
+        for bind_key, name in ((None, 'primary'), ('replica', 'replica')):
+            with db.engines[bind_key].begin() as conn:
+                conn.execute(text('CREATE TABLE whoami (name TEXT)'))
+                conn.execute(text('INSERT INTO whoami VALUES (:name)'), {'name': name})
+
+    @app.route('/read')
+    @use_replica
+    def read():
+        return db.session.execute(text('SELECT name FROM whoami')).scalar()
+
+    @app.route('/write')
+    def write():
+        return db.session.execute(text('SELECT name FROM whoami')).scalar()
+
+    client = app.test_client()
+    assert client.get('/read').data == b'replica'
+    assert client.get('/write').data == b'primary'
+
+def test_insert_ignoring_conflicts_without_returning(app: Flask, init_database: SQLAlchemy, monkeypatch):
+    """Where INSERT ... RETURNING is missing (SQLite < 3.35) the inserted keys come from the rowcount fallback."""
+    monkeypatch.setattr(db.engine.dialect, 'insert_returning', False)
+    rows = [{'email': 'existing@test.com', 'password_hash': 'x'}, {'email': 'fresh@test.com', 'password_hash': 'x'}]
+
+    inserted = insert_ignoring_conflicts(db.session, User, rows, ['email'])
+
+    assert inserted == [db.session.scalar(db.select(User.id).where(User.email == 'fresh@test.com'))]
@@ -0,0 +1,128 @@
+# tests/test_hash_policy.py
+import threading
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import select, update
+from werkzeug.security import generate_password_hash
+
+from src.extensions import db
+from src.auth.models import User
+from src.auth.hash_policy import hash_policy, normalize_method, method_of, needs_rehash, calibrate
+
+
+def _login(client: FlaskClient, password: str = 'password123'):
+    return client.post('/auth/login', data={'email': 'existing@test.com', 'password': password})
+
+def _store_hash(pwhash: str):
+    db.session.execute(update(User).where(User.email == 'existing@test.com').values(password_hash=pwhash))
+    db.session.commit()
+
+def _stored_hash() -> str:
+    db.session.expire_all()
+    return db.session.scalar(select(User.password_hash).where(User.email == 'existing@test.com'))
+
+
+def test_methods_are_normalized_to_the_stored_form():
+    """Short method names compare equal to the explicit form Werkzeug writes into hashes."""
+    assert normalize_method('scrypt') == 'scrypt:32768:8:1'
+    assert normalize_method('scrypt:65536') == 'scrypt:65536:8:1'
+    assert normalize_method('pbkdf2:sha256:1000') == 'pbkdf2:sha256:1000'
+
+    pwhash = generate_password_hash('secret', method='scrypt')
+    assert method_of(pwhash) == 'scrypt:32768:8:1'
+    assert not needs_rehash(pwhash, 'scrypt')
+    assert needs_rehash(pwhash, 'scrypt:65536:8:1')
+
+    with pytest.raises(ValueError):
+        normalize_method('md5')
+
+def test_outdated_hash_is_upgraded_after_login(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """
+    GIVEN a user whose stored hash uses cheaper parameters than the policy
+    WHEN they log in successfully
+    THEN the hash is recomputed in the background with the policy method and still verifies
+    """
+    _store_hash(generate_password_hash('password123', method='pbkdf2:sha256:1000'))
+
+    assert '/dashboard' in _login(client).location
+    hash_policy.wait(timeout=10)
+
+    assert method_of(_stored_hash()) == app.config['PASSWORD_HASH_METHOD']
+    assert hash_policy.stats()['rehashed'] == 1
+
+    client.get('/auth/logout')
+    assert '/dashboard' in _login(client).location
+    hash_policy.wait(timeout=10)
+    assert hash_policy.stats()['rehashed'] == 1
+
+def test_failed_login_never_rehashes(client: FlaskClient, init_database: SQLAlchemy):
+    """A wrong password must not schedule anything."""
+    old_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+    _store_hash(old_hash)
+
+    _login(client, 'wrong-password')
+    hash_policy.wait(timeout=10)
+
+    assert _stored_hash() == old_hash
+
+def test_rehash_does_not_overwrite_a_changed_password(app: Flask, init_database: SQLAlchemy):
+    """
+    GIVEN a rehash scheduled for a hash that is replaced before it runs
+    WHEN the background rehash finishes
+    THEN the newer hash is kept
+    """
+    user = db.session.scalar(select(User).where(User.email == 'existing@test.com'))
+    old_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+    newer_hash = generate_password_hash('changed-password')
+    _store_hash(newer_hash)
+
+    assert hash_policy.maybe_rehash(user.id, old_hash, 'password123') is True
+    hash_policy.wait(timeout=10)
+
+    assert _stored_hash() == newer_hash
+    assert hash_policy.stats()['stale'] == 1
+
+def test_calibrate_recommends_a_usable_method():
+    """Calibration returns a method string Werkzeug accepts, at least the minimum cost."""
+    result = calibrate('scrypt', target_ms=1, max_memory_mb=16)
+    assert result['method'] == 'scrypt:16384:8:1'
+    assert method_of(generate_password_hash('secret', method=result['method'])) == result['method']
+
+def test_hash_status_cli_counts_methods(app: Flask, init_database: SQLAlchemy):
+    """`flask hash status` groups users by stored method and marks the outdated ones."""
+    db.session.add(User(email='legacy@test.com',
+                        password_hash=generate_password_hash('password123', method='pbkdf2:sha256:1000')))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['hash', 'status'])
+
+    assert result.exit_code == 0
+    assert 'Policy: scrypt:32768:8:1' in result.output
+    assert 'pbkdf2:sha256:1000  (rehashed on next login)' in result.output
+
+def test_pending_rehashes_are_bounded(app: Flask, monkeypatch):
+    """
+    GIVEN a rehash queue that is not draining
+    WHEN the same user logs in again, or more users than PASSWORD_REHASH_MAX_PENDING log in
+    THEN the extra rehashes are skipped instead of queued
+    """
+    release = threading.Event()
+    monkeypatch.setattr(hash_policy, '_rehash', lambda *args: release.wait(10))
+    monkeypatch.setitem(app.config, 'PASSWORD_REHASH_MAX_PENDING', 3)
+    old_hash = generate_password_hash('password123', method='pbkdf2:sha256:1000')
+
+    try:
+        assert hash_policy.maybe_rehash(1, old_hash, 'password123') is True
+        assert hash_policy.maybe_rehash(1, old_hash, 'password123') is False
+        assert hash_policy.maybe_rehash(2, old_hash, 'password123') is True
+        assert hash_policy.maybe_rehash(3, old_hash, 'password123') is True
+        assert hash_policy.maybe_rehash(4, old_hash, 'password123') is False
+        assert hash_policy.stats()['pending'] == 3
+    finally:
+        release.set()
+    hash_policy.wait(timeout=10)
+
+    assert hash_policy.stats()['skipped'] == 2
@@ -0,0 +1,86 @@
+# tests/test_hashing.py
+import asyncio
+import os
+import signal
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src.auth.hashing import HashingPool, HashingPoolSaturated
+
+
+def test_pool_hash_round_trip():
+    """
+    GIVEN a hashing pool backed by worker processes
+    WHEN a password is hashed and checked through it
+    THEN the results match Werkzeug and the latency statistics are recorded
+    """
+    pool = HashingPool()
+    pool.configure(workers=1, max_pending=2, timeout=10.0)
+    try:
+        hashed = pool.generate("MySuperSecretPassword123")
+        assert pool.check(hashed, "MySuperSecretPassword123") is True
+        assert pool.check(hashed, "wrongpassword") is False
+
+        stats = pool.stats()
+        assert stats['completed'] == 3
+        assert stats['queue_depth'] == 0
+        assert stats['avg_hash_ms'] > 0
+    finally:
+        pool.shutdown()
+
+def test_pool_rejects_when_full():
+    """A pool with no free slots fails fast instead of queueing."""
+    pool = HashingPool()
+    pool.configure(workers=0, max_pending=0, timeout=1.0)
+
+    with pytest.raises(HashingPoolSaturated):
+        pool.generate("password123")
+    assert pool.stats()['rejected'] == 1
+
+def test_pool_recovers_from_a_dead_worker():
+    """
+    GIVEN a hashing pool whose worker process was killed
+    WHEN the next hashes are submitted
+    THEN the first fails as saturation (a 503 for the caller) and a fresh pool serves the rest
+    """
+    pool = HashingPool()
+    pool.configure(workers=1, max_pending=2, timeout=10.0)
+    try:
+        pid = pool._get_executor().submit(os.getpid).result(timeout=10)
+        os.kill(pid, signal.SIGKILL)
+
+        with pytest.raises(HashingPoolSaturated):
+            pool.generate("password123")
+        assert pool.check(pool.generate("password123"), "password123") is True
+        assert pool.stats()['restarts'] == 1
+        assert pool.stats()['queue_depth'] == 0
+    finally:
+        pool.shutdown()
+
+def test_login_returns_503_when_pool_saturated(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """An overloaded hashing pool sheds login traffic with a cheap 503."""
+    pool = app.extensions['hashing_pool']
+    pool.configure(workers=0, max_pending=0, timeout=1.0)
+
+    response = client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+
+def test_async_check_awaits_the_pool():
+    """Coroutine views await the same pool, with the same admission control and statistics."""
+    pool = HashingPool()
+    pool.configure(workers=1, max_pending=2, timeout=10.0)
+    try:
+        async def round_trip():
+            hashed = await pool.generate_async("MySuperSecretPassword123")
+            return await pool.check_async(hashed, "MySuperSecretPassword123"), await pool.check_async(hashed, "nope")
+
+        assert asyncio.run(round_trip()) == (True, False)
+        assert pool.stats()['completed'] == 3
+        assert pool.stats()['queue_depth'] == 0
+    finally:
+        pool.shutdown()
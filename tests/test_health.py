@@ -0,0 +1,122 @@
+# tests/test_health.py
+import time
+
+from flask import Flask
+from flask.testing import FlaskClient
+
+import src.health
+from src import create_app
+from src.health import health
+
+
+def test_status_is_served_from_the_cached_snapshot(client: FlaskClient, app: Flask):
+    """
+    GIVEN probes refreshed at most once per interval
+    WHEN /status is requested repeatedly
+    THEN only the first request runs the checks
+    """
+    app.config['HEALTH_PROBE_INTERVAL'] = 60
+    first = client.get('/status')
+    second = client.get('/status')
+
+    assert first.status_code == second.status_code == 200
+    assert first.json['status'] == 'online'
+    assert first.json['database'] == 'connected'
+    assert first.json['checked_at'] == second.json['checked_at']
+    assert {'database', 'hash_pool', 'audit_buffer'} <= set(first.json['checks'])
+
+def test_livez_never_touches_the_database(client: FlaskClient, app: Flask, monkeypatch):
+    """Liveness answers even when the database probe would fail."""
+    def broken_ping(engine):
+        raise RuntimeError('database unreachable')
+    monkeypatch.setattr(src.health, '_ping', broken_ping)
+
+    assert client.get('/livez').status_code == 200
+    assert app.extensions['health'].snapshot is None
+
+    response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.json['failing'] == ['database']
+
+def test_hung_database_is_reported_without_hanging_the_probe(client: FlaskClient, app: Flask, monkeypatch):
+    """
+    GIVEN a database that stops answering
+    WHEN the probes run twice
+    THEN each round returns within the timeout and no second ping is stacked on the hung one
+    """
+    calls = []
+    def hung_ping(engine):
+        calls.append(engine)
+        time.sleep(0.5)
+        return 500.0
+    monkeypatch.setattr(src.health, '_ping', hung_ping)
+    app.config.update(HEALTH_PROBE_TIMEOUT=0.05, HEALTH_PROBE_INTERVAL=0)
+
+    start = time.perf_counter()
+    response = client.get('/status')
+    assert time.perf_counter() - start < 0.4
+    assert response.status_code == 503
+    assert response.json['database'] == 'disconnected'
+
+    response = client.get('/status')
+    assert response.json['error'] == 'previous probe still running'
+    assert len(calls) == 1
+
+def test_backlog_degrades_but_stays_ready(client: FlaskClient, app: Flask):
+    """A filling audit buffer is reported as degraded; readiness only fails on a down check."""
+    app.config.update(AUDIT_BUFFER_MAX=10, HEALTH_PROBE_INTERVAL=0)
+    app.extensions['audit_sink'].rows.extend({} for _ in range(9))
+    try:
+        response = client.get('/status')
+        assert response.status_code == 200
+        assert response.json['status'] == 'degraded'
+        assert response.json['checks']['audit_buffer']['status'] == 'degraded'
+        assert client.get('/readyz').status_code == 200
+    finally:
+        app.extensions['audit_sink'].rows.clear()
+
+def test_stale_snapshot_fails_readiness(app: Flask):
+    """A snapshot older than HEALTH_MAX_AGE means the probes stopped: not ready."""
+    health.refresh()
+    app.extensions['health'].snapshot['checked_at'] -= 120
+    app.config.update(HEALTH_PROBE_INTERVAL=600, HEALTH_MAX_AGE=30)
+
+    with app.test_client() as client:
+        response = client.get('/readyz')
+    assert response.status_code == 503
+    assert response.json['stale'] is True
+
+def test_background_thread_keeps_the_snapshot_fresh(client: FlaskClient, app: Flask):
+    """In thread mode the first request starts the prober, later requests just read its results."""
+    app.config.update(HEALTH_PROBE_MODE='thread', HEALTH_PROBE_INTERVAL=0.05)
+    state = app.extensions['health']
+    try:
+        first = client.get('/readyz')
+        assert first.status_code == 200
+        checked_at = state.snapshot['checked_at']
+
+        deadline = time.monotonic() + 5
+        while state.snapshot['checked_at'] == checked_at and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert state.snapshot['checked_at'] > checked_at
+    finally:
+        state.stop()
+        state.worker.join(timeout=5)
+
+def test_pool_saturation_is_checked_on_a_pooled_engine(tmp_path, monkeypatch):
+    """
+    GIVEN a file-backed database, i.e. an engine with a QueuePool (tests otherwise use StaticPool)
+    WHEN the probes run
+    THEN the pool check reports its saturation and the app is ready
+    """
+    monkeypatch.setattr('config.Config.SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr('config.Config.HEALTH_PROBE_MODE', 'inline')
+    app = create_app()
+
+    with app.test_client() as client:
+        response = client.get('/readyz')
+        status = client.get('/status')
+    assert response.status_code == 200
+    pool = status.json['checks']['db_pool']
+    assert pool['status'] == 'ok'
+    assert pool['capacity'] == app.config['DB_POOL_SIZE'] + app.config['DB_MAX_OVERFLOW']
@@ -0,0 +1,112 @@
+# tests/test_identity.py
+import pytest
+from flask import Flask, g
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+from src.extensions import db
+from src.auth.models import User, load_user
+from src.auth.identity import IdentityCache, Principal
+
+
+def test_lru_eviction_and_ttl():
+    """
+    GIVEN an identity cache capped at two entries
+    WHEN a third user is cached or an entry expires
+    THEN the least recently used or expired entry is gone
+    """
+    cache = IdentityCache(max_size=2, ttl=60)
+    cache.put(1, 'one')
+    cache.put(2, 'two')
+    cache.get(1) # 1 is now the most recently used
+    cache.put(3, 'three')
+
+    assert cache.get(2) is None
+    assert cache.get(1) == 'one'
+
+    expired = IdentityCache(max_size=2, ttl=-1)
+    expired.put(1, 'one')
+    assert expired.get(1) is None
+    assert expired.stats()['misses'] == 1
+
+def test_load_user_hits_cache_without_sql(init_database: SQLAlchemy, app: Flask):
+    """The second load of the same identity is served from the cache with no SELECT."""
+    user_id = str(User.query.filter_by(email='existing@test.com').first().id)
+    db.session.expunge_all()
+
+    statements = []
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        first = load_user(user_id)
+        db.session.expunge_all()
+        second = load_user(user_id)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+    assert first.email == second.email == 'existing@test.com'
+    assert len(statements) == 1
+    stats = app.extensions['identity_cache'].stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] == 1
+
+def test_cache_invalidated_on_update_and_logout(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """Profile changes and logout drop the cached identity."""
+    cache = app.extensions['identity_cache']
+    user = User.query.filter_by(email='existing@test.com').first()
+
+    load_user(str(user.id))
+    assert cache.stats()['size'] == 1
+
+    user.bio = 'Updated bio'
+    db.session.commit()
+    assert cache.stats()['size'] == 0
+
+    # a fresh load sees the new value and re-populates the cache
+    assert load_user(str(user.id)).bio == 'Updated bio'
+
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+    load_user(str(user.id))
+    assert cache.stats()['size'] == 1
+    client.get('/auth/logout')
+    assert cache.stats()['size'] == 0
+
+def test_identity_path_loads_only_identity_columns(init_database: SQLAlchemy, app: Flask, max_queries):
+    """load_user skips the profile columns; they still load on first access."""
+    user_id = str(User.query.filter_by(email='existing@test.com').first().id)
+    db.session.expunge_all()
+
+    with max_queries(1) as log:
+        user = load_user(user_id)
+    assert 'bio' not in log.queries[0]['statement']
+
+    with max_queries(1):
+        assert user.bio is None
+
+def test_principal_mode_keeps_users_out_of_the_session(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """
+    GIVEN IDENTITY_PRINCIPAL is enabled
+    WHEN a logged-in user loads pages
+    THEN current_user is a read-only slotted Principal that the session never tracks
+    """
+    app.config['IDENTITY_PRINCIPAL'] = True
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+    user_id = str(User.query.filter_by(email='existing@test.com').first().id)
+    db.session.expunge_all()
+
+    principal = load_user(user_id)
+    assert isinstance(principal, Principal)
+    assert principal.get_id() == user_id and principal.is_authenticated
+    assert not hasattr(principal, '__dict__')
+    with pytest.raises(AttributeError):
+        principal.email = 'other@test.com'
+    assert len(db.session.identity_map) == 0
+    assert load_user(user_id) is principal # served from the cache as-is
+
+    g.pop('_login_user', None)
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+    assert b'existing@test.com' in response.data
@@ -0,0 +1,63 @@
+# tests/test_lockout.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src import create_app
+from src.extensions import db
+from src.auth.models import User
+from src.auth.lockout import lockout_tracker
+
+
+def test_ip_spraying_is_throttled(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """Failures against unknown accounts still count against the client address."""
+    app.config['MAX_LOGIN_ATTEMPTS_PER_IP'] = 3
+
+    for i in range(3):
+        client.post('/auth/login', data={'email': f'nobody{i}@test.com', 'password': 'wrong'})
+
+    # even the right password is refused while the address is throttled
+    response = client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'},
+                           follow_redirects=True)
+    assert b"Too many failed attempts" in response.data
+
+def test_concurrent_failures_lock_the_account_once(monkeypatch, tmp_path):
+    """
+    GIVEN one account in a database file shared by many threads
+    WHEN 16 threads send 4 bad passwords each for it at the same moment
+    THEN the account is locked exactly once: one session-version bump, no errors
+    """
+    monkeypatch.setattr('config.Config.SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'stress.db'}")
+    app = create_app()
+    app.config.update(MAX_LOGIN_ATTEMPTS=5, MAIL_WORKER='off', HEALTH_PROBE_MODE='inline')
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(email='target@test.com', password_hash='x'))
+        db.session.commit()
+
+    threads, attempts = 16, 4
+    start = threading.Barrier(threads)
+    locked_results = []
+
+    def hammer(n: int):
+        start.wait()
+        for _ in range(attempts):
+            with app.app_context():
+                user = User.for_login('target@test.com')
+                locked_results.append(lockout_tracker.register_failure(user, f'10.0.0.{n}'))
+                db.session.commit()
+
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(hammer, range(threads))) # re-raises any thread's error
+
+    with app.app_context():
+        user = User.query.filter_by(email='target@test.com').one()
+        assert user.is_locked and user.locked_until is not None
+        assert user.failed_login_attempts >= 5
+        assert user.session_version == 1
+        db.drop_all()
+    assert len(locked_results) == threads * attempts
+    assert any(locked_results)
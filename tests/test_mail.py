@@ -0,0 +1,113 @@
+# tests/test_mail.py
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src.extensions import db
+from src.auth.models import OutboxEmail
+from src.mail import mailer
+from src.mail_debug import DebuggingSMTPServer
+
+
+@pytest.fixture
+def smtp_server(app: Flask):
+    """A local SMTP sink the app is pointed at; no network needed."""
+    server = DebuggingSMTPServer().start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=server.port)
+    yield server
+    server.stop()
+
+
+def test_request_reset_only_enqueues(client: FlaskClient, init_database: SQLAlchemy, smtp_server):
+    """
+    GIVEN a reset request for an existing account
+    WHEN the form is submitted
+    THEN a message with the reset link is queued and nothing is sent on the request path
+    """
+    response = client.post('/auth/reset_password', data={'email': 'existing@test.com'})
+
+    assert response.status_code == 302
+    queued = OutboxEmail.query.one()
+    assert queued.recipient == 'existing@test.com'
+    assert queued.status == 'pending'
+    assert 'http://localhost/auth/reset_password/' in queued.body
+    assert smtp_server.connections == 0
+
+def test_batch_is_sent_over_one_connection(app: Flask, init_database: SQLAlchemy, smtp_server):
+    """Every due message of a batch goes over a single SMTP connection."""
+    for n in range(3):
+        mailer.enqueue(f'user{n}@test.com', f'Message {n}', 'Hello')
+
+    result = mailer.deliver_pending()
+
+    assert result == {'claimed': 3, 'sent': 3, 'retried': 0, 'failed': 0}
+    assert smtp_server.connections == 1
+    assert [m['To'] for m in smtp_server.messages] == ['user0@test.com', 'user1@test.com', 'user2@test.com']
+    assert {row.status for row in OutboxEmail.query.all()} == {'sent'}
+    assert mailer.deliver_pending()['claimed'] == 0
+
+def test_failed_sends_back_off_then_give_up(app: Flask, init_database: SQLAlchemy):
+    """
+    GIVEN an SMTP server that refuses connections
+    WHEN delivery is attempted repeatedly
+    THEN the message is retried with growing delays and marked failed after MAIL_MAX_ATTEMPTS
+    """
+    closed = DebuggingSMTPServer()
+    port = closed.port
+    closed.server_close()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=port, MAIL_MAX_ATTEMPTS=3, MAIL_RETRY_BASE=10.0)
+    message = mailer.enqueue('user@test.com', 'Subject', 'Body')
+
+    now = datetime.now(timezone.utc)
+    assert mailer.deliver_pending(now)['retried'] == 1
+    db.session.refresh(message)
+    first_delay = (message.next_attempt_at.replace(tzinfo=timezone.utc) - now).total_seconds()
+    assert 9 <= first_delay <= 11
+    assert message.last_error.startswith('ConnectionRefusedError')
+
+    # not due yet: nothing is claimed
+    assert mailer.deliver_pending(now + timedelta(seconds=1))['claimed'] == 0
+
+    now += timedelta(seconds=first_delay + 1)
+    assert mailer.deliver_pending(now)['retried'] == 1
+    db.session.refresh(message)
+    assert 18 <= (message.next_attempt_at.replace(tzinfo=timezone.utc) - now).total_seconds() <= 22
+
+    assert mailer.deliver_pending(now + timedelta(minutes=1))['failed'] == 1
+    db.session.refresh(message)
+    assert message.status == 'failed'
+    assert message.attempts == 3
+
+def test_unbuildable_message_fails_on_its_own(app: Flask, init_database: SQLAlchemy, smtp_server):
+    """
+    GIVEN a batch with a message whose headers cannot be encoded
+    WHEN the batch is delivered
+    THEN the rest is sent and that message counts its attempts until it is marked failed
+    """
+    app.config.update(MAIL_MAX_ATTEMPTS=2, MAIL_RETRY_BASE=10.0)
+    broken = mailer.enqueue('user@test.com', 'Line\nbreak', 'Body')
+    mailer.enqueue('other@test.com', 'Subject', 'Body')
+
+    now = datetime.now(timezone.utc)
+    assert mailer.deliver_pending(now) == {'claimed': 2, 'sent': 1, 'retried': 1, 'failed': 0}
+    assert [m['To'] for m in smtp_server.messages] == ['other@test.com']
+
+    assert mailer.deliver_pending(now + timedelta(minutes=1))['failed'] == 1
+    db.session.refresh(broken)
+    assert broken.status == 'failed'
+    assert broken.attempts == 2
+    assert broken.last_error.startswith('ValueError')
+
+def test_send_command_drains_the_outbox(app: Flask, init_database: SQLAlchemy, smtp_server):
+    """`flask mail send` delivers everything that is due."""
+    app.config['MAIL_BATCH_SIZE'] = 2
+    for n in range(5):
+        mailer.enqueue(f'user{n}@test.com', 'Subject', 'Body')
+
+    result = app.test_cli_runner().invoke(args=['mail', 'send'])
+
+    assert 'Sent 5 messages (0 to retry, 0 failed)' in result.output
+    assert smtp_server.connections == 3
@@ -0,0 +1,73 @@
+# tests/test_metrics.py
+import threading
+
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src.metrics import MetricsRegistry, render
+
+
+def test_registry_merges_thread_shards():
+    """
+    GIVEN samples recorded from several threads
+    WHEN the registry is collected
+    THEN counters and histogram buckets are summed across the per-thread shards
+    """
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+
+    def work():
+        for _ in range(100):
+            registry.inc('jobs_total', (('kind', 'a'),))
+            registry.observe('job_seconds', (('kind', 'a'),), 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counters, histograms = registry.collect()
+    assert counters[('jobs_total', (('kind', 'a'),))] == 400
+    assert histograms[('job_seconds', (('kind', 'a'),))][:3] == [0, 400, 0]
+
+    text = render(registry, {})
+    assert 'job_seconds_bucket{kind="a",le="1.0"} 400' in text
+    assert 'job_seconds_bucket{kind="a",le="+Inf"} 400' in text
+    assert 'job_seconds_count{kind="a"} 400' in text
+
+def test_exited_threads_are_folded_into_one_shard():
+    """Short-lived threads (one per request on the dev server) don't accumulate shards, and keep their counts."""
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+
+    def work():
+        registry.inc('jobs_total')
+        registry.observe('job_seconds', (), 0.5)
+
+    for _ in range(300):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+    assert len(registry._shards) < 64
+
+    counters, histograms = registry.collect()
+    assert registry._shards == []
+    assert counters[('jobs_total', ())] == 300
+    assert histograms[('job_seconds', ())][:3] == [0, 300, 0]
+
+def test_metrics_endpoint_reports_requests_and_logins(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """The /metrics endpoint exposes latency, SQL counts and login outcomes."""
+    app.extensions['metrics'].registry.reset()
+
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'wrong'})
+    client.get('/status')
+
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'login_attempts_total{outcome="failure"} 1' in body
+    assert 'http_request_duration_seconds_count{endpoint="main.status"} 1' in body
+    assert 'db_queries_total{endpoint="auth.login"}' in body
+    assert 'password_hash_queue_depth 0' in body
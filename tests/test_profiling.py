@@ -0,0 +1,89 @@
+# tests/test_profiling.py
+import logging
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src.extensions import db
+from src.auth.models import User
+from src.profiling import sql_profiler
+
+
+def _login(client: FlaskClient):
+    return client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+
+def test_anonymous_pages_run_no_queries(client: FlaskClient, max_queries):
+    """Public pages never touch the database."""
+    with max_queries(0):
+        client.get('/')
+        client.get('/auth/login')
+        client.get('/auth/register')
+
+def test_auth_flow_query_budgets(client: FlaskClient, init_database: SQLAlchemy, max_queries):
+    """
+    GIVEN a registered user
+    WHEN they log in and browse their dashboard and history
+    THEN every endpoint stays within its query budget and nothing is loaded per row
+    """
+    with max_queries(3, max_repeats=2):
+        _login(client)
+    with max_queries(1):
+        client.get('/dashboard')
+    with max_queries(0):
+        client.get('/dashboard') # served from the recent-activity ring
+    with max_queries(2):
+        client.get('/dashboard/history') # the last page also looks for archived months
+    with max_queries(1):
+        client.post('/auth/register', data={'email': 'new@test.com', 'password': 'SecurePassword123',
+                                            'confirm_password': 'SecurePassword123'})
+
+def test_budget_failure_lists_the_statements(app: Flask, init_database: SQLAlchemy, max_queries):
+    """An exceeded budget fails the test with every statement and where it came from."""
+    with pytest.raises(pytest.fail.Exception) as failure:
+        with max_queries(1):
+            db.session.scalars(db.select(User)).all()
+            db.session.scalars(db.select(User).where(User.id > 0)).all()
+
+    assert 'Query budget exceeded: 2 > 1' in str(failure.value)
+    assert 'tests/test_profiling.py' in str(failure.value)
+
+def test_profiler_flags_repeated_statements(app: Flask, init_database: SQLAlchemy, caplog):
+    """
+    GIVEN the request profiler installed
+    WHEN a view loads rows one by one
+    THEN the response carries the query count and the repeated statement is logged as N+1
+    """
+    for i in range(3):
+        db.session.add(User(email=f'user{i}@test.com', password_hash='x'))
+    db.session.commit()
+    ids = db.session.scalars(db.select(User.id)).all()
+
+    def one_by_one():
+        db.session.expunge_all()
+        return {'emails': [db.session.get(User, user_id).email for user_id in ids]}
+    app.add_url_rule('/one-by-one', 'one_by_one', one_by_one)
+    sql_profiler.install(app)
+
+    with caplog.at_level(logging.WARNING):
+        response = app.test_client().get('/one-by-one')
+
+    assert response.headers['X-SQL-Queries'] == str(len(ids))
+    assert float(response.headers['X-SQL-Time-ms']) > 0
+    warning = next(r.getMessage() for r in caplog.records if 'Possible N+1' in r.getMessage())
+    assert f'{len(ids)}x SELECT' in warning
+    assert 'tests/test_profiling.py' in warning
+
+def test_failed_statements_leave_no_timing_state_behind(app: Flask, init_database: SQLAlchemy, max_queries):
+    """A statement that raises is not counted and leaves nothing on the pooled connection."""
+    with max_queries(1) as log:
+        with pytest.raises(Exception):
+            db.session.execute(db.text('SELECT * FROM no_such_table'))
+        db.session.rollback()
+        db.session.scalars(db.select(User)).all()
+
+    assert len(log) == 1
+    info = db.session.connection().info
+    assert '_profiler_start' not in info and '_metrics_query_start' not in info
@@ -0,0 +1,75 @@
+# tests/test_ratelimit.py
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+
+from src import create_app
+from src.ratelimit import TokenBucketStore, parse_limit
+
+
+def test_parse_limit():
+    """Limits read as a burst per period and refill evenly."""
+    assert parse_limit('10/minute') == (10, 10 / 60)
+    assert parse_limit('2/seconds') == (2, 2.0)
+    with pytest.raises(ValueError):
+        parse_limit('ten per minute')
+
+def test_token_bucket_refills_and_idle_buckets_are_evicted():
+    """
+    GIVEN a bucket of 2 tokens refilled at 1 per second
+    WHEN a client bursts, waits, and then goes quiet
+    THEN the burst is capped, a token comes back each second, and the refilled bucket is dropped
+    """
+    store = TokenBucketStore(tick=1.0, slots=8)
+    key = ('auth.login', '10.0.0.1')
+
+    assert store.take(key, 2, 1.0, now=100.0) == 0
+    assert store.take(key, 2, 1.0, now=100.0) == 0
+    assert store.take(key, 2, 1.0, now=100.0) == pytest.approx(1.0)
+    assert store.take(key, 2, 1.0, now=101.0) == 0
+    assert store.take(('auth.login', '10.0.0.2'), 2, 1.0, now=101.0) == 0 # other clients are unaffected
+    assert len(store) == 2
+
+    store.take(('auth.register', '10.0.0.3'), 2, 1.0, now=150.0) # far past the horizon
+    assert len(store) == 1
+    assert store.stats() == {'buckets': 1, 'max_keys': 100000, 'rejected': 1, 'evicted': 2, 'untracked': 0}
+
+def test_sprayed_logins_get_429_before_any_database_work(client: FlaskClient, init_database: SQLAlchemy,
+                                                         app: Flask, max_queries):
+    """
+    GIVEN a login limit of 3 per minute
+    WHEN one address tries a different email each time
+    THEN the fourth POST is refused with 429 and Retry-After without a single query
+    """
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMITS={'auth.login': '3/minute'})
+    for i in range(3):
+        response = client.post('/auth/login', data={'email': f'nobody{i}@test.com', 'password': 'wrong'})
+        assert response.status_code == 200
+
+    with max_queries(0):
+        response = client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+
+    # reading the form and other addresses are unaffected
+    assert client.get('/auth/login').status_code == 200
+    response = client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'},
+                           environ_base={'REMOTE_ADDR': '10.0.0.8'})
+    assert response.status_code == 302
+
+def test_client_address_comes_from_trusted_proxy_headers(monkeypatch):
+    """Behind TRUSTED_PROXY_COUNT proxies each forwarded client gets its own bucket."""
+    monkeypatch.setattr('config.Config.TRUSTED_PROXY_COUNT', 1)
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, RATE_LIMITS={'auth.register': '1/minute'})
+    client = app.test_client()
+
+    def register(forwarded_for: str) -> int:
+        return client.post('/auth/register', data={}, headers={'X-Forwarded-For': forwarded_for}).status_code
+
+    assert register('203.0.113.1') == 200
+    assert register('203.0.113.1') == 429
+    # a spoofed left-most entry is ignored: the proxy appends the real address
+    assert register('198.51.100.7, 203.0.113.1') == 429
+    assert register('203.0.113.2') == 200
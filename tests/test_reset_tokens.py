@@ -0,0 +1,78 @@
+# tests/test_reset_tokens.py
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from flask import Flask
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from werkzeug.security import check_password_hash
+
+from src.extensions import db
+from src.auth.models import User, UsedResetToken
+from src.auth.reset_tokens import reset_tokens, token_digest
+
+
+def _reset(client: FlaskClient, token: str, password: str):
+    return client.post(f'/auth/reset_password/{token}', data={'password': password, 'confirm_password': password})
+
+def test_reset_token_is_single_use(client: FlaskClient, init_database: SQLAlchemy):
+    """
+    GIVEN a reset token that has already been used
+    WHEN it is replayed (GET or POST)
+    THEN it is rejected and the password set by the first use stays in place
+    """
+    user = User.query.filter_by(email='existing@test.com').first()
+    token = user.get_reset_token()
+
+    assert '/login' in _reset(client, token, 'first-new-password').location
+
+    assert '/reset_password' in client.get(f'/auth/reset_password/{token}').location
+    assert '/reset_password' in _reset(client, token, 'second-new-password').location
+    db.session.expire_all()
+    assert check_password_hash(db.session.get(User, user.id).password_hash, 'first-new-password')
+    assert db.session.get(UsedResetToken, token_digest(token)) is not None
+
+def test_verified_tokens_are_served_from_cache(app: Flask, init_database: SQLAlchemy):
+    """After the first verification, neither the signature nor the database is checked again."""
+    user = User.query.filter_by(email='existing@test.com').first()
+    token = user.get_reset_token()
+    assert reset_tokens.serializer() is reset_tokens.serializer()
+
+    statements = []
+    record = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert reset_tokens.verify(token) == user.id
+        first = len(statements)
+        assert reset_tokens.verify(token) == user.id
+        assert reset_tokens.verify(token, max_age=-1) is None
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert first == 1 # the ledger lookup; `users` is never read
+    assert 'users' not in statements[0]
+    assert len(statements) == first
+
+def test_max_age_cannot_outlive_the_ledger(app: Flask, init_database: SQLAlchemy):
+    """A longer max_age than RESET_TOKEN_MAX_AGE is refused: a purged ledger row would let the token be replayed."""
+    token = User.query.filter_by(email='existing@test.com').first().get_reset_token()
+
+    with pytest.raises(ValueError):
+        reset_tokens.verify(token, max_age=app.config['RESET_TOKEN_MAX_AGE'] + 1)
+    with pytest.raises(ValueError):
+        User.verify_reset_token(token, expires_sec=app.config['RESET_TOKEN_MAX_AGE'] * 2)
+
+def test_purge_removes_expired_ledger_rows(app: Flask, init_database: SQLAlchemy):
+    """`flask reset-tokens purge` keeps only records whose tokens could still be presented."""
+    now = datetime.now(timezone.utc)
+    db.session.add_all([
+        UsedResetToken(digest='a' * 64, expires_at=now - timedelta(minutes=1)),
+        UsedResetToken(digest='b' * 64, expires_at=now + timedelta(minutes=10)),
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['reset-tokens', 'purge'])
+
+    assert 'Purged 1 expired reset-token records' in result.output
+    assert [row.digest[0] for row in UsedResetToken.query.all()] == ['b']
@@ -0,0 +1,102 @@
+# tests/test_retention.py
+from datetime import datetime, timezone, timedelta
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+from src.extensions import db
+from src.auth.models import User, AuditLog, AuditDailyRollup
+from src.auth.retention import month_start, rotate_archives, compact, hot_window_start
+
+NOW = datetime(2026, 10, 18, 12, 0, tzinfo=timezone.utc)
+
+
+def _seed_logs(user_id: int, moments: list[tuple[datetime, bool]]):
+    for moment, success in moments:
+        db.session.add(AuditLog(user_id=user_id, was_successful=success, created_at=moment))
+    db.session.commit()
+
+def test_month_start_offsets():
+    """Month arithmetic wraps across year boundaries."""
+    assert month_start(NOW) == datetime(2026, 10, 1, tzinfo=timezone.utc)
+    assert month_start(NOW, -10) == datetime(2025, 12, 1, tzinfo=timezone.utc)
+    assert month_start(NOW, 3) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+def test_rotate_moves_cold_months_to_archive_tables(app: Flask, init_database: SQLAlchemy):
+    """
+    GIVEN events from this month, last month and three months ago
+    WHEN the SQLite tables are rotated with a one-month hot window
+    THEN only the cold month is moved out of the hot audit_logs table
+    """
+    user = User.query.filter_by(email='existing@test.com').first()
+    _seed_logs(user.id, [
+        (datetime(2026, 7, 3, tzinfo=timezone.utc), False),
+        (datetime(2026, 9, 20, tzinfo=timezone.utc), True),
+        (datetime(2026, 10, 2, tzinfo=timezone.utc), True),
+    ])
+
+    with db.engine.begin() as conn:
+        moved = rotate_archives(conn, NOW, hot_months=1)
+
+    assert moved == {'audit_logs_2026_07': 1}
+    assert AuditLog.query.count() == 2
+    assert db.session.execute(text('SELECT COUNT(*) FROM audit_logs_2026_07')).scalar() == 1
+    assert hot_window_start(NOW) == datetime(2026, 9, 1, tzinfo=timezone.utc)
+
+def test_history_pages_continue_into_archive_tables(client, app: Flask, init_database: SQLAlchemy):
+    """
+    GIVEN a user whose older months were rotated into archive tables
+    WHEN /dashboard/history is paged to the end
+    THEN every event is returned exactly once, newest first, across the hot table and the archives
+    """
+    user = User.query.filter_by(email='existing@test.com').first()
+    _seed_logs(user.id, [(datetime(2026, month, 5, hour, tzinfo=timezone.utc), False)
+                         for month in (5, 7, 9) for hour in (1, 2)])
+    with db.engine.begin() as conn:
+        rotate_archives(conn, NOW, hot_months=1)
+    assert AuditLog.query.count() == 2
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    seen, cursor = [], None
+    while True:
+        page = client.get('/dashboard/history?limit=3' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        seen += [item['created_at'] for item in page['items']]
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == sorted(seen, reverse=True)
+    assert seen[-1].startswith('2026-05-05T01:00')
+
+def test_compact_rolls_up_and_deletes(app: Flask, init_database: SQLAlchemy):
+    """Old events from both the hot table and archives become per-day counts."""
+    user = User.query.filter_by(email='existing@test.com').first()
+    day = datetime(2026, 6, 10, 8, 0, tzinfo=timezone.utc)
+    _seed_logs(user.id, [
+        (day, True),
+        (day + timedelta(hours=2), False),
+        (day + timedelta(hours=3), False),
+        (datetime(2026, 10, 2, tzinfo=timezone.utc), True),
+    ])
+    with db.engine.begin() as conn:
+        rotate_archives(conn, NOW, hot_months=1)
+        summary = compact(conn, NOW - timedelta(days=90))
+
+    assert summary['deleted_rows'] == 3
+    assert summary['dropped_tables'] == 1
+    rollup = AuditDailyRollup.query.one()
+    assert (rollup.day.isoformat(), rollup.success_count, rollup.failure_count) == ('2026-06-10', 1, 2)
+    assert AuditLog.query.count() == 1
+
+def test_compact_cli_command(app: Flask, init_database: SQLAlchemy):
+    """`flask audit compact` reports what it did."""
+    user = User.query.filter_by(email='existing@test.com').first()
+    _seed_logs(user.id, [(datetime.now(timezone.utc) - timedelta(days=200), False)])
+
+    result = app.test_cli_runner().invoke(args=['audit', 'compact', '--older-than-days', '30'])
+
+    assert result.exit_code == 0
+    assert 'Compacted 1 events' in result.output
+    assert AuditLog.query.count() == 0
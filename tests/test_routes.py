@@ -1,6 +1,8 @@
 # tests/test_routes.py
 
 from flask.testing import FlaskClient
+from datetime import datetime, timezone, timedelta
+from src.auth.models import User, AuditLog
 
 
 def test_home_page(client: FlaskClient):
@@ -28,3 +30,42 @@ def test_dashboard_access_denied(client: FlaskClient):
     assert response.status_code == 200
     assert b"Please log in to access this page." in response.data
     assert b"Welcome Back" in response.data # Confirms we are on the login page
+
+def test_dashboard_shows_recent_activity(client: FlaskClient, init_database):
+    """Test that a logged-in user sees their own login in the activity table."""
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    response = client.get('/dashboard')
+    assert response.status_code == 200
+    assert b"Recent Security Activity" in response.data
+    assert b"Success" in response.data
+
+def test_audit_history_keyset_pagination(client: FlaskClient, init_database):
+    """Test that the history API pages through every event exactly once, newest first."""
+    user = User.query.filter_by(email='existing@test.com').first()
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for minute in range(5):
+        init_database.session.add(AuditLog(user_id=user.id, was_successful=False,
+                                           created_at=base + timedelta(minutes=minute)))
+    init_database.session.commit()
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    seen, cursor = [], None
+    while True:
+        url = '/dashboard/history?limit=2' + (f'&cursor={cursor}' if cursor else '')
+        page = client.get(url).get_json()
+        seen.extend(item['id'] for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    # 5 seeded failures plus the successful login, newest (the login) first
+    assert len(seen) == len(set(seen)) == 6
+    assert seen == sorted(seen, reverse=True)
+
+def test_audit_history_rejects_bad_cursor(client: FlaskClient, init_database):
+    """Test that a tampered cursor is a client error, not a server error."""
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    response = client.get('/dashboard/history?cursor=not-a-cursor')
+    assert response.status_code == 400
@@ -0,0 +1,207 @@
+# tests/test_shared_state.py
+import socket
+import time
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from flask import Flask, g
+from flask.testing import FlaskClient
+from flask_sqlalchemy import SQLAlchemy
+from freezegun import freeze_time
+
+from src import create_app
+from src.extensions import db
+from src.auth.models import User
+from src.auth.identity import identity_cache
+from src.auth.lockout import lockout_tracker
+from src.resp_debug import DebuggingRESPServer
+from src.shared_state import (shared_state, MemoryStateBackend, SQLiteStateBackend, RedisStateBackend,
+                              FailoverStateBackend, StateBackend, StateBackendError)
+
+
+@pytest.fixture
+def resp_server():
+    """A local Redis-protocol stand-in; no Redis needed."""
+    server = DebuggingRESPServer().start()
+    yield server
+    server.stop()
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryStateBackend()
+    elif request.param == 'sqlite':
+        yield SQLiteStateBackend(str(tmp_path / 'state.db'))
+    else:
+        server = DebuggingRESPServer().start()
+        yield RedisStateBackend(f'redis://127.0.0.1:{server.port}/0', prefix='test:')
+        server.stop()
+
+def _use_redis(app: Flask, server: DebuggingRESPServer):
+    app.config.update(SHARED_STATE_BACKEND='redis', SHARED_STATE_URL=f'redis://127.0.0.1:{server.port}/0')
+    shared_state.init_app(app)
+
+
+def test_backend_contract(backend):
+    """Every backend offers the same windows and expiring values."""
+    assert backend.hit('ip:10.0.0.1', window=60) == 1
+    assert backend.hit('ip:10.0.0.1', window=60) == 2
+    assert backend.count('ip:10.0.0.1', window=60) == 2
+    assert backend.count('ip:10.0.0.2', window=60) == 0
+    backend.reset('ip:10.0.0.1')
+    assert backend.count('ip:10.0.0.1', window=60) == 0
+
+    assert backend.get('identity:1') is None
+    assert backend.incr('identity:1', ttl=60) == 1
+    assert backend.incr('identity:1', ttl=60) == 2
+    assert backend.get('identity:1') == '2'
+
+    backend.set('revoked:1', '1767225600.5', ttl=60)
+    assert backend.get('revoked:1') == '1767225600.5'
+    backend.delete('revoked:1')
+    assert backend.get('revoked:1') is None
+
+    backend.set('gone', 'x', ttl=0.01)
+    time.sleep(0.05)
+    assert backend.get('gone') is None
+
+def test_incomplete_backend_fails_when_created():
+    """A backend missing part of the interface is rejected up front, not on its first call."""
+    class CountersOnly(StateBackend):
+        def hit(self, key, window): return 1
+        def count(self, key, window): return 1
+        def reset(self, key): pass
+
+    with pytest.raises(TypeError):
+        CountersOnly()
+
+def test_memory_backend_sliding_window():
+    """
+    GIVEN an in-process backend
+    WHEN events age out of the window
+    THEN they stop counting and expired keys are evicted
+    """
+    backend = MemoryStateBackend(sweep_every=1)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    with freeze_time(start) as frozen:
+        assert backend.hit('user:1', window=60) == 1
+        assert backend.hit('user:1', window=60) == 2
+
+        frozen.tick(timedelta(seconds=61))
+        assert backend.count('user:1', window=60) == 0
+
+        backend.hit('user:2', window=60)
+        assert len(backend) == 1 # 'user:1' was swept out
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    """Two backends on the same file (i.e. two workers) see each other's state."""
+    path = str(tmp_path / 'state.db')
+    worker_a = SQLiteStateBackend(path)
+    worker_b = SQLiteStateBackend(path)
+
+    worker_a.hit('ip:10.0.0.1', window=60)
+    assert worker_b.hit('ip:10.0.0.1', window=60) == 2
+    worker_b.reset('ip:10.0.0.1')
+    assert worker_a.count('ip:10.0.0.1', window=60) == 0
+
+    worker_a.incr('identity:7', ttl=60)
+    assert worker_b.incr('identity:7', ttl=60) == 2
+
+def test_redis_backend_reuses_one_connection_per_thread(resp_server):
+    """Commands are pipelined over a single connection; server errors surface as StateBackendError."""
+    backend = RedisStateBackend(f'redis://127.0.0.1:{resp_server.port}/0')
+    for _ in range(20):
+        backend.hit('user:1', window=60)
+    assert backend.count('user:1', window=60) == 20
+    assert resp_server.connections == 1
+
+    with pytest.raises(StateBackendError):
+        backend.client.execute('NOSUCHCOMMAND')
+    assert backend.count('user:1', window=60) == 20 # the connection is still usable
+    assert resp_server.connections == 1
+
+def test_lockout_counts_are_shared_across_workers(app: Flask, init_database: SQLAlchemy, resp_server):
+    """
+    GIVEN two app instances (workers) pointed at the same Redis-protocol server
+    WHEN failures are spread over both
+    THEN both see the combined count and the lock trips on the total
+    """
+    other = create_app()
+    for worker in (app, other):
+        worker.config['MAX_LOGIN_ATTEMPTS'] = 5
+        _use_redis(worker, resp_server)
+    user = User.query.filter_by(email='existing@test.com').first()
+
+    with app.app_context():
+        for _ in range(2):
+            assert lockout_tracker.register_failure(user, '10.0.0.1') is False
+    with other.app_context():
+        assert lockout_tracker.failures(user) == 2
+        for _ in range(2):
+            lockout_tracker.register_failure(user, '10.0.0.2')
+    with app.app_context():
+        assert lockout_tracker.register_failure(user, '10.0.0.1') is True
+        assert user.is_locked
+
+def test_identity_invalidation_reaches_other_workers(app: Flask, init_database: SQLAlchemy, resp_server):
+    """A user changed through one worker is not served from another worker's cache."""
+    other = create_app()
+    for worker in (app, other):
+        _use_redis(worker, resp_server)
+    user = User.query.filter_by(email='existing@test.com').first()
+
+    generation = identity_cache.generation(user.id)
+    identity_cache.put(user.id, 'snapshot', generation)
+    assert identity_cache.get(user.id) == 'snapshot'
+
+    with other.app_context():
+        identity_cache.invalidate(user.id)
+
+    assert identity_cache.get(user.id) is None
+
+def test_committed_revocation_stops_the_read_fast_path(client: FlaskClient, init_database: SQLAlchemy, app: Flask):
+    """
+    GIVEN signed session claims and a logged-in user
+    WHEN the session version is bumped and committed
+    THEN the next read is checked against the row instead of trusting the still-fresh claims
+    """
+    app.config['SESSION_CLAIMS_ENABLED'] = True
+    client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+
+    user = User.query.filter_by(email='existing@test.com').first()
+    user.revoke_sessions()
+    db.session.commit()
+    g.pop('_login_user', None)
+
+    response = client.get('/dashboard')
+    assert response.status_code == 302
+    assert '/auth/login' in response.location
+
+def test_unreachable_backend_degrades_to_per_worker_state(client: FlaskClient, init_database: SQLAlchemy, app: Flask,
+                                                         caplog):
+    """
+    GIVEN SHARED_STATE_BACKEND=redis pointed at a port nobody listens on
+    WHEN users log in, fail logins and browse
+    THEN nothing answers 500: lockout still trips on per-worker counts and the outage is logged once
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    app.config.update(SHARED_STATE_BACKEND='redis', SHARED_STATE_URL=f'redis://127.0.0.1:{port}/0',
+                      SHARED_STATE_TIMEOUT=0.2, SESSION_CLAIMS_ENABLED=True, MAX_LOGIN_ATTEMPTS=3)
+    shared_state.init_app(app)
+
+    response = client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'password123'})
+    assert response.status_code == 302
+    assert client.get('/dashboard').status_code == 200
+    client.get('/auth/logout')
+
+    for _ in range(3):
+        assert client.post('/auth/login', data={'email': 'existing@test.com', 'password': 'wrong'}).status_code == 200
+    assert User.query.filter_by(email='existing@test.com').first().is_locked
+
+    backend = shared_state.backend
+    assert isinstance(backend, FailoverStateBackend) and backend.degraded
+    assert backend.failures == 1
+    assert caplog.text.count('Shared state unavailable') == 1
@@ -0,0 +1,117 @@
+# tests/test_startup.py
+import logging
+import os
+import runpy
+from types import SimpleNamespace
+
+import click
+import pytest
+from flask import Flask
+from flask.cli import ScriptInfo
+
+from src import create_app
+from src.extensions import db
+from src.auth.audit import audit_sink
+from src.auth.models import User, AuditLog
+from src.startup import after_fork, parse_importtime, precompile_templates, prewarm
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """An app on a file-backed SQLite database, i.e. with a real connection pool, as under gunicorn."""
+    monkeypatch.setattr('config.Config.SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setattr('config.Config.HASH_POOL_WORKERS', 1)
+    monkeypatch.setattr('config.Config.HEALTH_PROBE_MODE', 'inline')
+    monkeypatch.setattr('config.Config.MAIL_WORKER', 'off')
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_migrate_is_only_loaded_for_the_cli(app: Flask):
+    """Apps built outside the `flask` command skip Flask-Migrate, even under another click program; `flask db` still gets it."""
+    assert 'migrate' not in app.extensions
+
+    with click.Context(click.Command('uvicorn')):
+        server_app = create_app()
+    assert 'migrate' not in server_app.extensions
+
+    with click.Context(click.Command('db'), obj=ScriptInfo(create_app=create_app)):
+        cli_app = create_app()
+    assert 'migrate' in cli_app.extensions
+
+def test_precompile_templates_fills_the_jinja_cache(app: Flask, tmp_path):
+    """Every template is compiled up front, and the bytecode is written to TEMPLATE_CACHE_DIR."""
+    app.config['TEMPLATE_CACHE_DIR'] = str(tmp_path)
+
+    count = precompile_templates(app)
+
+    assert count == len(app.jinja_env.list_templates()) > 0
+    assert len(app.jinja_env.cache) == count
+    assert len(list(tmp_path.iterdir())) == count
+
+def test_parse_importtime():
+    """`-X importtime` output is parsed into per-module timings with nesting depth."""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     _weakrefset\n"
+        "import time:      2500 |       9000 |   flask\n"
+        "import time:       300 |      12000 | src\n"
+    )
+
+    modules = parse_importtime(stderr)
+
+    assert [m['module'] for m in modules] == ['_weakrefset', 'flask', 'src']
+    assert [m['depth'] for m in modules] == [2, 1, 0]
+    assert modules[1]['self_ms'] == 2.5
+    assert modules[2]['cumulative_ms'] == 12.0
+
+def test_prewarm_opens_a_forked_workers_own_connections(file_app: Flask):
+    """
+    GIVEN a worker that inherited the preloaded master's connection pool
+    WHEN the post_fork steps run
+    THEN the inherited pool is dropped and the worker warms its own connections and hash process
+    """
+    with file_app.app_context():
+        engine = db.engine
+        engine.connect().close()
+        inherited = engine.pool
+
+        after_fork(file_app)
+        assert engine.pool is not inherited
+        assert engine.pool.checkedin() == 0
+
+        warmed = prewarm(file_app)
+        assert warmed['db_connections'] == file_app.config['PREWARM_DB_CONNECTIONS']
+        assert engine.pool.checkedin() == warmed['db_connections']
+        assert warmed['hash_workers'] == 1
+        assert file_app.extensions['health'].snapshot['checks']['db_pool']['status'] == 'ok'
+
+def test_gunicorn_hooks_drain_the_audit_buffer(file_app: Flask, caplog, monkeypatch):
+    """A worker started and stopped through gunicorn.conf.py logs its prewarm and flushes buffered audit events."""
+    # the profile only sets these when unset; keep it from leaking them into later tests
+    monkeypatch.setenv('TEMPLATE_PRECOMPILE', 'false')
+    monkeypatch.setenv('HASH_POOL_WORKERS', '1')
+    hooks = runpy.run_path(os.path.join(ROOT, 'gunicorn.conf.py'))
+    server = SimpleNamespace(app=SimpleNamespace(wsgi=lambda: file_app), log=logging.getLogger('gunicorn.test'))
+    worker = SimpleNamespace(pid=os.getpid())
+    file_app.config.update(AUDIT_LOG_MODE='batched', AUDIT_FLUSH_INTERVAL=3600, AUDIT_BUFFER_MAX=1000)
+
+    with caplog.at_level(logging.INFO, logger='gunicorn.test'):
+        hooks['post_fork'](server, worker)
+    assert f'Worker {os.getpid()} prewarmed' in caplog.text
+
+    with file_app.app_context():
+        user = User(email='buffered@test.com', password_hash='unused')
+        db.session.add(user)
+        db.session.commit()
+        audit_sink.record(user.id, '10.0.0.1', True)
+        assert AuditLog.query.count() == 0
+
+    hooks['worker_exit'](server, worker)
+
+    with file_app.app_context():
+        assert AuditLog.query.count() == 1